@@ -0,0 +1,74 @@
+"""
+Benchmark: cold-start import cost of the orchestrator Lambda.
+
+Run from mini_data_pipeline/:
+    python benchmarks/bench_import_time.py [module] [--top N]
+
+Imports the module (default orchestration.handler) in a fresh interpreter with
+``python -X importtime``, prints the slowest imports by cumulative time and
+exits non-zero if any module that should only load on demand (Spark, Deequ,
+Great Expectations, pyarrow, zeep, gRPC) was imported at module load.
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that must stay off the cold-start path of the orchestrator
+DEFERRED = ("pyspark", "pydeequ", "great_expectations", "pyarrow", "zeep", "grpc")
+
+# Required by orchestration.handler at import time
+HANDLER_ENV = {
+    "RAW_BUCKET": "bench-bucket",
+    "STAGING_PREFIX": "staging/",
+    "QUARANTINE_PREFIX": "quarantine/",
+    "ENRICHED_PREFIX": "enriched/",
+    "CURATED_PREFIX": "curated/",
+    "SNS_TOPIC_ARN": "arn:aws:sns:us-east-1:000000000000:bench",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "SPARK_VERSION": "3.5",
+}
+
+
+def profile_imports(module):
+    """Return ([(cumulative_us, self_us, name)], total_us) for importing ``module``."""
+    env = {**os.environ, **HANDLER_ENV, "PYTHONPATH": ROOT}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr[-2000:])
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative_us), int(self_us), name))
+    total = next((cum for cum, _, name in rows if name.strip() == module), 0)
+    return rows, total
+
+
+def main(argv):
+    top = 15
+    if "--top" in argv:
+        i = argv.index("--top")
+        top = int(argv[i + 1])
+        del argv[i:i + 2]
+    module = argv[0] if argv else "orchestration.handler"
+
+    rows, total = profile_imports(module)
+    print(f"import {module}: {total / 1000:.1f} ms cumulative, {len(rows)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative, self_us, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+
+    loaded = sorted({name.strip().split(".")[0] for _, _, name in rows} & set(DEFERRED))
+    if loaded:
+        print(f"\nREGRESSION: imported at module load: {', '.join(loaded)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+"""
+Benchmark: record-rule validation on the python, arrow and Spark backends.
+
+Run from mini_data_pipeline/:
+    python benchmarks/bench_record_rules.py [rows ...]
+
+The Spark column includes session startup (as validate_record_rules pays it on
+every call) and is skipped when no JVM is available.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.quality_gate import evaluate_in_process, EMAIL_PATTERN  # noqa: E402
+
+
+def make_records(n):
+    return [
+        {"id": i if i % 97 else None, "timestamp": "2024-01-01T00:00:00",
+         "email": f"user{i}@example.com" if i % 53 else "broken"}
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_spark(records):
+    try:
+        from pyspark.sql import SparkSession
+        from pyspark.sql.functions import col, regexp_extract
+    except ImportError:
+        return None
+    start = time.perf_counter()
+    try:
+        spark = SparkSession.builder.appName("bench_record_rules").getOrCreate()
+    except Exception:
+        return None
+    df = spark.createDataFrame(records, "id long, timestamp string, email string")
+    valid = df.filter(col("id").isNotNull() & col("timestamp").isNotNull()
+                      & (regexp_extract(col("email"), EMAIL_PATTERN, 0) != ""))
+    valid.count() == df.count()
+    elapsed = time.perf_counter() - start
+    spark.stop()
+    return elapsed
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'python s':>10} {'arrow s':>10} {'spark s':>10}")
+    for n in sizes:
+        records = make_records(n)
+        python_s = timed(lambda: evaluate_in_process(records, {"id", "timestamp", "email"}, "python"))
+        arrow_s = timed(lambda: evaluate_in_process(records, {"id", "timestamp", "email"}, "arrow"))
+        spark_s = bench_spark(records)
+        spark_col = f"{spark_s:>10.3f}" if spark_s is not None else f"{'n/a':>10}"
+        print(f"{n:>10} {python_s:>10.3f} {arrow_s:>10.3f} {spark_col}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,87 @@
+"""
+Benchmark: raw-zone payload serialization.
+
+Compares the old stdlib paths (json.dumps to a str body, json.loads(json.dumps(...))
+to normalize SOAP/gRPC responses) with ingestion.serialization: orjson encoding,
+NDJSON, gzip/zstd compression, and direct zeep/protobuf conversion.
+
+Run from mini_data_pipeline/:
+    python benchmarks/bench_serialization.py [records ...]
+
+Rows are skipped when the optional package they need (orjson, zstandard, zeep,
+protobuf) isn't installed.
+"""
+
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion import serialization  # noqa: E402
+
+
+def make_records(n):
+    return [
+        {"id": i, "timestamp": "2024-01-01T00:00:00", "email": f"user{i}@example.com",
+         "amount": i * 1.5, "tags": ["a", "b"], "address": {"city": "Springfield", "zip": f"{i:05d}"}}
+        for i in range(n)
+    ]
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def encoding_rows(records):
+    rows = [("json.dumps (str body)", lambda: json.dumps(records).encode("utf-8"))]
+    if serialization.orjson is not None:
+        rows.append(("orjson dumps", lambda: serialization.dumps(records)))
+        rows.append(("orjson ndjson", lambda: serialization.dumps_ndjson(records)))
+    rows.append(("encode + gzip", lambda: serialization.encode_payload(records, compression="gzip")))
+    try:
+        import zstandard  # noqa: F401
+        rows.append(("encode + zstd", lambda: serialization.encode_payload(records, compression="zstd")))
+    except ImportError:
+        pass
+    return rows
+
+
+def conversion_rows(records):
+    rows = [("json round-trip (dict)", lambda: json.loads(json.dumps(records)))]
+    try:
+        import zeep.helpers  # noqa: F401
+        rows.append(("zeep serialize_object", lambda: serialization.soap_to_dict(records)))
+    except ImportError:
+        pass
+    try:
+        from google.protobuf import json_format, struct_pb2
+        message = struct_pb2.ListValue()
+        message.extend(records)
+        rows.append(("protobuf via JSON string", lambda: json.loads(json_format.MessageToJson(message))))
+        rows.append(("protobuf MessageToDict", lambda: serialization.message_to_dict(message)))
+    except ImportError:
+        pass
+    return rows
+
+
+def main(sizes):
+    print(f"{'records':>10} {'path':<26} {'seconds':>10} {'bytes':>12}")
+    for n in sizes:
+        records = make_records(n)
+        for name, fn in encoding_rows(records):
+            result = fn()
+            body = result[0] if isinstance(result, tuple) else result
+            print(f"{n:>10} {name:<26} {timed(fn):>10.4f} {len(body):>12}")
+        for name, fn in conversion_rows(records):
+            print(f"{n:>10} {name:<26} {timed(fn):>10.4f} {'':>12}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
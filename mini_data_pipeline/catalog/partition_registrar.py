@@ -0,0 +1,101 @@
+"""Module: partition_registrar.py
+Registers only newly written Glue partitions, in batches, instead of re-crawling the table."""
+import json
+import os
+
+from config.aws_clients import get_client
+
+BATCH_SIZE = 100  # batch_create_partition / batch_update_partition limit
+
+class PartitionRegistrar:
+    """Tracks the partitions known for one Glue table, in memory and in a local
+    JSON file, so only new or relocated partitions cost Glue API calls."""
+    def __init__(self, database: str, table: str, cache_path: str = None):
+        """
+        :param database: Glue database
+        :param table: Glue table
+        :param cache_path: Local JSON file of known partitions (default under /tmp)
+        """
+        self.database = database
+        self.table = table
+        self.cache_path = cache_path or f'/tmp/glue_partitions_{database}_{table}.json'
+        self._known = None
+
+    def _load(self, glue) -> dict:
+        """Return {'v1/v2': location}, seeded from the cache file or a one-off get_partitions scan."""
+        if self._known is not None:
+            return self._known
+        if os.path.exists(self.cache_path):
+            with open(self.cache_path) as f:
+                self._known = json.load(f)
+            return self._known
+        self._known = {}
+        paginator = glue.get_paginator('get_partitions')
+        for page in paginator.paginate(DatabaseName=self.database, TableName=self.table):
+            for partition in page['Partitions']:
+                self._known['/'.join(partition['Values'])] = partition['StorageDescriptor']['Location']
+        self._save()
+        return self._known
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        with open(self.cache_path, 'w') as f:
+            json.dump(self._known, f)
+
+    def forget(self) -> None:
+        """Drop the known-partition cache (memory and file), e.g. after the table is recreated."""
+        self._known = None
+        if os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
+
+    def register(self, partitions: list, storage_descriptor: dict) -> dict:
+        """Create new partitions and repoint moved ones; skip partitions already known at the same location.
+        :param partitions: [{'values': [year, month], 'location': 's3://...'}]
+        :param storage_descriptor: Table StorageDescriptor used as the partition template
+        :return: {'created', 'updated', 'skipped'} counts
+        """
+        glue = get_client('glue')
+        known = self._load(glue)
+        to_create, to_update, skipped = [], [], 0
+        for partition in partitions:
+            name = '/'.join(partition['values'])
+            if known.get(name) == partition['location']:
+                skipped += 1
+            else:
+                (to_update if name in known else to_create).append(partition)
+
+        def partition_input(p):
+            return {'Values': p['values'], 'StorageDescriptor': {**storage_descriptor, 'Location': p['location']}}
+
+        created = 0
+        for start in range(0, len(to_create), BATCH_SIZE):
+            chunk = to_create[start:start + BATCH_SIZE]
+            response = glue.batch_create_partition(
+                DatabaseName=self.database, TableName=self.table,
+                PartitionInputList=[partition_input(p) for p in chunk],
+            )
+            failed = {tuple(e['PartitionValues']): e['ErrorDetail'].get('ErrorCode')
+                      for e in response.get('Errors', [])}
+            for p in chunk:
+                code = failed.get(tuple(p['values']))
+                if code is None:
+                    known['/'.join(p['values'])] = p['location']
+                    created += 1
+                elif code == 'AlreadyExistsException':
+                    to_update.append(p)
+                else:
+                    raise RuntimeError(f"Failed to create partition {p['values']}: {code}")
+
+        for start in range(0, len(to_update), BATCH_SIZE):
+            chunk = to_update[start:start + BATCH_SIZE]
+            response = glue.batch_update_partition(
+                DatabaseName=self.database, TableName=self.table,
+                Entries=[{'PartitionValueList': p['values'], 'PartitionInput': partition_input(p)} for p in chunk],
+            )
+            if response.get('Errors'):
+                raise RuntimeError(f"Failed to update partitions: {response['Errors']}")
+            for p in chunk:
+                known['/'.join(p['values'])] = p['location']
+
+        self._save()
+        return {'created': created, 'updated': len(to_update), 'skipped': skipped}
@@ -0,0 +1,32 @@
+"""Module: aws_clients.py
+Shared, lazily created boto3 clients, reused across calls and warm invocations."""
+import os
+import threading
+
+_CLIENTS = {}
+_LOCK = threading.Lock()
+
+def get_client(service: str, region_name: str = None):
+    """Return the process-wide boto3 client for ``service``, creating it (and importing
+    boto3) on first use. boto3 clients are thread-safe, so worker pools share them.
+    :param service: AWS service name, e.g. 's3'
+    :param region_name: Optional region override (cached separately)
+    """
+    key = (service, region_name)
+    client = _CLIENTS.get(key)
+    if client is None:
+        with _LOCK:
+            client = _CLIENTS.get(key)
+            if client is None:
+                import boto3
+                from botocore.config import Config
+
+                config = Config(max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32')))
+                kwargs = {'region_name': region_name} if region_name else {}
+                client = _CLIENTS[key] = boto3.client(service, config=config, **kwargs)
+    return client
+
+def clear_clients() -> None:
+    """Drop every cached client (e.g. after credentials rotate, and between tests)."""
+    with _LOCK:
+        _CLIENTS.clear()
@@ -1,10 +1,9 @@
 """Module: api_ingest.py
 Handles ingestion from REST, SOAP, GraphQL, and gRPC APIs."""
-import requests
-import boto3
-import json
-from zeep import Client
-import grpc
+from config.aws_clients import get_client
+from ingestion.clients import get_client_manager
+from ingestion.fingerprint import fingerprint
+from ingestion.serialization import encode_payload, soap_to_dict, message_to_dict
 
 def fetch_rest_api_data(url: str, headers: dict = None, params: dict = None) -> dict:
     """Fetch JSON data from a REST API endpoint.
@@ -13,7 +12,8 @@ def fetch_rest_api_data(url: str, headers: dict = None, params: dict = None) ->
     :param params: Optional query params
     :return: Parsed JSON data
     """
-    response = requests.get(url, headers=headers, params=params)
+    manager = get_client_manager()
+    response = manager.session().get(url, headers=headers, params=params, timeout=manager.timeout)
     response.raise_for_status()
     return response.json()
 
@@ -24,10 +24,9 @@ def fetch_soap_api_data(wsdl_url: str, method: str, **kwargs) -> dict:
     :param kwargs: Method parameters
     :return: Response as dict
     """
-    client = Client(wsdl_url)
+    client = get_client_manager().soap_client(wsdl_url)
     operation = getattr(client.service, method)
-    raw_result = operation(**kwargs)
-    return json.loads(json.dumps(raw_result))
+    return soap_to_dict(operation(**kwargs))
 
 def fetch_graphql_data(endpoint: str, query: str,
                        variables: dict = None, headers: dict = None) -> dict:
@@ -39,7 +38,8 @@ def fetch_graphql_data(endpoint: str, query: str,
     :return: GraphQL response as dict
     """
     payload = {"query": query, "variables": variables or {}}
-    response = requests.post(endpoint, json=payload, headers=headers)
+    manager = get_client_manager()
+    response = manager.session().post(endpoint, json=payload, headers=headers, timeout=manager.timeout)
     response.raise_for_status()
     return response.json()
 
@@ -50,16 +50,28 @@ def fetch_grpc_data(target: str, stub_class, request) -> dict:
     :param request: Protobuf request message
     :return: Response as dict
     """
-    channel = grpc.insecure_channel(target)
+    channel = get_client_manager().grpc_channel(target)
     stub = stub_class(channel)
-    response = stub.MyMethod(request)
-    return json.loads(json.dumps(response, default=lambda x: x.__dict__))
+    return message_to_dict(stub.MyMethod(request))
 
-def upload_json_to_s3(data: dict, bucket: str, key: str) -> None:
+def upload_json_to_s3(data: dict, bucket: str, key: str, fingerprints=None, source: str = None,
+                      ndjson: bool = False, compression: str = None) -> dict:
     """Upload JSON-serializable data to S3.
     :param data: Python dict or list
     :param bucket: S3 bucket name
     :param key: S3 object key
+    :param fingerprints: Optional FingerprintIndex; a payload already in it is not uploaded.
+                         The index is only read: add the returned fingerprint once the run
+                         that landed the object has completed
+    :param source: Source name the fingerprint is tracked under (defaults to the key)
+    :param ndjson: Write list payloads as NDJSON
+    :param compression: None, 'gzip' or 'zstd' Content-Encoding
+    :return: {'key', 'fingerprint' (None without an index), 'unchanged'}
     """
-    s3 = boto3.client('s3')
-    s3.put_object(Bucket=bucket, Key=key, Body=json.dumps(data))
+    digest = fingerprint(data) if fingerprints is not None else None
+    if digest is not None and fingerprints.contains(source or key, digest):
+        return {'key': key, 'fingerprint': digest, 'unchanged': True}
+    body, extra = encode_payload(data, ndjson=ndjson, compression=compression)
+    s3 = get_client('s3')
+    s3.put_object(Bucket=bucket, Key=key, Body=body, **extra)
+    return {'key': key, 'fingerprint': digest, 'unchanged': False}
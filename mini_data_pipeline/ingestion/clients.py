@@ -0,0 +1,123 @@
+"""Module: clients.py
+Long-lived HTTP, SOAP and gRPC clients reused across warm Lambda invocations."""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+class ClientManager:
+    """Caches keep-alive requests Sessions, parsed zeep Clients and gRPC channels."""
+    def __init__(self, max_retries: int = 3, backoff_factor: float = 0.5,
+                 connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                 pool_maxsize: int = 10, wsdl_cache_path: str = None, retry_post: bool = False):
+        """
+        :param max_retries: Retries for connection errors and retryable HTTP statuses
+        :param backoff_factor: Exponential backoff factor between retries
+        :param connect_timeout: Connect timeout in seconds
+        :param read_timeout: Read timeout in seconds
+        :param pool_maxsize: Keep-alive connections per host
+        :param wsdl_cache_path: Optional SQLite file (e.g. under /tmp) for parsed WSDL documents
+        :param retry_post: Also retry POST. Off by default because a replayed POST can repeat
+                           a GraphQL mutation or SOAP call; only idempotent methods are retried.
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_maxsize = pool_maxsize
+        self.wsdl_cache_path = wsdl_cache_path
+        self.retry_post = retry_post
+        self._sessions = {}
+        self._soap_clients = {}
+        self._grpc_channels = {}
+        self._lock = threading.Lock()
+
+    def _retry(self) -> Retry:
+        return Retry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {'POST'} if self.retry_post
+            else Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+
+    def session(self, name: str = 'default') -> requests.Session:
+        """Return a pooled Session with retry/backoff mounted for http and https."""
+        with self._lock:
+            session = self._sessions.get(name)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(max_retries=self._retry(),
+                                      pool_connections=self.pool_maxsize,
+                                      pool_maxsize=self.pool_maxsize)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[name] = session
+            return session
+
+    def soap_client(self, wsdl_url: str):
+        """Return a zeep Client for the WSDL, parsing it only once per process.
+        When ``wsdl_cache_path`` is set, fetched WSDL/XSD documents are also
+        persisted to SQLite so a cold start can skip the download."""
+        with self._lock:
+            client = self._soap_clients.get(wsdl_url)
+            if client is not None:
+                return client
+        from zeep import Client
+        from zeep.transports import Transport
+        cache = None
+        if self.wsdl_cache_path:
+            from zeep.cache import SqliteCache
+            cache = SqliteCache(path=self.wsdl_cache_path, timeout=None)
+        transport = Transport(session=self.session('soap'), cache=cache,
+                              timeout=self.timeout[0], operation_timeout=self.timeout[1])
+        client = Client(wsdl_url, transport=transport)
+        with self._lock:
+            return self._soap_clients.setdefault(wsdl_url, client)
+
+    def grpc_channel(self, target: str):
+        """Return a shared insecure channel for 'host:port'."""
+        with self._lock:
+            channel = self._grpc_channels.get(target)
+            if channel is None:
+                import grpc
+                channel = grpc.insecure_channel(target)
+                self._grpc_channels[target] = channel
+            return channel
+
+    def close(self) -> None:
+        """Close every pooled session and channel and forget cached clients."""
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            for channel in self._grpc_channels.values():
+                channel.close()
+            self._sessions.clear()
+            self._soap_clients.clear()
+            self._grpc_channels.clear()
+
+_manager = None
+
+def get_client_manager() -> ClientManager:
+    """Return the process-wide ClientManager, configured from environment variables."""
+    global _manager
+    if _manager is None:
+        _manager = ClientManager(
+            max_retries=int(os.environ.get('HTTP_MAX_RETRIES', '3')),
+            backoff_factor=float(os.environ.get('HTTP_BACKOFF_FACTOR', '0.5')),
+            connect_timeout=float(os.environ.get('HTTP_CONNECT_TIMEOUT', '5')),
+            read_timeout=float(os.environ.get('HTTP_READ_TIMEOUT', '30')),
+            pool_maxsize=int(os.environ.get('HTTP_POOL_MAXSIZE', '10')),
+            wsdl_cache_path=os.environ.get('WSDL_CACHE_PATH'),
+            retry_post=os.environ.get('HTTP_RETRY_POST', 'false').lower() == 'true',
+        )
+    return _manager
+
+def reset_client_manager() -> None:
+    """Close and drop the process-wide ClientManager (mainly for tests)."""
+    global _manager
+    if _manager is not None:
+        _manager.close()
+    _manager = None
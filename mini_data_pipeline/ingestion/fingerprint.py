@@ -0,0 +1,122 @@
+"""Module: fingerprint.py
+Content fingerprints of ingested payloads and a bounded index of recent ones,
+so a payload identical to a recent one is not written to the raw zone again."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+from config.aws_clients import get_client
+
+def canonical_json(data) -> bytes:
+    """Serialize ``data`` so equal JSON values always produce equal bytes (sorted keys, no whitespace)."""
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str).encode('utf-8')
+
+def fingerprint(data) -> str:
+    """SHA-256 of a payload: raw bytes/str as-is, anything else as canonical JSON."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data if isinstance(data, bytes) else canonical_json(data)).hexdigest()
+
+def fingerprint_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 of a local file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FingerprintIndex:
+    """Per-source LRU of the most recent ``max_entries`` payload hashes, held in memory.
+    Subclasses persist it; ``save()`` is called once per ingestion run."""
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = None  # {source: OrderedDict(digest -> seen_at)}
+        self.hits = 0
+
+    def _load(self) -> dict:
+        return {}
+
+    def _entries_for(self, source: str) -> OrderedDict:
+        if self._entries is None:
+            self._entries = {s: OrderedDict(e) for s, e in self._load().items()}
+        return self._entries.setdefault(source, OrderedDict())
+
+    def contains(self, source: str, digest: str) -> bool:
+        with self._lock:
+            found = digest in self._entries_for(source)
+            self.hits += found
+            return found
+
+    def add(self, source: str, digest: str) -> None:
+        with self._lock:
+            entries = self._entries_for(source)
+            entries.pop(digest, None)
+            entries[digest] = time.time()
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def save(self) -> None:
+        pass
+
+class S3FingerprintIndex(FingerprintIndex):
+    """Index kept as one small JSON manifest in S3."""
+    def __init__(self, bucket: str, key: str, max_entries: int = 1000):
+        super().__init__(max_entries)
+        self.bucket = bucket
+        self.key = key
+
+    def _load(self) -> dict:
+        try:
+            body = get_client('s3').get_object(Bucket=self.bucket, Key=self.key)['Body'].read()
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return {}
+            raise
+        return {source: list(entries.items()) for source, entries in json.loads(body).items()}
+
+    def save(self) -> None:
+        with self._lock:
+            if self._entries is None:
+                return
+            body = json.dumps({source: dict(entries) for source, entries in self._entries.items()})
+        get_client('s3').put_object(Bucket=self.bucket, Key=self.key, Body=body, ContentType='application/json')
+
+class SqliteFingerprintIndex(FingerprintIndex):
+    """Index kept in a local SQLite file (a stand-in for S3 in tests and local runs)."""
+    def __init__(self, path: str, max_entries: int = 1000):
+        super().__init__(max_entries)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS fingerprints '
+                         '(source TEXT, digest TEXT, seen_at REAL, PRIMARY KEY (source, digest))')
+
+    def _load(self) -> dict:
+        entries = {}
+        for source, digest, seen_at in self._db.execute(
+                'SELECT source, digest, seen_at FROM fingerprints ORDER BY seen_at'):
+            entries.setdefault(source, []).append((digest, seen_at))
+        return entries
+
+    def save(self) -> None:
+        with self._lock:
+            if self._entries is None:
+                return
+            with self._db:
+                self._db.execute('DELETE FROM fingerprints')
+                self._db.executemany('INSERT INTO fingerprints VALUES (?, ?, ?)', [
+                    (source, digest, seen_at)
+                    for source, entries in self._entries.items() for digest, seen_at in entries.items()])
+
+def open_fingerprint_index(location: str, max_entries: int = 1000) -> FingerprintIndex:
+    """``s3://bucket/key.json`` for an S3 manifest, otherwise a local SQLite path."""
+    if location.startswith('s3://'):
+        bucket, _, key = location[len('s3://'):].partition('/')
+        return S3FingerprintIndex(bucket, key, max_entries)
+    return SqliteFingerprintIndex(location, max_entries)
@@ -1,7 +1,23 @@
 """Module: ftp_ingest.py
 Handles batch ingestion from FTP/SFTP into S3."""
+import fnmatch
 import ftplib
-import boto3
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from config.aws_clients import get_client
+from ingestion.fingerprint import fingerprint_file
+from ingestion.streaming import S3MultipartWriter
 
 def download_from_ftp(host: str, port: int, username: str, password: str,
                       remote_path: str, local_path: str) -> None:
@@ -20,11 +36,310 @@ def download_from_ftp(host: str, port: int, username: str, password: str,
         ftp.retrbinary(f'RETR {remote_path}', f.write)
     ftp.quit()
 
-def upload_to_s3(local_path: str, bucket: str, key: str) -> None:
+def upload_to_s3(local_path: str, bucket: str, key: str, fingerprints=None, source: str = None) -> dict:
     """Upload a local file to S3.
     :param local_path: Local file path
     :param bucket: S3 bucket name
     :param key: S3 object key
+    :param fingerprints: Optional FingerprintIndex; a file whose content is already in it is not uploaded.
+                         The index is only read: add the returned fingerprint once the run
+                         that landed the object has completed
+    :param source: Source name the fingerprint is tracked under (defaults to the key)
+    :return: {'key', 'fingerprint' (None without an index), 'unchanged'}
     """
-    s3 = boto3.client('s3')
+    digest = fingerprint_file(local_path) if fingerprints is not None else None
+    if digest is not None and fingerprints.contains(source or key, digest):
+        return {'key': key, 'fingerprint': digest, 'unchanged': True}
+    s3 = get_client('s3')
     s3.upload_file(local_path, bucket, key)
+    return {'key': key, 'fingerprint': digest, 'unchanged': False}
+
+class FTPConnectionPool:
+    """Up to ``size`` logged-in FTP connections shared by worker threads and kept open
+    between transfers. Idle connections are checked with NOOP before reuse; a connection
+    that raised during use is dropped rather than returned."""
+    def __init__(self, host: str, port: int = 21, username: str = 'anonymous', password: str = '',
+                 size: int = 4, timeout: float = 30.0):
+        """
+        :param host: FTP server hostname
+        :param port: FTP server port
+        :param username: FTP login username
+        :param password: FTP login password
+        :param size: Maximum number of open connections
+        :param timeout: Socket timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self) -> ftplib.FTP:
+        ftp = ftplib.FTP(timeout=self.timeout)
+        ftp.connect(self.host, self.port)
+        ftp.login(self.username, self.password)
+        return ftp
+
+    def _checkout(self) -> ftplib.FTP:
+        while True:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            try:
+                ftp.voidcmd('NOOP')
+                return ftp
+            except ftplib.all_errors:
+                self._discard(ftp)
+
+    @staticmethod
+    def _discard(ftp: ftplib.FTP) -> None:
+        try:
+            ftp.close()
+        except ftplib.all_errors:
+            pass
+
+    @contextmanager
+    def connection(self):
+        """Borrow a logged-in connection, blocking while all ``size`` are in use."""
+        with self._slots:
+            ftp = self._checkout()
+            try:
+                yield ftp
+            except BaseException:
+                self._discard(ftp)
+                raise
+            self._idle.put(ftp)
+
+    def close(self) -> None:
+        """Log out of every idle connection."""
+        while True:
+            try:
+                ftp = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                ftp.quit()
+            except ftplib.all_errors:
+                self._discard(ftp)
+
+def _parse_modify(value: str):
+    """Parse an MLSD 'modify' fact or MDTM reply (YYYYMMDDHHMMSS[.sss], UTC)."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:14], '%Y%m%d%H%M%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+def list_remote_files(ftp: ftplib.FTP, remote_dir: str, pattern: str = '*', modified_since: datetime = None) -> list:
+    """List the files in ``remote_dir`` whose name matches ``pattern``, using one MLSD
+    round trip (falling back to NLST plus SIZE/MDTM per file on servers without MLSD).
+    :param ftp: Logged-in FTP connection
+    :param remote_dir: Remote directory
+    :param pattern: Glob matched against the file name
+    :param modified_since: Only return files modified after this (timezone-aware) time
+    :return: [{'path', 'name', 'size', 'modified'}] sorted by path; 'modified' is a UTC datetime or None
+    """
+    files = []
+    try:
+        for name, facts in ftp.mlsd(remote_dir, facts=['type', 'size', 'modify']):
+            if facts.get('type', 'file') != 'file' or not fnmatch.fnmatch(name, pattern):
+                continue
+            files.append({'path': posixpath.join(remote_dir, name), 'name': name,
+                          'size': int(facts['size']) if 'size' in facts else None,
+                          'modified': _parse_modify(facts.get('modify'))})
+    except ftplib.error_perm:
+        ftp.voidcmd('TYPE I')
+        for path in ftp.nlst(remote_dir):
+            name = posixpath.basename(path)
+            if not fnmatch.fnmatch(name, pattern):
+                continue
+            path = posixpath.join(remote_dir, name)
+            try:
+                size = ftp.size(path)
+                modified = _parse_modify(ftp.voidcmd(f'MDTM {path}').split()[-1])
+            except ftplib.error_perm:
+                continue  # a directory, or a server without SIZE/MDTM
+            files.append({'path': path, 'name': name, 'size': size, 'modified': modified})
+    if modified_since is not None:
+        files = [f for f in files if f['modified'] is None or f['modified'] > modified_since]
+    return sorted(files, key=lambda f: f['path'])
+
+def stream_ftp_to_s3(pool: FTPConnectionPool, remote_path: str, bucket: str, key: str,
+                     part_size: int = 8 * 1024 * 1024, max_retries: int = 2,
+                     blocksize: int = 256 * 1024) -> dict:
+    """Pipe a RETR straight into an S3 multipart upload, without a local file.
+    If the transfer drops, it is resumed on a fresh connection with REST at the
+    number of bytes already received, appending to the same upload.
+    :param pool: FTPConnectionPool to borrow connections from
+    :param remote_path: File path on FTP server
+    :param bucket: S3 bucket name
+    :param key: S3 object key
+    :param part_size: Multipart part size in bytes (minimum 5 MiB)
+    :param max_retries: Resumes attempted after a dropped transfer
+    :param blocksize: RETR read size in bytes
+    :return: {'key', 'bytes', 'resumes', 'fingerprint'} (fingerprint: SHA-256 of the content)
+    """
+    digest = hashlib.sha256()
+    resumes = 0
+    with S3MultipartWriter(bucket, key, part_size=part_size, content_type='application/octet-stream') as writer:
+        def receive(block: bytes) -> None:
+            writer.write(block)
+            digest.update(block)
+
+        while True:
+            try:
+                with pool.connection() as ftp:
+                    ftp.retrbinary(f'RETR {remote_path}', receive, blocksize=blocksize,
+                                   rest=writer.bytes_written or None)
+                break
+            except ftplib.all_errors:
+                if resumes >= max_retries:
+                    raise
+                resumes += 1
+    return {'key': key, 'bytes': writer.bytes_written, 'resumes': resumes, 'fingerprint': digest.hexdigest()}
+
+def ingest_ftp_files(pool: FTPConnectionPool, files: list, bucket: str, prefix: str,
+                     max_workers: int = None, **kwargs) -> list:
+    """Transfer ``files`` (from list_remote_files) concurrently, one pooled connection each.
+    A failing file is reported without affecting the others.
+    :param pool: FTPConnectionPool to borrow connections from
+    :param files: File dicts with at least 'path' and 'name'
+    :param bucket: S3 bucket name
+    :param prefix: Key prefix; each file lands at ``prefix + name``
+    :param max_workers: Concurrent transfers (defaults to the pool size)
+    :param kwargs: Passed to stream_ftp_to_s3 (part_size, max_retries, blocksize)
+    :return: One dict per file with 'remote', 'key', 'status' ('ok'/'failed'), 'bytes', 'resumes', 'error'
+    """
+    def transfer(entry):
+        result = {'remote': entry['path'], 'key': prefix + entry['name'], 'status': 'failed',
+                  'bytes': 0, 'resumes': 0, 'error': None}
+        try:
+            result.update(stream_ftp_to_s3(pool, entry['path'], bucket, result['key'], **kwargs), status='ok')
+        except Exception as e:
+            result['error'] = str(e)
+        return result
+
+    if not files:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers or pool.size, len(files)))) as executor:
+        return list(executor.map(transfer, files))
+
+class SyncManifest:
+    """What has already been transferred from FTP, kept as gzipped JSON in S3
+    (``s3://bucket/key.json.gz``) or a local file.
+    Entries: {remote path: {'size', 'modified' (ISO time), 'key', 'checksum'}}."""
+    def __init__(self, location: str):
+        self.location = location
+        self._entries = None
+
+    def _s3_target(self):
+        bucket, _, key = self.location[len('s3://'):].partition('/')
+        return bucket, key
+
+    @property
+    def entries(self) -> dict:
+        if self._entries is None:
+            self.load()
+        return self._entries
+
+    def load(self) -> dict:
+        """(Re)read the manifest, e.g. at the start of each warm invocation."""
+        self._entries = self._read()
+        return self._entries
+
+    def _read(self) -> dict:
+        if self.location.startswith('s3://'):
+            bucket, key = self._s3_target()
+            try:
+                body = get_client('s3').get_object(Bucket=bucket, Key=key)['Body'].read()
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                    return {}
+                raise
+        elif os.path.exists(self.location):
+            with open(self.location, 'rb') as f:
+                body = f.read()
+        else:
+            return {}
+        return json.loads(gzip.decompress(body))
+
+    def save(self) -> None:
+        body = gzip.compress(json.dumps(self.entries, separators=(',', ':')).encode('utf-8'))
+        if self.location.startswith('s3://'):
+            bucket, key = self._s3_target()
+            get_client('s3').put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/gzip')
+            return
+        os.makedirs(os.path.dirname(self.location) or '.', exist_ok=True)
+        with open(f'{self.location}.tmp', 'wb') as f:
+            f.write(body)
+        os.replace(f'{self.location}.tmp', self.location)
+
+    @staticmethod
+    def _modified(entry: dict):
+        return entry['modified'].isoformat() if entry.get('modified') else None
+
+    def diff(self, files: list) -> tuple:
+        """Split a listing into (new or changed, unchanged). A file is unchanged only when
+        its size and modification time both match the manifest; files without an MDTM
+        time are always transferred.
+        :param files: list_remote_files entries
+        """
+        changed, unchanged = [], []
+        for entry in files:
+            known = self.entries.get(entry['path'])
+            modified = self._modified(entry)
+            same = (known is not None and modified is not None
+                    and known['size'] == entry['size'] and known['modified'] == modified)
+            (unchanged if same else changed).append(entry)
+        return changed, unchanged
+
+    def record(self, entry: dict, result: dict) -> None:
+        """Remember a successfully transferred file."""
+        self.entries[entry['path']] = {'size': entry['size'], 'modified': self._modified(entry),
+                                       'key': result['key'], 'checksum': result.get('fingerprint')}
+
+def sync_ftp_directory(pool: FTPConnectionPool, manifest: SyncManifest, remote_dir: str, bucket: str,
+                       prefix: str, pattern: str = '*', save: bool = True, **kwargs) -> dict:
+    """Transfer only the files in ``remote_dir`` that are new or changed since the
+    manifest was last saved, then record them and save it.
+    :param pool: FTPConnectionPool to borrow connections from
+    :param manifest: SyncManifest of earlier transfers
+    :param remote_dir: Remote directory
+    :param bucket: S3 bucket name
+    :param prefix: Key prefix for transferred files
+    :param pattern: Glob matched against file names
+    :param save: Save the manifest here; pass False to save it yourself once the
+                 transferred keys are recorded elsewhere (e.g. in a run's state)
+    :param kwargs: Passed to ingest_ftp_files
+    :return: {'files' (ingest_ftp_files results), 'transferred', 'failed', 'skipped',
+              'bytes_transferred', 'bytes_skipped'}
+    """
+    manifest.load()
+    with pool.connection() as ftp:
+        listing = list_remote_files(ftp, remote_dir, pattern)
+    changed, unchanged = manifest.diff(listing)
+    results = ingest_ftp_files(pool, changed, bucket, prefix, **kwargs)
+    ok = []
+    for entry, result in zip(changed, results):
+        if result['status'] == 'ok':
+            manifest.record(entry, result)
+            ok.append(result)
+    if ok and save:
+        manifest.save()
+    return {'files': results, 'transferred': len(ok), 'failed': len(results) - len(ok),
+            'skipped': len(unchanged), 'bytes_transferred': sum(result['bytes'] for result in ok),
+            'bytes_skipped': sum(entry['size'] or 0 for entry in unchanged)}
+
+def ingest_ftp_directory(pool: FTPConnectionPool, remote_dir: str, bucket: str, prefix: str,
+                         pattern: str = '*', modified_since: datetime = None, **kwargs) -> list:
+    """List ``remote_dir`` and stream every matching file to S3 over the pool.
+    :return: ingest_ftp_files results
+    """
+    with pool.connection() as ftp:
+        files = list_remote_files(ftp, remote_dir, pattern, modified_since)
+    return ingest_ftp_files(pool, files, bucket, prefix, **kwargs)
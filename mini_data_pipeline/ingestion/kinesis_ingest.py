@@ -1,17 +1,25 @@
 """Module: kinesis_ingest.py
 Lambda handler to ingest real-time data from Kinesis into the raw S3 zone."""
-import boto3
 import os
 import base64
+import gzip
+import json
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config.aws_clients import get_client
 
 def handler(event, context):
-    """Process Kinesis stream records and upload each to S3.
+    """Process Kinesis stream records and upload them to S3.
+    With KINESIS_BATCH_MODE=true records are grouped into compressed NDJSON
+    objects (see batch_handler); otherwise each record becomes one object.
     :param event: AWS Lambda event payload
     :param context: Lambda context
     :return: Processing summary
     """
-    s3 = boto3.client('s3')
+    if os.environ.get('KINESIS_BATCH_MODE', 'false').lower() == 'true':
+        return batch_handler(event, context)
+    s3 = get_client('s3')
     bucket = os.environ['RAW_BUCKET']
     for record in event['Records']:
         payload = base64.b64decode(record['kinesis']['data'])
@@ -19,3 +27,137 @@ def handler(event, context):
         key = f"kinesis/{date_prefix}/{record['kinesis']['sequenceNumber']}.json"
         s3.put_object(Bucket=bucket, Key=key, Body=payload)
     return {'status': 'processed', 'count': len(event['Records'])}
+
+def _compress(body: bytes, compression: str):
+    """Return (compressed body, file suffix, Content-Encoding)."""
+    if compression == 'gzip':
+        return gzip.compress(body), '.gz', 'gzip'
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor().compress(body), '.zst', 'zstd'
+    if compression in (None, '', 'none'):
+        return body, '', None
+    raise ValueError(f"Unsupported compression: {compression}")
+
+def _shard_id(record: dict) -> str:
+    """Extract the shard id from a Kinesis event record's eventID ('shardId-...:seq')."""
+    return record.get('eventID', 'unknown').split(':')[0]
+
+def _arrival_date(record: dict) -> str:
+    arrival = record['kinesis'].get('approximateArrivalTimestamp')
+    return time.strftime('%Y-%m-%d', time.gmtime(arrival) if arrival else time.gmtime())
+
+def build_batches(records: list, max_records: int = 5000, max_bytes: int = 8 * 1024 * 1024):
+    """Group decoded records into NDJSON batches bounded by count and uncompressed size.
+    Each batch is a contiguous run of one shard's records with a single arrival date: a
+    date change or an undecodable record closes the shard's open batch. Cut points then
+    depend only on the records from a batch's first one onward, so a Kinesis retry that
+    restarts at a batch's first record rebuilds the same batches (see batch_handler).
+    :param records: Kinesis event records
+    :param max_records: Maximum records per object
+    :param max_bytes: Maximum uncompressed bytes per object
+    :return: (batches, undecodable records) where each batch is a dict with
+             'shard', 'date', 'lines' and 'sequence_numbers'
+    """
+    batches, undecodable, open_batches = [], [], {}
+    for record in records:
+        sequence_number = record['kinesis']['sequenceNumber']
+        shard = _shard_id(record)
+        try:
+            line = base64.b64decode(record['kinesis']['data'], validate=True).rstrip(b'\r\n').replace(b'\n', b' ')
+        except (ValueError, TypeError):
+            undecodable.append(record)
+            open_batches.pop(shard, None)
+            continue
+        date = _arrival_date(record)
+        batch = open_batches.get(shard)
+        if batch and (batch['date'] != date or len(batch['lines']) >= max_records
+                      or batch['size'] + len(line) + 1 > max_bytes):
+            batch = None
+        if batch is None:
+            batch = {'shard': shard, 'date': date, 'lines': [], 'sequence_numbers': [], 'size': 0}
+            open_batches[shard] = batch
+            batches.append(batch)
+        batch['lines'].append(line)
+        batch['sequence_numbers'].append(sequence_number)
+        batch['size'] += len(line) + 1
+    return batches, undecodable
+
+def _upload_batch(s3, bucket: str, prefix: str, batch: dict, compression: str) -> str:
+    body, suffix, encoding = _compress(b'\n'.join(batch['lines']) + b'\n', compression)
+    key = f"{prefix}shard={batch['shard']}/dt={batch['date']}/{batch['sequence_numbers'][0]}.ndjson{suffix}"
+    extra = {'ContentEncoding': encoding} if encoding else {}
+    s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/x-ndjson', **extra)
+    return key
+
+def _upload_dead_letters(s3, bucket: str, prefix: str, records: list) -> str:
+    """Write undecodable records, as received, to one NDJSON object under the dead-letter prefix,
+    keyed by the first record so a retried upload overwrites rather than duplicates it."""
+    body = b''.join(json.dumps(record, default=str).encode('utf-8') + b'\n' for record in records)
+    key = f"{prefix}dt={_arrival_date(records[0])}/{records[0]['kinesis']['sequenceNumber']}.ndjson"
+    s3.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/x-ndjson')
+    return key
+
+def batch_handler(event, context):
+    """Write Kinesis records as size/count-bounded, compressed NDJSON objects
+    partitioned by shard and date, uploading objects in parallel.
+    Records that can't be decoded will never succeed on retry, so they are written
+    to KINESIS_DEAD_LETTER_PREFIX instead. When an upload fails, Kinesis restarts the
+    shard at the lowest failed sequence number, so every record from the first failed
+    batch onward is returned in ``batchItemFailures`` (requires ReportBatchItemFailures
+    on the event source mapping). Objects are keyed by their first sequence number and
+    the retry rebuilds the same batches, so objects already written past the failure
+    are overwritten rather than duplicated.
+    :param event: AWS Lambda event payload
+    :param context: Lambda context
+    :return: Processing summary including batchItemFailures
+    """
+    s3 = get_client('s3')
+    bucket = os.environ['RAW_BUCKET']
+    prefix = os.environ.get('KINESIS_PREFIX', 'kinesis/')
+    dead_letter_prefix = os.environ.get('KINESIS_DEAD_LETTER_PREFIX', 'kinesis-dead-letter/')
+    compression = os.environ.get('KINESIS_COMPRESSION', 'gzip')
+    _compress(b'', compression)  # fail the whole invocation early on a bad codec/missing zstandard
+    records = event['Records']
+    batches, undecodable = build_batches(
+        records,
+        max_records=int(os.environ.get('KINESIS_BATCH_MAX_RECORDS', '5000')),
+        max_bytes=int(os.environ.get('KINESIS_BATCH_MAX_BYTES', str(8 * 1024 * 1024))),
+    )
+    position = {record['kinesis']['sequenceNumber']: i for i, record in enumerate(records)}
+    first_failure = {}  # shard -> event position of its first record that must be retried
+
+    def fail_from(shard, sequence_number):
+        first_failure[shard] = min(first_failure.get(shard, len(records)), position[sequence_number])
+
+    keys = []
+    with ThreadPoolExecutor(max_workers=int(os.environ.get('KINESIS_UPLOAD_WORKERS', '8'))) as pool:
+        futures = [(pool.submit(_upload_batch, s3, bucket, prefix, batch, compression), batch)
+                   for batch in batches]
+        for future, batch in futures:
+            try:
+                keys.append(future.result())
+            except Exception:
+                fail_from(batch['shard'], batch['sequence_numbers'][0])
+
+    # Undecodable records past a failure come back with the retry; dead-letter only the rest
+    def before_failure(record):
+        return position[record['kinesis']['sequenceNumber']] < first_failure.get(_shard_id(record), len(records))
+
+    dead = [record for record in undecodable if before_failure(record)]
+    dead_letter = None
+    if dead:
+        try:
+            dead_letter = _upload_dead_letters(s3, bucket, dead_letter_prefix, dead)
+        except Exception:
+            for record in dead:
+                fail_from(_shard_id(record), record['kinesis']['sequenceNumber'])
+    failed = [record['kinesis']['sequenceNumber'] for record in records if not before_failure(record)]
+
+    return {
+        'status': 'processed' if not failed else 'partial',
+        'count': len(records) - len(failed) - (len(dead) if dead_letter else 0),
+        'objects': keys,
+        'dead_letter': {'key': dead_letter, 'count': len(dead)} if dead_letter else None,
+        'batchItemFailures': [{'itemIdentifier': seq} for seq in failed],
+    }
@@ -0,0 +1,75 @@
+"""Module: serialization.py
+Encodes raw-zone payloads (JSON or NDJSON, optionally gzip/zstd compressed) with orjson
+when available, and converts SOAP (zeep) and gRPC (protobuf) responses to plain values."""
+import base64
+import datetime
+import decimal
+import gzip
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+def _default(obj):
+    """Encode the non-JSON types SOAP and database drivers hand back."""
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode('ascii')
+    return str(obj)
+
+def dumps(data) -> bytes:
+    """Serialize ``data`` to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def dumps_ndjson(records) -> bytes:
+    """Serialize an iterable of records to NDJSON bytes, one record per line."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        return b''.join(orjson.dumps(record, default=_default, option=option) for record in records)
+    return b''.join(dumps(record) + b'\n' for record in records)
+
+def compress(body: bytes, encoding: str = None) -> bytes:
+    """Compress ``body`` with 'gzip' or 'zstd' (needs the zstandard package); None returns it as-is."""
+    if not encoding:
+        return body
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    raise ValueError(f"Unsupported compression: {encoding}")
+
+def encode_payload(data, ndjson: bool = False, compression: str = None) -> tuple:
+    """Encode a payload for put_object.
+    :param data: JSON-serializable payload
+    :param ndjson: Write list payloads as NDJSON (one record per line) instead of a JSON array
+    :param compression: None, 'gzip' or 'zstd' (sent as Content-Encoding)
+    :return: (body bytes, extra put_object kwargs: ContentType and, if compressed, ContentEncoding)
+    """
+    if ndjson and isinstance(data, list):
+        body, extra = dumps_ndjson(data), {'ContentType': 'application/x-ndjson'}
+    else:
+        body, extra = dumps(data), {'ContentType': 'application/json'}
+    if compression:
+        body = compress(body, compression)
+        extra['ContentEncoding'] = compression
+    return body, extra
+
+def soap_to_dict(result):
+    """Convert a zeep response (CompoundValue, list or scalar) to plain dicts and lists."""
+    from zeep.helpers import serialize_object
+    return serialize_object(result, dict)
+
+def message_to_dict(message) -> dict:
+    """Convert a protobuf message to a dict using the proto3 JSON mapping (field names kept as declared)."""
+    from google.protobuf.json_format import MessageToDict
+    return MessageToDict(message, preserving_proto_field_name=True)
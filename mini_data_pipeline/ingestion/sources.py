@@ -0,0 +1,153 @@
+"""Module: sources.py
+Pluggable registry of ingestion sources, fanned out concurrently into the raw zone."""
+import inspect
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from ingestion.api_ingest import upload_json_to_s3
+from ingestion.serialization import COMPRESSION_EXTENSIONS
+
+_SOURCES = {}
+
+def register_source(name: str, fetch, extension: str = '.json', prefix: str = None,
+                    streaming: bool = False, ndjson: bool = False, compression: str = None) -> None:
+    """Register (or replace) an ingestion source.
+    :param name: Source name, used in results and the default key prefix
+    :param fetch: Zero-argument callable returning a JSON-serializable payload, or for
+                  streaming sources a ``fetch(bucket, key)`` callable that writes the
+                  object itself and returns a stats dict (e.g. 'records', 'bytes').
+                  With deduplication enabled, streaming fetches that accept an
+                  ``is_duplicate`` keyword (or ``**kwargs``) also receive that callable and
+                  should return 'fingerprint'/'unchanged' (as write_ndjson_to_s3 does);
+                  two-argument fetches are never deduplicated. Streaming fetches that
+                  accept ``is_cancelled`` get a callable that turns True once the run
+                  gives up on the source, and should then abort their upload
+    :param extension: File extension of the raw object
+    :param prefix: Raw-zone key prefix (defaults to 'api/<name>/')
+    :param streaming: Whether ``fetch`` writes to S3 itself
+    :param ndjson: Upload list payloads as NDJSON (non-streaming sources)
+    :param compression: 'gzip' or 'zstd' for non-streaming sources; the matching
+                        suffix ('.gz', '.zst') is appended to ``extension``
+    """
+    _SOURCES[name] = {
+        'fetch': fetch,
+        'extension': extension + COMPRESSION_EXTENSIONS.get(compression, '') if not streaming else extension,
+        'prefix': prefix or f'api/{name}/',
+        'streaming': streaming,
+        'accepts_is_duplicate': streaming and _accepts_keyword(fetch, 'is_duplicate'),
+        'accepts_is_cancelled': streaming and _accepts_keyword(fetch, 'is_cancelled'),
+        'upload': {'ndjson': ndjson, 'compression': compression},
+    }
+
+def _accepts_keyword(fn, name: str) -> bool:
+    """Whether ``fn`` can be called with the keyword argument ``name``."""
+    try:
+        parameters = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == name or p.kind is p.VAR_KEYWORD for p in parameters)
+
+def unregister_source(name: str) -> None:
+    """Remove a source from the registry if present."""
+    _SOURCES.pop(name, None)
+
+def registered_sources() -> list:
+    """Return the names of all registered sources, in registration order."""
+    return list(_SOURCES)
+
+def _ingest_one(name: str, source: dict, bucket: str, timestamp: str, started: dict,
+                fingerprints=None, cancelled: threading.Event = None) -> dict:
+    """Fetch a single source and upload its payload; runs inside a worker thread.
+    With a fingerprint index, a payload identical to a recent one is not written
+    and the result is flagged 'unchanged'; otherwise the result carries the payload's
+    'fingerprint', which the caller adds to the index once the run has completed.
+    If ``cancelled`` is set by the time the fetch returns (the run gave up on this
+    source), nothing is uploaded; streaming fetches that accept ``is_cancelled`` also
+    poll it while writing, so they can abort their upload."""
+    started[name] = time.monotonic()
+    key = f"{source['prefix']}{timestamp}{source['extension']}"
+    if source['streaming']:
+        options = {}
+        if fingerprints is not None and source['accepts_is_duplicate']:
+            options['is_duplicate'] = lambda digest: fingerprints.contains(name, digest)
+        if cancelled is not None and source['accepts_is_cancelled']:
+            options['is_cancelled'] = cancelled.is_set
+        stats = source['fetch'](bucket, key, **options) or {}
+        landed = not stats.get('unchanged') and not stats.get('cancelled')
+        return {**stats, 'key': key if landed else None}
+    data = source['fetch']()
+    if cancelled is not None and cancelled.is_set():
+        return {'key': None}
+    stats = upload_json_to_s3(data, bucket, key, fingerprints=fingerprints, source=name, **source['upload'])
+    return {**stats, 'key': None if stats['unchanged'] else key}
+
+def run_sources(bucket: str, timestamp: str, names: list = None,
+                max_workers: int = 4, timeout: float = 60.0, fingerprints=None) -> list:
+    """Run the configured sources concurrently and upload each payload to S3.
+    A source that raises or exceeds ``timeout`` seconds (measured from when its
+    worker picked it up) is reported as failed/timed out without affecting the others.
+    Sources still queued once every wave of workers could have timed out (all workers
+    hung) are cancelled and reported as timed out too, so the call always returns.
+    :param bucket: Raw S3 bucket
+    :param timestamp: Run timestamp used in each object key
+    :param names: Source names to run (defaults to every registered source)
+    :param max_workers: Upper bound on concurrent fetches
+    :param timeout: Per-source timeout in seconds
+    :param fingerprints: Optional FingerprintIndex; sources whose payload matches a recent
+                         one get status 'unchanged' and no key. The index is only read here:
+                         landed sources report their 'fingerprint', to be added (and the index
+                         saved) once the run completes, e.g. by RunState.complete
+    :return: One result dict per source with 'source', 'status', 'key', 'seconds', 'error'
+             (plus 'fingerprint' for landed payloads when deduplicating)
+    """
+    names = list(names) if names is not None else registered_sources()
+    results = {name: {'source': name, 'status': 'pending', 'key': None, 'seconds': None, 'error': None}
+               for name in names}
+    unknown = [name for name in names if name not in _SOURCES]
+    for name in unknown:
+        results[name].update(status='failed', error='unknown source')
+    runnable = [name for name in names if name in _SOURCES]
+    if not runnable:
+        return list(results.values())
+
+    started = {}
+    cancelled = {name: threading.Event() for name in runnable}
+    workers = max(1, min(max_workers, len(runnable)))
+    queue_deadline = time.monotonic() + timeout * math.ceil(len(runnable) / workers)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = {
+            executor.submit(_ingest_one, name, _SOURCES[name], bucket, timestamp, started, fingerprints,
+                            cancelled[name]): name
+            for name in runnable
+        }
+        while pending:
+            done, _ = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in done:
+                name = pending.pop(future)
+                elapsed = now - started.get(name, now)
+                try:
+                    outcome = future.result()
+                    outcome.pop('cancelled', None)
+                    status = 'unchanged' if outcome.pop('unchanged', False) else 'ok'
+                    results[name].update(outcome, status=status, seconds=round(elapsed, 3))
+                except Exception as e:
+                    results[name].update(status='failed', error=str(e), seconds=round(elapsed, 3))
+            for future, name in list(pending.items()):
+                if name in started and now - started[name] > timeout:
+                    # Worker threads cannot be interrupted; abandon the result and stop its upload.
+                    cancelled[name].set()
+                    pending.pop(future)
+                    results[name].update(status='timeout', seconds=round(now - started[name], 3),
+                                         error=f'exceeded {timeout}s timeout')
+                elif name not in started and now > queue_deadline:
+                    cancelled[name].set()
+                    future.cancel()
+                    pending.pop(future)
+                    results[name].update(status='timeout', error='never started: every worker was busy')
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return list(results.values())
@@ -0,0 +1,217 @@
+"""Module: streaming.py
+Paginated REST/GraphQL ingestion written incrementally to S3 as NDJSON via multipart upload."""
+import hashlib
+import json
+
+from config.aws_clients import get_client
+from ingestion.clients import get_client_manager
+from ingestion.fingerprint import canonical_json
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+class S3MultipartWriter:
+    """File-like writer that buffers at most one part in memory and uploads
+    it with S3 multipart upload once ``part_size`` bytes have accumulated."""
+    def __init__(self, bucket: str, key: str, part_size: int = 8 * 1024 * 1024,
+                 content_type: str = 'application/x-ndjson', s3=None):
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.content_type = content_type
+        self.s3 = s3 or get_client('s3')
+        self.bytes_written = 0
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._finished = False
+
+    def write(self, data: bytes) -> int:
+        """Buffer ``data``, flushing full parts to S3."""
+        self._buffer.extend(data)
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, body: bytes) -> None:
+        if self._upload_id is None:
+            self._upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type)['UploadId']
+        number = len(self._parts) + 1
+        response = self.s3.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                                       PartNumber=number, Body=body)
+        self._parts.append({'ETag': response['ETag'], 'PartNumber': number})
+
+    def close(self) -> None:
+        """Upload the remaining buffer and complete the upload. Objects smaller
+        than one part are written with a single put_object instead."""
+        if self._finished:
+            return
+        self._finished = True
+        if self._upload_id is None:
+            self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer),
+                               ContentType=self.content_type)
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.s3.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                                              MultipartUpload={'Parts': self._parts})
+        self._buffer.clear()
+
+    def abort(self) -> None:
+        """Abort the multipart upload (if started) so no orphaned parts are billed."""
+        self._finished = True
+        if self._upload_id is not None:
+            self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            self._upload_id = None
+        self._buffer.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+def _get_path(data, path: str):
+    """Resolve a dotted path ('data.items') inside a parsed JSON document."""
+    if not path:
+        return data
+    for part in path.split('.'):
+        if data is None:
+            return None
+        data = data.get(part) if isinstance(data, dict) else None
+    return data
+
+def _as_records(page) -> list:
+    if page is None:
+        return []
+    return page if isinstance(page, list) else [page]
+
+def iter_rest_records(url: str, headers: dict = None, params: dict = None, pagination: str = 'link',
+                      records_path: str = None, cursor_param: str = 'cursor', next_cursor_path: str = 'next_cursor',
+                      offset_param: str = 'offset', limit_param: str = 'limit', page_size: int = 100,
+                      max_pages: int = None):
+    """Yield records from a paginated REST endpoint, holding one page in memory at a time.
+    :param url: API URL
+    :param headers: Optional HTTP headers
+    :param params: Optional query params sent with every page
+    :param pagination: 'cursor', 'offset' or 'link' (RFC 5988 Link: rel="next")
+    :param records_path: Dotted path to the record list in each page (None: the page itself)
+    :param cursor_param: Query param carrying the cursor ('cursor' mode)
+    :param next_cursor_path: Dotted path to the next cursor in the page body ('cursor' mode)
+    :param offset_param: Query param carrying the offset ('offset' mode)
+    :param limit_param: Query param carrying the page size ('offset' mode)
+    :param page_size: Page size ('offset' mode); a shorter page ends iteration
+    :param max_pages: Optional safety limit on the number of pages fetched
+    """
+    if pagination not in ('cursor', 'offset', 'link'):
+        raise ValueError(f"Unsupported pagination mode: {pagination}")
+    manager = get_client_manager()
+    session = manager.session()
+    params = dict(params or {})
+    offset, pages = 0, 0
+    if pagination == 'offset':
+        params[limit_param] = page_size
+    while url and (max_pages is None or pages < max_pages):
+        if pagination == 'offset':
+            params[offset_param] = offset
+        response = session.get(url, headers=headers, params=params, timeout=manager.timeout)
+        response.raise_for_status()
+        body = response.json()
+        records = _as_records(_get_path(body, records_path))
+        pages += 1
+        yield from records
+
+        if pagination == 'cursor':
+            cursor = _get_path(body, next_cursor_path)
+            if not cursor or not records:
+                break
+            params[cursor_param] = cursor
+        elif pagination == 'offset':
+            if len(records) < page_size:
+                break
+            offset += len(records)
+        else:
+            url = response.links.get('next', {}).get('url')
+            params = None
+
+def iter_graphql_records(endpoint: str, query: str, variables: dict = None, headers: dict = None,
+                         records_path: str = 'data.items.nodes', page_info_path: str = 'data.items.pageInfo',
+                         cursor_variable: str = 'after', max_pages: int = None):
+    """Yield records from a Relay-style cursor-paginated GraphQL connection.
+    The query must accept ``$<cursor_variable>`` and select ``pageInfo { hasNextPage endCursor }``.
+    :param endpoint: GraphQL endpoint
+    :param query: GraphQL query string
+    :param variables: Query variables
+    :param headers: HTTP headers
+    :param records_path: Dotted path to the record list in the response
+    :param page_info_path: Dotted path to the connection's pageInfo
+    :param cursor_variable: Variable that receives endCursor on the next request
+    :param max_pages: Optional safety limit on the number of pages fetched
+    """
+    manager = get_client_manager()
+    session = manager.session()
+    variables = dict(variables or {})
+    pages = 0
+    while max_pages is None or pages < max_pages:
+        response = session.post(endpoint, json={'query': query, 'variables': variables},
+                                headers=headers, timeout=manager.timeout)
+        response.raise_for_status()
+        body = response.json()
+        if body.get('errors'):
+            raise RuntimeError(f"GraphQL errors: {body['errors']}")
+        pages += 1
+        yield from _as_records(_get_path(body, records_path))
+
+        page_info = _get_path(body, page_info_path) or {}
+        if not page_info.get('hasNextPage') or not page_info.get('endCursor'):
+            break
+        variables[cursor_variable] = page_info['endCursor']
+
+def write_ndjson_to_s3(records, bucket: str, key: str, part_size: int = 8 * 1024 * 1024,
+                       is_duplicate=None, is_cancelled=None) -> dict:
+    """Serialize records one line at a time into a multipart S3 upload, fingerprinting
+    the canonical form of each record as it goes.
+    :param records: Iterable of JSON-serializable records
+    :param bucket: S3 bucket name
+    :param key: S3 object key
+    :param part_size: Multipart part size in bytes (minimum 5 MiB)
+    :param is_duplicate: Optional ``is_duplicate(fingerprint) -> bool``; when it returns True
+                         the upload is aborted instead of completed
+    :param is_cancelled: Optional ``is_cancelled() -> bool`` checked before each record; once it
+                         returns True the upload is aborted and nothing more is read
+    :return: {'key', 'records', 'bytes', 'fingerprint', 'unchanged', 'cancelled'}
+    """
+    count = 0
+    digest = hashlib.sha256()
+    with S3MultipartWriter(bucket, key, part_size=part_size) as writer:
+        for record in records:
+            if is_cancelled is not None and is_cancelled():
+                writer.abort()
+                return {'key': None, 'records': count, 'bytes': writer.bytes_written, 'fingerprint': None,
+                        'unchanged': False, 'cancelled': True}
+            writer.write(json.dumps(record).encode('utf-8') + b'\n')
+            digest.update(canonical_json(record) + b'\n')
+            count += 1
+        unchanged = bool(is_duplicate and is_duplicate(digest.hexdigest()))
+        if unchanged:
+            writer.abort()
+    return {'key': None if unchanged else key, 'records': count, 'bytes': writer.bytes_written,
+            'fingerprint': digest.hexdigest(), 'unchanged': unchanged, 'cancelled': False}
+
+def stream_rest_to_s3(url: str, bucket: str, key: str, part_size: int = 8 * 1024 * 1024,
+                      is_duplicate=None, is_cancelled=None, **kwargs) -> dict:
+    """Stream a paginated REST endpoint into an NDJSON object; kwargs go to iter_rest_records."""
+    return write_ndjson_to_s3(iter_rest_records(url, **kwargs), bucket, key, part_size=part_size,
+                              is_duplicate=is_duplicate, is_cancelled=is_cancelled)
+
+def stream_graphql_to_s3(endpoint: str, query: str, bucket: str, key: str,
+                         part_size: int = 8 * 1024 * 1024, is_duplicate=None, is_cancelled=None, **kwargs) -> dict:
+    """Stream a cursor-paginated GraphQL connection into an NDJSON object; kwargs go to iter_graphql_records."""
+    return write_ndjson_to_s3(iter_graphql_records(endpoint, query, **kwargs), bucket, key, part_size=part_size,
+                              is_duplicate=is_duplicate, is_cancelled=is_cancelled)
@@ -0,0 +1,189 @@
+"""Module: alerts.py
+Buffers pipeline alerts during a run, deduplicates them and sends one rate-limited SNS digest per topic."""
+import logging
+import threading
+import time
+
+from config.aws_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+MAX_SUBJECT_CHARS = 100  # SNS subject limit
+MAX_MESSAGE_BYTES = 256 * 1024  # SNS message limit
+PUBLISH_BATCH_SIZE = 10  # publish_batch entry limit
+MAX_BACKLOG_EVENTS = 1000  # distinct alerts kept per topic while it is rate limited
+
+class TokenBucket:
+    """Thread-safe token bucket: ``capacity`` tokens, refilled at ``rate_per_minute``."""
+    def __init__(self, rate_per_minute: float, capacity: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self, n: int = 1) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < n:
+                return False
+            self.tokens -= n
+            return True
+
+# Module level so the per-topic budget, and digests it held back, carry over between warm invocations
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+_BACKLOG = {}  # topic -> {'events': {key: {'subject', 'message', 'count'}} oldest first, 'evicted'}
+_BACKLOG_LOCK = threading.Lock()
+
+def topic_bucket(topic_arn: str, rate_per_minute: float, capacity: int) -> TokenBucket:
+    with _BUCKETS_LOCK:
+        if topic_arn not in _BUCKETS:
+            _BUCKETS[topic_arn] = TokenBucket(rate_per_minute, capacity)
+        return _BUCKETS[topic_arn]
+
+def reset_rate_limits() -> None:
+    """Forget every topic's token bucket and held-back alerts (mainly for tests)."""
+    with _BUCKETS_LOCK:
+        _BUCKETS.clear()
+    with _BACKLOG_LOCK:
+        _BACKLOG.clear()
+
+def _hold(topic_arn: str, events: dict, evicted: int = 0) -> int:
+    """Add ``events`` to the topic's backlog (repeated keys sum their counts), keeping the
+    newest MAX_BACKLOG_EVENTS keys and counting the rest as evicted.
+    :return: Distinct alerts now held for the topic
+    """
+    with _BACKLOG_LOCK:
+        held = _BACKLOG.setdefault(topic_arn, {'events': {}, 'evicted': 0})
+        held['evicted'] += evicted
+        for key, event in events.items():
+            if key in held['events']:
+                held['events'][key]['count'] += event['count']
+            else:
+                held['events'][key] = dict(event)
+        while len(held['events']) > MAX_BACKLOG_EVENTS:
+            held['evicted'] += held['events'].pop(next(iter(held['events'])))['count']
+        return len(held['events'])
+
+def _truncate(text: str, max_bytes: int) -> str:
+    encoded = text.encode('utf-8')
+    if len(encoded) <= max_bytes:
+        return text
+    suffix = '\n... (truncated)'
+    return encoded[:max_bytes - len(suffix)].decode('utf-8', 'ignore') + suffix
+
+class AlertAggregator:
+    """Collects alerts for one run and flushes them as a single digest per topic."""
+    def __init__(self, sns=None, rate_per_minute: float = 6.0, burst: int = 3):
+        """
+        :param sns: Optional SNS client (created on first publish otherwise)
+        :param rate_per_minute: Sustained publishes allowed per topic
+        :param burst: Publishes a topic may send back to back
+        """
+        self._sns = sns
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self._events = {}  # topic -> {key: {'subject', 'message', 'count'}}, insertion ordered
+        self._lock = threading.Lock()
+
+    @property
+    def sns(self):
+        if self._sns is None:
+            self._sns = get_client('sns')
+        return self._sns
+
+    def add(self, topic_arn: str, subject: str, message: str, key: str = None) -> None:
+        """Buffer an alert; repeats with the same key are counted rather than re-sent.
+        :param key: Deduplication key (defaults to subject + message)
+        """
+        key = key or f'{subject}\n{message}'
+        with self._lock:
+            events = self._events.setdefault(topic_arn, {})
+            if key in events:
+                events[key]['count'] += 1
+            else:
+                events[key] = {'subject': subject, 'message': message, 'count': 1}
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(events) for events in self._events.values())
+
+    def _bucket(self, topic_arn: str) -> TokenBucket:
+        return topic_bucket(topic_arn, self.rate_per_minute, self.burst)
+
+    @staticmethod
+    def _digest(events: list, evicted: int = 0) -> tuple:
+        subjects = list(dict.fromkeys(e['subject'] for e in events))
+        subject = subjects[0] if len(subjects) == 1 else f'Pipeline alerts ({len(events)})'
+        lines = []
+        for e in events:
+            suffix = f" (x{e['count']})" if e['count'] > 1 else ''
+            prefix = '' if len(subjects) == 1 else f"[{e['subject']}] "
+            lines.append(f"{prefix}{e['message']}{suffix}")
+        if evicted:
+            lines.append(f"... and {evicted} older alerts held back by the rate limit")
+        return subject[:MAX_SUBJECT_CHARS], _truncate('\n'.join(lines), MAX_MESSAGE_BYTES)
+
+    def flush(self) -> dict:
+        """Publish one digest per topic, subject to the topic's rate limit.
+        A rate-limited or failed digest is held in a module-level backlog and folded into
+        the topic's next digest (possibly from a later warm invocation), so a flood still
+        pages at most at the configured rate but nothing is silently dropped. Publish
+        errors are logged, not raised: this runs in the handler's ``finally``.
+        :return: {topic_arn: {'events', 'status' ('published', 'rate_limited' or 'failed')}}
+        """
+        with self._lock:
+            pending, self._events = self._events, {}
+        for topic_arn, events in pending.items():
+            _hold(topic_arn, events)
+        with _BACKLOG_LOCK:
+            topics = list(_BACKLOG)
+        report = {}
+        for topic_arn in topics:
+            if not self._bucket(topic_arn).take():
+                report[topic_arn] = {'events': _hold(topic_arn, {}), 'status': 'rate_limited'}
+                continue
+            with _BACKLOG_LOCK:
+                held = _BACKLOG.pop(topic_arn, None)
+            if not held or not held['events']:
+                continue
+            events = list(held['events'].values())
+            try:
+                subject, message = self._digest(events, held['evicted'])
+                self.sns.publish(TopicArn=topic_arn, Subject=subject, Message=message)
+                report[topic_arn] = {'events': len(events), 'status': 'published'}
+            except Exception:
+                logger.exception("Failed to publish %d alerts to %s; keeping them for the next flush",
+                                 len(events), topic_arn)
+                _hold(topic_arn, held['events'], held['evicted'])
+                report[topic_arn] = {'events': len(events), 'status': 'failed'}
+        return report
+
+    def publish_batch(self, topic_arn: str, messages: list) -> dict:
+        """Fan out individual messages (e.g. to per-subscriber filters) with publish_batch,
+        10 per call; each call costs one token. Messages left once the topic is rate limited
+        are buffered into the next digest instead of being lost.
+        :param messages: [{'subject', 'message', 'attributes' (optional MessageAttributes)}]
+        :return: {'published', 'failed', 'deferred'} counts
+        """
+        published = failed = 0
+        for start in range(0, len(messages), PUBLISH_BATCH_SIZE):
+            chunk = messages[start:start + PUBLISH_BATCH_SIZE]
+            if not self._bucket(topic_arn).take():
+                for m in messages[start:]:
+                    self.add(topic_arn, m['subject'], m['message'])
+                return {'published': published, 'failed': failed, 'deferred': len(messages) - start}
+            entries = []
+            for i, m in enumerate(chunk):
+                entry = {'Id': str(i), 'Subject': m['subject'][:MAX_SUBJECT_CHARS],
+                         'Message': _truncate(m['message'], MAX_MESSAGE_BYTES)}
+                if m.get('attributes'):
+                    entry['MessageAttributes'] = m['attributes']
+                entries.append(entry)
+            response = self.sns.publish_batch(TopicArn=topic_arn, PublishBatchRequestEntries=entries)
+            published += len(response.get('Successful', []))
+            failed += len(response.get('Failed', []))
+        return {'published': published, 'failed': failed, 'deferred': 0}
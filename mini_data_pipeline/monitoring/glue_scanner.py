@@ -0,0 +1,209 @@
+"""Module: glue_scanner.py
+Paginated, concurrent Glue job-run scan with adaptive throttling, a persisted
+high-water mark of already-seen runs and per-job duration/DPU statistics."""
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from botocore.exceptions import ClientError
+
+from config.aws_clients import get_client
+
+TERMINAL_STATES = {'SUCCEEDED', 'FAILED', 'STOPPED', 'TIMEOUT', 'ERROR', 'EXPIRED'}
+FAILED_STATES = {'FAILED', 'TIMEOUT', 'ERROR'}
+THROTTLE_CODES = {'ThrottlingException', 'TooManyRequestsException', 'RequestLimitExceeded'}
+
+class SeenRunStore:
+    """Per-job high-water marks, kept as JSON in S3 (``s3://bucket/key``) or a local file.
+    State: {job: {'high_water': ISO time, 'reported': [failed run ids at/after it]}}."""
+    def __init__(self, location: str):
+        self.location = location
+
+    def _s3_target(self):
+        bucket, _, key = self.location[len('s3://'):].partition('/')
+        return bucket, key
+
+    def load(self) -> dict:
+        if self.location.startswith('s3://'):
+            bucket, key = self._s3_target()
+            try:
+                return json.loads(get_client('s3').get_object(Bucket=bucket, Key=key)['Body'].read())
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                    return {}
+                raise
+        if not os.path.exists(self.location):
+            return {}
+        with open(self.location) as f:
+            return json.load(f)
+
+    def save(self, state: dict) -> None:
+        body = json.dumps(state)
+        if self.location.startswith('s3://'):
+            bucket, key = self._s3_target()
+            get_client('s3').put_object(Bucket=bucket, Key=key, Body=body)
+            return
+        os.makedirs(os.path.dirname(self.location) or '.', exist_ok=True)
+        with open(self.location, 'w') as f:
+            f.write(body)
+
+class AdaptiveLimiter:
+    """Concurrency limit that halves on throttling and creeps back up on success (AIMD)."""
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.active = 0
+        self.throttled = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            self.throttled += 1
+            self.limit = max(1, self.limit // 2)
+
+    def on_success(self) -> None:
+        with self._cond:
+            if self.limit < self.max_concurrency:
+                self.limit += 1
+                self._cond.notify_all()
+
+def _call(limiter: AdaptiveLimiter, fn, max_attempts: int = 6, base_delay: float = 0.2, **kwargs):
+    """Call ``fn`` inside the limiter, backing off with jitter on throttling errors."""
+    for attempt in range(max_attempts):
+        with limiter:
+            try:
+                response = fn(**kwargs)
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in THROTTLE_CODES or attempt == max_attempts - 1:
+                    raise
+                limiter.on_throttle()
+            else:
+                limiter.on_success()
+                return response
+        time.sleep(base_delay * 2 ** attempt * (0.5 + random.random()))
+
+def _started(run: dict):
+    started = run.get('StartedOn')
+    return started if isinstance(started, datetime) else None
+
+def list_job_names(glue) -> list:
+    """Every Glue job name, across all get_jobs pages."""
+    return [job['Name'] for page in glue.get_paginator('get_jobs').paginate() for job in page['Jobs']]
+
+def _fetch_runs(glue, limiter, job_name: str, max_results: int, high_water) -> list:
+    """Runs newest first; without a high-water mark only the first page, otherwise
+    every page back to the mark."""
+    runs, token = [], None
+    while True:
+        kwargs = {'JobName': job_name, 'MaxResults': max_results}
+        if token:
+            kwargs['NextToken'] = token
+        page = _call(limiter, glue.get_job_runs, **kwargs)
+        for run in page['JobRuns']:
+            started = _started(run)
+            if high_water is not None and started is not None and started < high_water:
+                return runs
+            runs.append(run)
+        token = page.get('NextToken')
+        if not token or high_water is None:
+            return runs
+
+def job_statistics(runs: list) -> dict:
+    """Duration and DPU usage over a job's completed runs."""
+    done = [r for r in runs if r.get('JobRunState') in TERMINAL_STATES]
+    durations = sorted(r['ExecutionTime'] for r in done if isinstance(r.get('ExecutionTime'), (int, float)))
+    dpu_seconds = 0.0
+    for r in done:
+        if isinstance(r.get('DPUSeconds'), (int, float)):
+            dpu_seconds += r['DPUSeconds']
+        elif isinstance(r.get('MaxCapacity'), (int, float)) and isinstance(r.get('ExecutionTime'), (int, float)):
+            dpu_seconds += r['MaxCapacity'] * r['ExecutionTime']
+    return {
+        'runs': len(done),
+        'failed': sum(r['JobRunState'] in FAILED_STATES for r in done),
+        'avg_seconds': sum(durations) / len(durations) if durations else None,
+        'p50_seconds': durations[len(durations) // 2] if durations else None,
+        'max_seconds': durations[-1] if durations else None,
+        'dpu_hours': round(dpu_seconds / 3600, 4),
+    }
+
+def _next_mark(runs: list, previous: dict) -> dict:
+    """Advance the mark to the oldest still-running run (so its outcome is seen later),
+    or to the newest run when everything fetched has finished."""
+    started = [_started(r) for r in runs if _started(r) is not None]
+    if not started:
+        return previous
+    pending = [_started(r) for r in runs if r.get('JobRunState') not in TERMINAL_STATES and _started(r)]
+    return {'high_water': (min(pending) if pending else max(started)).isoformat()}
+
+def scan_glue_jobs(job_names: list = None, state: SeenRunStore = None, max_workers: int = 8,
+                   max_results: int = 5, glue=None) -> dict:
+    """Scan Glue job runs concurrently.
+    :param job_names: Jobs to scan (default: every job, paginated)
+    :param state: Optional SeenRunStore; when set only failures not reported before are returned
+    :param max_workers: Upper bound on concurrent get_job_runs calls
+    :param max_results: get_job_runs page size
+    :return: {'failures': [{'job', 'run_id', 'state', 'error'}], 'jobs': {job: statistics}, 'throttled': n}
+    """
+    glue = glue or get_client('glue')
+    limiter = AdaptiveLimiter(max_workers)
+    job_names = job_names or list_job_names(glue)
+    seen = state.load() if state else {}
+
+    def scan(job_name):
+        mark = seen.get(job_name, {})
+        high_water = datetime.fromisoformat(mark['high_water']) if mark.get('high_water') else None
+        return _fetch_runs(glue, limiter, job_name, max_results, high_water)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(job_names) or 1))) as pool:
+        all_runs = dict(zip(job_names, pool.map(scan, job_names)))
+
+    failures, jobs, new_state = [], {}, {}
+    for job_name, runs in all_runs.items():
+        previous = seen.get(job_name, {})
+        reported = set(previous.get('reported', []))
+        for run in runs:
+            if run['JobRunState'] in FAILED_STATES and run['Id'] not in reported:
+                failures.append({'job': job_name, 'run_id': run['Id'], 'state': run['JobRunState'],
+                                 'error': run.get('ErrorMessage', 'unknown error')})
+        jobs[job_name] = job_statistics(runs)
+        mark = _next_mark(runs, previous)
+        high_water = datetime.fromisoformat(mark['high_water']) if mark.get('high_water') else None
+        # Failed runs at or after the new mark will be fetched again next time; remember them
+        mark['reported'] = sorted(
+            r['Id'] for r in runs if r['JobRunState'] in FAILED_STATES
+            and (high_water is None or _started(r) is None or _started(r) >= high_water))
+        new_state[job_name] = mark
+
+    if state:
+        state.save({**seen, **new_state})
+    return {'failures': failures, 'jobs': jobs, 'throttled': limiter.throttled}
+
+def emit_job_metrics(jobs: dict, namespace: str, cloudwatch=None) -> None:
+    """Publish per-job duration and DPU statistics as CloudWatch metrics."""
+    cloudwatch = cloudwatch or get_client('cloudwatch')
+    metrics = []
+    for job_name, stats in jobs.items():
+        dims = [{'Name': 'JobName', 'Value': job_name}]
+        for name, unit in (('avg_seconds', 'Seconds'), ('max_seconds', 'Seconds'),
+                           ('dpu_hours', 'None'), ('failed', 'Count')):
+            if stats.get(name) is not None:
+                metrics.append({'MetricName': name, 'Dimensions': dims, 'Value': float(stats[name]), 'Unit': unit})
+    for start in range(0, len(metrics), 1000):  # put_metric_data limit
+        cloudwatch.put_metric_data(Namespace=namespace, MetricData=metrics[start:start + 1000])
@@ -2,27 +2,30 @@
 Implements CloudWatch monitoring, SNS alerts, and schema drift detection."""
 import os
 
-import boto3
-import json
-from botocore.exceptions import ClientError
-
-def monitor_glue_jobs(job_names: list = None, sns_topic_arn: str = None):
-    """Check recent Glue job run statuses and publish an SNS alert for any FAILED runs."""
-    glue = boto3.client('glue')
-    sns = boto3.client('sns')
+from config.aws_clients import get_client
+from monitoring.glue_scanner import scan_glue_jobs, emit_job_metrics
+from monitoring.schema_drift import infer_schema, load_snapshot, diff_schemas, save_snapshot, format_diff
+
+def monitor_glue_jobs(job_names: list = None, sns_topic_arn: str = None, alerts=None,
+                      state=None, max_workers: int = 8, metrics_namespace: str = None):
+    """Check recent Glue job run statuses and publish an SNS alert for any FAILED runs.
+    With an AlertAggregator, failures are buffered into its digest instead of published directly.
+    :param state: Optional SeenRunStore so only failures not reported by earlier runs are returned
+    :param max_workers: Upper bound on concurrent get_job_runs calls
+    :param metrics_namespace: If set, per-job duration/DPU statistics are sent to CloudWatch
+    """
+    glue = get_client('glue')
     sns_topic_arn = sns_topic_arn or os.environ['SNS_TOPIC_ARN']
-    job_names = job_names or [job['Name'] for job in glue.get_jobs()['Jobs']]
-
-    failures = []
-    for job_name in job_names:
-        runs = glue.get_job_runs(JobName=job_name, MaxResults=5)['JobRuns']
-        failures.extend(
-            f"{job_name} run {run['Id']}: {run.get('ErrorMessage', 'unknown error')}"
-            for run in runs if run['JobRunState'] == 'FAILED'
-        )
-
-    if failures:
-        sns.publish(
+    scan = scan_glue_jobs(job_names, state=state, max_workers=max_workers, glue=glue)
+    if metrics_namespace and scan['jobs']:
+        emit_job_metrics(scan['jobs'], metrics_namespace)
+
+    failures = [f"{f['job']} run {f['run_id']}: {f['error']}" for f in scan['failures']]
+    if failures and alerts is not None:
+        for failure in failures:
+            alerts.add(sns_topic_arn, 'Glue Job Failures Detected', failure)
+    elif failures:
+        get_client('sns').publish(
             TopicArn=sns_topic_arn,
             Subject='Glue Job Failures Detected',
             Message='\n'.join(failures),
@@ -30,39 +33,31 @@ def monitor_glue_jobs(job_names: list = None, sns_topic_arn: str = None):
     return failures
 
 def detect_schema_drift(bucket: str, keys: list, sns_topic_arn: str = None,
-                         schema_snapshot_key: str = 'schema/last_schema.json'):
-    """Compare the field set of newly ingested records against the last known
-    schema snapshot stored in S3; alert via SNS and update the snapshot if changed."""
-    s3 = boto3.client('s3')
-    sns = boto3.client('sns')
+                         schema_snapshot_key: str = 'schema/last_schema.json', alerts=None,
+                         sample_bytes: int = 4 * 1024 * 1024, max_workers: int = 8):
+    """Compare the nested field paths and types of newly ingested records against the
+    last known schema snapshot stored in S3; alert via SNS (or ``alerts``) and update
+    the snapshot (conditionally) only if it changed.
+    :param sample_bytes: Objects larger than this are sampled by byte ranges instead of read whole
+    :param max_workers: Upper bound on concurrent object reads
+    :return: True if the inferred schema differs from the snapshot
+    """
+    s3 = get_client('s3')
     sns_topic_arn = sns_topic_arn or os.environ['SNS_TOPIC_ARN']
 
-    current_fields = set()
-    for key in keys:
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        record = json.loads(obj['Body'].read())
-        current_fields.update(record.keys())
-
-    try:
-        snapshot_obj = s3.get_object(Bucket=bucket, Key=schema_snapshot_key)
-        previous_fields = set(json.loads(snapshot_obj['Body'].read()))
-    except ClientError:
-        previous_fields = set()
-
-    drifted = current_fields != previous_fields
-    if drifted and previous_fields:
-        sns.publish(
-            TopicArn=sns_topic_arn,
-            Subject='Schema Drift Detected',
-            Message=(
-                f"Added fields: {sorted(current_fields - previous_fields)}\n"
-                f"Removed fields: {sorted(previous_fields - current_fields)}"
-            ),
-        )
-
-    s3.put_object(
-        Bucket=bucket,
-        Key=schema_snapshot_key,
-        Body=json.dumps(sorted(current_fields)),
-    )
+    current, _ = infer_schema(bucket, keys, s3=s3, max_workers=max_workers, sample_bytes=sample_bytes)
+    if not current:
+        return False
+    previous, etag = load_snapshot(s3, bucket, schema_snapshot_key)
+    diff = diff_schemas(previous, current)
+    drifted = any(diff.values())
+    if drifted and previous:
+        message = format_diff(diff)
+        if alerts is not None:
+            alerts.add(sns_topic_arn, 'Schema Drift Detected', message)
+        else:
+            get_client('sns').publish(TopicArn=sns_topic_arn, Subject='Schema Drift Detected', Message=message)
+
+    if current != previous:
+        save_snapshot(s3, bucket, schema_snapshot_key, current, etag)
     return drifted
@@ -0,0 +1,248 @@
+"""Module: schema_drift.py
+Streaming, sampled schema inference over NDJSON / JSON objects in S3, with
+nested field paths, a typed diff and a conditionally written snapshot."""
+import codecs
+import json
+import logging
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from config.aws_clients import get_client
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+MAX_RECORD_CHARS = 16 * 1024 * 1024
+_DECODER = json.JSONDecoder()
+
+def _type_name(value) -> str:
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'integer'
+    if isinstance(value, float):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, list):
+        return 'array'
+    return 'object'
+
+def infer_paths(value, schema: dict = None, prefix: str = '') -> dict:
+    """Add every field path of ``value`` to ``schema`` ({path: set of types}).
+    Nested objects use dotted paths; array elements are described under ``path[]``."""
+    schema = {} if schema is None else schema
+    if isinstance(value, dict):
+        for name, child in value.items():
+            path = f'{prefix}.{name}' if prefix else name
+            schema.setdefault(path, set()).add(_type_name(child))
+            infer_paths(child, schema, path)
+    elif isinstance(value, list):
+        for item in value:
+            path = f'{prefix}[]'
+            schema.setdefault(path, set()).add(_type_name(item))
+            infer_paths(item, schema, path)
+    return schema
+
+def iter_json_values(chunks, max_records: int = None, skipped: list = None,
+                     max_record_chars: int = MAX_RECORD_CHARS):
+    """Yield records from a stream of text chunks holding NDJSON, concatenated JSON,
+    a single object or a top-level JSON array (whose elements are yielded).
+    A record that doesn't parse although a complete line follows the error, or that is
+    still unfinished after ``max_record_chars``, is skipped up to the next newline in
+    NDJSON; in an array or a multi-line document iteration stops there, since nothing
+    after it can be located. Either way the error is appended to ``skipped`` (if given),
+    so the buffer stays bounded. A truncated trailing record is silently dropped."""
+    buffer, pos, in_array, count = '', 0, False, 0
+    single_line = None  # whether every top-level record so far fit on one line (NDJSON)
+    discard_line = False  # dropping the rest of an oversized NDJSON line
+    chunks = iter(chunks)
+    exhausted = False
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] in ',]'
+                                     or (buffer[pos] == '[' and not in_array and count == 0)):
+            if buffer[pos] == '[':
+                in_array = True
+            pos += 1
+        if pos >= len(buffer) and exhausted:
+            return
+        try:
+            if pos >= len(buffer):
+                raise ValueError('buffer exhausted')
+            value, end = _DECODER.raw_decode(buffer, pos)
+            if end == len(buffer) and not exhausted:
+                raise ValueError('record may continue in the next chunk')
+        except ValueError as e:
+            error_at = getattr(e, 'pos', len(buffer))
+            oversized = len(buffer) - pos > max_record_chars
+            if pos < len(buffer) and (oversized or buffer.find('\n', error_at) != -1):
+                # More chunks can't fix this record
+                if skipped is not None:
+                    skipped.append(f'record over {max_record_chars} characters' if oversized else str(e))
+                ndjson = single_line if single_line is not None else buffer.find('\n', pos, error_at) == -1
+                if in_array or not ndjson:
+                    return
+                line_end = buffer.find('\n', pos)
+                if line_end == -1:
+                    buffer, pos, discard_line = '', 0, True
+                else:
+                    pos = line_end + 1
+                continue
+            if exhausted:
+                return
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                exhausted = True
+                continue
+            if discard_line:
+                line_end = chunk.find('\n')
+                discard_line = line_end == -1
+                chunk = '' if discard_line else chunk[line_end + 1:]
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        yield value
+        count += 1
+        if not in_array and single_line is not False:
+            single_line = buffer.find('\n', pos, end) == -1
+        pos = end
+        if max_records and count >= max_records:
+            return
+
+def _iter_lines_records(text: str):
+    """Records from a byte-range sample that starts mid-file: whole lines only."""
+    for line in text.splitlines()[1:]:
+        line = line.strip().rstrip(',')
+        if line.startswith('{'):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+def _content_encoding(response: dict, key: str):
+    encoding = response.get('ContentEncoding')
+    if encoding in ('gzip', 'zstd'):
+        return encoding
+    return 'gzip' if key.endswith('.gz') else 'zstd' if key.endswith('.zst') else None
+
+def _decompressor(encoding: str):
+    if encoding == 'gzip':
+        return zlib.decompressobj(wbits=31)
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj()
+    return None
+
+def _body_chunks(body, encoding: str = None):
+    decoder = codecs.getincrementaldecoder('utf-8')('ignore')
+    decompressor = _decompressor(encoding)
+    while True:
+        chunk = body.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        yield decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+def infer_object_schema(s3, bucket: str, key: str, sample_bytes: int = 4 * 1024 * 1024,
+                        sample_ranges: int = 3, max_records: int = 10000) -> dict:
+    """Infer one object's schema. Objects up to ``sample_bytes`` are streamed whole;
+    larger ones are sampled with ``sample_ranges`` evenly spaced byte ranges of that size.
+    Compressed (gzip/zstd) objects can't be entered mid-stream, so they are streamed
+    from the start up to ``max_records``."""
+    response = s3.get_object(Bucket=bucket, Key=key)
+    size = response.get('ContentLength') or 0
+    encoding = _content_encoding(response, key)
+    schema, skipped = {}, []
+    if encoding or not sample_bytes or size <= sample_bytes:
+        for record in iter_json_values(_body_chunks(response['Body'], encoding), max_records, skipped):
+            infer_paths(record, schema)
+        if skipped:
+            logger.warning("Skipped %d malformed records in s3://%s/%s: %s", len(skipped), bucket, key, skipped[0])
+        return schema
+
+    response['Body'].close()
+    step = max(1, (size - sample_bytes) // max(1, sample_ranges - 1))
+    for i in range(max(1, sample_ranges)):
+        start = min(i * step, size - sample_bytes)
+        part = s3.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{start + sample_bytes - 1}')
+        text = part['Body'].read().decode('utf-8', 'ignore')
+        records = iter_json_values([text], max_records) if start == 0 else _iter_lines_records(text)
+        for record in records:
+            infer_paths(record, schema)
+    return schema
+
+def infer_schema(bucket: str, keys: list, s3=None, max_workers: int = 8, **sample_options) -> tuple:
+    """Infer and merge the schemas of ``keys`` concurrently.
+    :return: ({path: sorted types}, {key: error} for objects that couldn't be read)
+    """
+    s3 = s3 or get_client('s3')
+    merged, errors = {}, {}
+    if not keys:
+        return merged, errors
+
+    def infer(key):
+        try:
+            return key, infer_object_schema(s3, bucket, key, **sample_options), None
+        except Exception as e:
+            return key, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keys)))) as pool:
+        for key, schema, error in pool.map(infer, keys):
+            if error:
+                errors[key] = error
+                continue
+            for path, types in schema.items():
+                merged.setdefault(path, set()).update(types)
+    return {path: sorted(types) for path, types in sorted(merged.items())}, errors
+
+def diff_schemas(previous: dict, current: dict) -> dict:
+    """Typed diff of two {path: [types]} schemas. A field only seen as null, or
+    recorded without types (legacy snapshots), never counts as a type change.
+    :return: {'added': {path: types}, 'removed': {path: types}, 'type_changed': {path: {'from', 'to'}}}
+    """
+    added = {p: t for p, t in current.items() if p not in previous}
+    removed = {p: t for p, t in previous.items() if p not in current}
+    changed = {}
+    for path in current.keys() & previous.keys():
+        before = set(previous[path]) - {'null'}
+        after = set(current[path]) - {'null'}
+        if before and after and before != after:
+            changed[path] = {'from': sorted(before), 'to': sorted(after)}
+    return {'added': added, 'removed': removed, 'type_changed': dict(sorted(changed.items()))}
+
+def load_snapshot(s3, bucket: str, key: str) -> tuple:
+    """Return (schema, etag); schema is {} and etag None when there is no snapshot.
+    Older snapshots that are a plain list of top-level field names are still understood."""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return {}, None
+        raise
+    data = json.loads(response['Body'].read())
+    fields = {name: [] for name in data} if isinstance(data, list) else data.get('fields', {})
+    return fields, response.get('ETag')
+
+def save_snapshot(s3, bucket: str, key: str, schema: dict, etag: str = None) -> bool:
+    """Write the snapshot only if it is still the version that was read (IfMatch), or still
+    absent (IfNoneMatch). :return: False if another run changed it first."""
+    condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+    try:
+        s3.put_object(Bucket=bucket, Key=key, Body=json.dumps({'fields': schema}, sort_keys=True),
+                      ContentType='application/json', **condition)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('PreconditionFailed', 'ConditionalRequestConflict', '412'):
+            return False
+        raise
+    return True
+
+def format_diff(diff: dict) -> str:
+    lines = [f"Added fields: {sorted(diff['added'])}", f"Removed fields: {sorted(diff['removed'])}"]
+    lines += [f"Type changed: {path} {c['from']} -> {c['to']}" for path, c in diff['type_changed'].items()]
+    return '\n'.join(lines)
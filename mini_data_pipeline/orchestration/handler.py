@@ -2,19 +2,26 @@
 AWS Lambda orchestrator for ingest → validate → route → transform → curated."""
 import os
 import json
-import time
-import boto3
-from ingestion.ftp_ingest import download_from_ftp, upload_to_s3
-from ingestion.api_ingest import fetch_rest_api_data, fetch_soap_api_data, fetch_graphql_data, fetch_grpc_data, upload_json_to_s3
-from processing.validation import validate_schema_glue, validate_record_rules, validate_deequ, validate_ge
-from processing.transformation import TransformationJob
-from processing.curated_zone import write_curated_parquet, register_athena_table
-from catalog.metadata_catalog import run_glue_crawler, grant_lakeformation_permissions
+import ftplib
+from config.aws_clients import get_client
+from ingestion.api_ingest import fetch_rest_api_data, fetch_soap_api_data, fetch_graphql_data
+from ingestion.sources import register_source, run_sources
+from ingestion.streaming import stream_rest_to_s3, stream_graphql_to_s3
+from ingestion.fingerprint import open_fingerprint_index
+from ingestion.ftp_ingest import FTPConnectionPool, SyncManifest, sync_ftp_directory
+from processing.validation import get_registered_fields
+from processing.schema_cache import schema_cache
+from processing.quality_gate import run_quality_gate
+from processing.lookup_cache import LookupCache
+from catalog.metadata_catalog import run_glue_crawler
+from catalog.partition_registrar import PartitionRegistrar
 from monitoring.monitoring import monitor_glue_jobs, detect_schema_drift
-
-# Initialize AWS clients
-s3 = boto3.client('s3')
-sns = boto3.client('sns')
+from monitoring.alerts import AlertAggregator
+from monitoring.glue_scanner import SeenRunStore
+from orchestration.s3_mover import move_objects
+from orchestration.run_state import RunState
+# Spark (processing.transformation) and pyarrow (processing.curated_zone) are imported
+# only when a run has files to transform, keeping them off the cold-start path.
 
 # Environment variables
 RAW_BUCKET = os.environ['RAW_BUCKET']
@@ -31,61 +38,222 @@ GLUE_CRAWLER_NAME = os.environ.get('GLUE_CRAWLER_NAME')
 GLUE_DATABASE = os.environ.get('GLUE_DATABASE', 'mini_pipeline_db')
 CURATED_TABLE_NAME = os.environ.get('CURATED_TABLE_NAME', 'curated_records')
 
+# Lookup snapshot: kept under /tmp so warm invocations skip the JDBC read until the TTL expires
+LOOKUP_CACHE = LookupCache(
+    LOOKUP_JDBC_URL, LOOKUP_TABLE,
+    snapshot_dir=os.environ.get('LOOKUP_CACHE_DIR', '/tmp/lookup_cache'),
+    ttl=float(os.environ.get('LOOKUP_CACHE_TTL_SECONDS', '3600')),
+    updated_at_column=os.environ.get('LOOKUP_UPDATED_AT_COLUMN'),
+    partition_column=os.environ.get('LOOKUP_PARTITION_COLUMN'),
+    num_partitions=int(os.environ['LOOKUP_NUM_PARTITIONS']) if os.environ.get('LOOKUP_NUM_PARTITIONS') else None,
+    lower_bound=os.environ.get('LOOKUP_LOWER_BOUND'),
+    upper_bound=os.environ.get('LOOKUP_UPPER_BOUND'),
+    broadcast_threshold_bytes=int(os.environ.get('LOOKUP_BROADCAST_THRESHOLD_BYTES', str(10 * 1024 * 1024))),
+) if LOOKUP_TABLE else None
+
+# Curated Parquet layout
+CURATED_ROW_GROUP_SIZE = int(os.environ.get('CURATED_ROW_GROUP_SIZE', str(128 * 1024)))
+CURATED_COMPRESSION = os.environ.get('CURATED_COMPRESSION', 'zstd')
+CURATED_USE_DICTIONARY = os.environ.get('CURATED_USE_DICTIONARY', 'true').lower() == 'true'
+CURATED_TARGET_FILE_BYTES = int(os.environ.get('CURATED_TARGET_FILE_BYTES', str(128 * 1024 * 1024)))
+
+# Known curated partitions survive warm starts (and cold starts via the /tmp cache file)
+PARTITION_REGISTRAR = PartitionRegistrar(GLUE_DATABASE, CURATED_TABLE_NAME)
+
+# Concurrent server-side copies when routing validated files
+ROUTE_MAX_WORKERS = int(os.environ.get('ROUTE_MAX_WORKERS', '16'))
+
+# Alert digests: per-topic token bucket shared across warm invocations
+ALERT_RATE_PER_MINUTE = float(os.environ.get('ALERT_RATE_PER_MINUTE', '6'))
+ALERT_BURST = int(os.environ.get('ALERT_BURST', '3'))
+
+# Glue run scan: already-reported failures are remembered here (s3://bucket/key or a local path)
+GLUE_RUN_STATE = SeenRunStore(os.environ.get('GLUE_RUN_STATE', '/tmp/glue_seen_runs.json'))
+GLUE_SCAN_MAX_WORKERS = int(os.environ.get('GLUE_SCAN_MAX_WORKERS', '8'))
+GLUE_METRICS_NAMESPACE = os.environ.get('GLUE_METRICS_NAMESPACE')
+
+# Schema drift: objects above this size are sampled by byte ranges
+DRIFT_SAMPLE_BYTES = int(os.environ.get('DRIFT_SAMPLE_BYTES', str(4 * 1024 * 1024)))
+
+# Run-state manifests (s3://bucket/prefix/ or a local directory); a run is retried at most this many times
+RUN_STATE_LOCATION = os.environ.get('RUN_STATE_LOCATION', f's3://{RAW_BUCKET}/_run_state/')
+RUN_STATE_MAX_ATTEMPTS = int(os.environ.get('RUN_STATE_MAX_ATTEMPTS', '3'))
+
+# Split rows failing record rules out to quarantine instead of quarantining the whole file
+SPLIT_INVALID_ROWS = os.environ.get('SPLIT_INVALID_ROWS', 'false').lower() == 'true'
+
+# Ingestion fan-out config
+INGEST_SOURCES = [s for s in os.environ.get('INGEST_SOURCES', 'rest,soap,graphql').split(',') if s]
+INGEST_MAX_WORKERS = int(os.environ.get('INGEST_MAX_WORKERS', '4'))
+INGEST_SOURCE_TIMEOUT = float(os.environ.get('INGEST_SOURCE_TIMEOUT', '60'))
+# Stream paginated REST/GraphQL feeds to S3 as NDJSON instead of buffering whole responses
+INGEST_STREAMING = os.environ.get('INGEST_STREAMING', 'false').lower() == 'true'
+# Buffered sources: list payloads as NDJSON, and optional gzip/zstd Content-Encoding (key gets .gz/.zst)
+UPLOAD_OPTIONS = {'ndjson': os.environ.get('INGEST_NDJSON', 'false').lower() == 'true',
+                  'compression': os.environ.get('INGEST_COMPRESSION') or None}
+
+# Payload fingerprints: a source returning the same data as a recent completed run is not re-ingested
+# (s3://bucket/key.json manifest, or a local SQLite path); a run's fingerprints are added when it completes
+FINGERPRINTS = open_fingerprint_index(
+    os.environ.get('FINGERPRINT_INDEX', f's3://{RAW_BUCKET}/_fingerprints/index.json'),
+    max_entries=int(os.environ.get('FINGERPRINT_MAX_ENTRIES', '1000')),
+) if os.environ.get('INGEST_DEDUP', 'true').lower() == 'true' else None
+
+# FTP: files matching FTP_PATTERN in FTP_REMOTE_DIR are streamed to the raw zone over pooled connections
+FTP_POOL = FTPConnectionPool(
+    os.environ['FTP_HOST'], int(os.environ.get('FTP_PORT', '21')),
+    os.environ.get('FTP_USERNAME', 'anonymous'), os.environ.get('FTP_PASSWORD', ''),
+    size=int(os.environ.get('FTP_MAX_CONNECTIONS', '4')),
+) if os.environ.get('FTP_HOST') else None
+FTP_REMOTE_DIR = os.environ.get('FTP_REMOTE_DIR', '/')
+FTP_PATTERN = os.environ.get('FTP_PATTERN', '*.json')
+FTP_PREFIX = os.environ.get('FTP_PREFIX', 'ftp/')
+# Files already transferred with the same size and MDTM time are skipped
+FTP_SYNC_MANIFEST = SyncManifest(os.environ.get('FTP_SYNC_MANIFEST', f's3://{RAW_BUCKET}/_ftp_sync/manifest.json.gz'))
+
+# Sources (gRPC omitted)
+if INGEST_STREAMING:
+    register_source('rest', lambda bucket, key, **kw: stream_rest_to_s3(
+        os.environ['REST_URL'], bucket, key, **kw,
+        headers={'Authorization': f"Bearer {os.environ['REST_TOKEN']}"},
+        pagination=os.environ.get('REST_PAGINATION', 'link'),
+        records_path=os.environ.get('REST_RECORDS_PATH'),
+        next_cursor_path=os.environ.get('REST_NEXT_CURSOR_PATH', 'next_cursor'),
+        page_size=int(os.environ.get('REST_PAGE_SIZE', '100'))), streaming=True)
+    register_source('graphql', lambda bucket, key, **kw: stream_graphql_to_s3(
+        os.environ['GRAPHQL_ENDPOINT'], os.environ['GRAPHQL_QUERY'], bucket, key, **kw,
+        headers={'Authorization': f"Bearer {os.environ['GRAPHQL_TOKEN']}"},
+        records_path=os.environ.get('GRAPHQL_RECORDS_PATH', 'data.items.nodes'),
+        page_info_path=os.environ.get('GRAPHQL_PAGE_INFO_PATH', 'data.items.pageInfo')), streaming=True)
+else:
+    register_source('rest', lambda: fetch_rest_api_data(
+        os.environ['REST_URL'], headers={'Authorization': f"Bearer {os.environ['REST_TOKEN']}"}), **UPLOAD_OPTIONS)
+    register_source('graphql', lambda: fetch_graphql_data(
+        os.environ['GRAPHQL_ENDPOINT'], os.environ['GRAPHQL_QUERY'],
+        headers={'Authorization': f"Bearer {os.environ['GRAPHQL_TOKEN']}"}), **UPLOAD_OPTIONS)
+register_source('soap', lambda: fetch_soap_api_data(
+    os.environ['SOAP_WSDL'], os.environ['SOAP_METHOD'], **json.loads(os.environ.get('SOAP_PARAMS', '{}'))),
+    **UPLOAD_OPTIONS)
+
 def lambda_handler(event, context):
-    """Main pipeline orchestration entrypoint."""
-    timestamp = time.strftime('%Y/%m/%d/%H%M%S')
-    ingested = []
-
-    # Ingest from REST, SOAP, GraphQL (gRPC omitted)
-    rest = fetch_rest_api_data(os.environ['REST_URL'], headers={'Authorization': f"Bearer {os.environ['REST_TOKEN']}"})
-    key_rest = f"api/rest/{timestamp}.json"; upload_json_to_s3(rest, RAW_BUCKET, key_rest); ingested.append(key_rest)
-    soap = fetch_soap_api_data(os.environ['SOAP_WSDL'], os.environ['SOAP_METHOD'], **json.loads(os.environ.get('SOAP_PARAMS','{}')))
-    key_soap = f"api/soap/{timestamp}.json"; upload_json_to_s3(soap, RAW_BUCKET, key_soap); ingested.append(key_soap)
-    gql = fetch_graphql_data(os.environ['GRAPHQL_ENDPOINT'], os.environ['GRAPHQL_QUERY'], headers={'Authorization': f"Bearer {os.environ['GRAPHQL_TOKEN']}"})
-    key_gql = f"api/graphql/{timestamp}.json"; upload_json_to_s3(gql, RAW_BUCKET, key_gql); ingested.append(key_gql)
-
-    results = {'passed':[], 'failed':[]}
-    # Validate each file
-    for key in ingested:
-        if not validate_schema_glue(RAW_BUCKET, key, os.environ['SCHEMA_REGISTRY'], os.environ['SCHEMA_NAME']):
-            results['failed'].append(key); continue
-        if not validate_record_rules(RAW_BUCKET, key):
-            results['failed'].append(key); continue
-        if not validate_deequ(RAW_BUCKET, key):
-            results['failed'].append(key); continue
-        if not validate_ge(RAW_BUCKET, key):
-            results['failed'].append(key); continue
-        results['passed'].append(key)
-
-    def route(src, prefix):
-        dest = prefix + src
-        s3.copy_object(Bucket=RAW_BUCKET, CopySource={'Bucket':RAW_BUCKET,'Key':src}, Key=dest)
-        s3.delete_object(Bucket=RAW_BUCKET, Key=src)
-        return dest
-
-    # Route passes and failures
-    for k in results['passed']: route(k, STAGING_PREFIX)
-    for k in results['failed']:
-        new_k = route(k, QUARANTINE_PREFIX)
-        sns.publish(TopicArn=SNS_TOPIC, Subject='Data Quarantine', Message=f"{new_k} failed validations")
-
-    # Transform staged
-    transformer = TransformationJob(RAW_BUCKET, STAGING_PREFIX, ENRICHED_PREFIX, LOOKUP_JDBC_URL, LOOKUP_TABLE)
-    for k in results['passed']:
-        rel = k.replace(STAGING_PREFIX, '')
-        transformer.run(rel, timestamp)
-
-    # Curate enriched to Parquet and register
-    for k in results['passed']:
-        enriched_key = ENRICHED_PREFIX + k.replace(STAGING_PREFIX, '')
-        parquet_path = write_curated_parquet(RAW_BUCKET, enriched_key, CURATED_PREFIX, timestamp)
-        register_athena_table(RAW_BUCKET, parquet_path, GLUE_DATABASE, CURATED_TABLE_NAME)
-
-    # Update metadata and run crawler
-    run_glue_crawler(GLUE_CRAWLER_NAME)
-
-    # Monitoring checks
-    monitor_glue_jobs()
-    detect_schema_drift(RAW_BUCKET, results['passed'])
-
-    return {'status':'done','results':results}
+    """Main pipeline orchestration entrypoint.
+    Progress is checkpointed per key and stage in a run-state manifest; an invocation
+    after a partial failure (or with {'run_timestamp': ...}) resumes that run instead of
+    re-fetching and re-validating everything."""
+    run = RunState.open(RUN_STATE_LOCATION, (event or {}).get('run_timestamp'), max_attempts=RUN_STATE_MAX_ATTEMPTS)
+    timestamp = run.timestamp
+
+    # Ingest every configured source not yet landed in this run; a failing source doesn't block the rest
+    pending_sources = [name for name in INGEST_SOURCES if name not in run.sources]
+    sources = run_sources(RAW_BUCKET, timestamp, pending_sources,
+                          max_workers=INGEST_MAX_WORKERS, timeout=INGEST_SOURCE_TIMEOUT,
+                          fingerprints=FINGERPRINTS) if pending_sources else []
+    for source in sources:
+        if source['status'] == 'ok':
+            run.add_source(source['source'], source['key'], fingerprint=source.get('fingerprint'))
+        elif source['status'] == 'unchanged':
+            run.skip_source(source['source'])
+
+    # New or changed FTP files land one key each, tracked in the run as 'ftp:<remote path>';
+    # files landed by an earlier attempt of this run are already in the sync manifest, which
+    # is only saved once the run state holds their keys
+    ftp_sync = None
+    if FTP_POOL is not None:
+        try:
+            ftp_sync = sync_ftp_directory(FTP_POOL, FTP_SYNC_MANIFEST, FTP_REMOTE_DIR, RAW_BUCKET,
+                                          f'{FTP_PREFIX}{timestamp}/', FTP_PATTERN, save=False)
+        except ftplib.all_errors as e:
+            ftp_sync = {'files': [], 'error': str(e)}
+        for result in ftp_sync['files']:
+            if result['status'] == 'ok':
+                run.add_source(f"ftp:{result['remote']}", result['key'])
+    run.save()
+    if ftp_sync and ftp_sync.get('transferred'):
+        FTP_SYNC_MANIFEST.save()
+
+    # Alerts are buffered for the whole run and sent as one digest per topic, even if a stage fails
+    alerts = AlertAggregator(sns=get_client('sns'), rate_per_minute=ALERT_RATE_PER_MINUTE, burst=ALERT_BURST)
+    try:
+        # Sources whose payload matched a recent fingerprint landed nothing, so no later stage sees them
+        unchanged = [name for name, key in run.sources.items() if key is None]
+        results = {'run': timestamp, 'resumed': run.resumed, 'reports': {},
+                   'unchanged_sources': unchanged, 'skipped_unchanged': len(unchanged)}
+        # Validate each file: one read per object, every rule evaluated in a single pass
+        to_validate = run.keys_at('ingested')
+        if to_validate:
+            registered_fields = get_registered_fields(os.environ['SCHEMA_REGISTRY'], os.environ['SCHEMA_NAME'])
+            reject_prefix = QUARANTINE_PREFIX + 'rejected_rows/' if SPLIT_INVALID_ROWS else None
+            for key in to_validate:
+                report = run_quality_gate(RAW_BUCKET, key, registered_fields, reject_prefix=reject_prefix)
+                results['reports'][key] = report
+                run.advance([key], 'validated', passed=report['passed'])
+            run.save()
+
+        # Route passes and failures in one concurrent, retry-safe move
+        moves = [{'src_bucket': RAW_BUCKET, 'src_key': k, 'dest_bucket': RAW_BUCKET,
+                  'dest_key': (STAGING_PREFIX if run.info(k)['passed'] else QUARANTINE_PREFIX) + k}
+                 for k in run.keys_at('validated')]
+        results['routing'] = move_objects(moves, s3=get_client('s3'), max_workers=ROUTE_MAX_WORKERS)
+        for moved in results['routing']:
+            if moved['status'] == 'failed':
+                continue
+            run.advance([moved['src']], 'routed')
+            if moved['dest'] == QUARANTINE_PREFIX + moved['src']:
+                alerts.add(SNS_TOPIC, 'Data Quarantine', f"{moved['dest']} failed validations", key=moved['dest'])
+        run.save()
+        results['passed'] = [k for k in run.keys_past('routed') if run.info(k)['passed']]
+        results['failed'] = [k for k in run.keys_past('routed') if not run.info(k)['passed']]
+
+        # Transform all staged files as one Spark job on the shared session; the enriched
+        # output is overwritten, so keys staged after an earlier attempt just redo the batch
+        enriched = run.result('transformed')
+        if any(run.stage_of(k) == 'routed' for k in results['passed']):
+            from processing.transformation import TransformationJob
+
+            transformer = TransformationJob(RAW_BUCKET, STAGING_PREFIX, ENRICHED_PREFIX, LOOKUP_JDBC_URL, LOOKUP_TABLE,
+                                            lookup_cache=LOOKUP_CACHE)
+            enriched = transformer.run_batch(results['passed'], timestamp)
+            run.record('transformed', enriched)
+            run.record('curated', None)
+            run.advance(results['passed'], 'transformed')
+            run.save()
+        if enriched:
+            results['enriched_partitions'] = enriched['partitions']
+
+        # Curate enriched to Parquet and register
+        if enriched and run.result('curated') is None:
+            from processing.curated_zone import write_curated_dataset, register_athena_table, table_storage_descriptor
+
+            enriched_key = enriched['path'][len(f's3://{RAW_BUCKET}/'):]
+            curated = write_curated_dataset(RAW_BUCKET, enriched_key, CURATED_PREFIX, timestamp,
+                                            row_group_size=CURATED_ROW_GROUP_SIZE, compression=CURATED_COMPRESSION,
+                                            use_dictionary=CURATED_USE_DICTIONARY,
+                                            target_file_bytes=CURATED_TARGET_FILE_BYTES,
+                                            spark_schema=enriched.get('schema'))
+            schema_changed = register_athena_table(RAW_BUCKET, curated['path'], GLUE_DATABASE, CURATED_TABLE_NAME,
+                                                   columns=curated['columns'])
+
+            # Register only the partitions this run wrote; crawl only when the schema changed
+            results['partitions'] = PARTITION_REGISTRAR.register(
+                [{'values': [p['year'], p['month']],
+                  'location': f"{curated['path']}year={p['year']}/month={p['month']}/"}
+                 for p in curated['partitions']],
+                table_storage_descriptor(curated['path'], curated['columns']),
+            )
+            if schema_changed and GLUE_CRAWLER_NAME:
+                run_glue_crawler(GLUE_CRAWLER_NAME)
+            run.record('curated', {'path': curated['path'], 'rows': curated['rows'], 'files': curated['files']})
+            run.advance(results['passed'], 'curated')
+            run.save()
+
+        # Monitoring checks
+        monitor_glue_jobs(sns_topic_arn=SNS_TOPIC, alerts=alerts, state=GLUE_RUN_STATE,
+                          max_workers=GLUE_SCAN_MAX_WORKERS, metrics_namespace=GLUE_METRICS_NAMESPACE)
+        detect_schema_drift(RAW_BUCKET, [STAGING_PREFIX + k for k in results['passed']],
+                            sns_topic_arn=SNS_TOPIC, alerts=alerts, sample_bytes=DRIFT_SAMPLE_BYTES)
+        run.complete(fingerprints=FINGERPRINTS)
+    finally:
+        alert_report = alerts.flush()
+
+    return {'status':'done','results':results,'sources':sources,'ftp':ftp_sync,'schema_cache':schema_cache.stats(),
+            'alerts':alert_report}
@@ -0,0 +1,144 @@
+"""Module: run_state.py
+Checkpoint manifest for one pipeline run, so a retried invocation resumes from the last completed stage."""
+import json
+import os
+import time
+
+from botocore.exceptions import ClientError
+
+from config.aws_clients import get_client
+
+STAGES = ('ingested', 'validated', 'routed', 'transformed', 'curated')
+POINTER = '_current.json'
+
+class RunState:
+    """Per-key stage progress and per-stage results for the run identified by ``timestamp``,
+    stored as JSON under an S3 prefix (``s3://bucket/prefix/``) or a local directory.
+    A pointer object names the run still in progress, which the next invocation resumes."""
+    def __init__(self, location: str, timestamp: str, data: dict = None):
+        """
+        :param location: ``s3://bucket/prefix/`` or a local directory
+        :param timestamp: Run timestamp the manifest is keyed by
+        :param data: Existing manifest contents (None for a new run)
+        """
+        self.location = location
+        self.timestamp = timestamp
+        self.resumed = data is not None
+        self.data = data or {'timestamp': timestamp, 'status': 'running', 'attempts': 0,
+                             'sources': {}, 'fingerprints': {}, 'keys': {}, 'results': {}}
+
+    # --- storage -----------------------------------------------------------
+    @staticmethod
+    def _read(location: str, name: str):
+        if location.startswith('s3://'):
+            bucket, _, prefix = location[len('s3://'):].partition('/')
+            try:
+                return json.loads(get_client('s3').get_object(Bucket=bucket, Key=prefix + name)['Body'].read())
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                    return None
+                raise
+        path = os.path.join(location, name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write(location: str, name: str, data) -> None:
+        body = json.dumps(data)
+        if location.startswith('s3://'):
+            bucket, _, prefix = location[len('s3://'):].partition('/')
+            get_client('s3').put_object(Bucket=bucket, Key=prefix + name, Body=body, ContentType='application/json')
+            return
+        path = os.path.join(location, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f'{path}.tmp', 'w') as f:
+            f.write(body)
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def open(cls, location: str, timestamp: str = None, max_attempts: int = 3) -> 'RunState':
+        """Resume ``timestamp`` (or the unfinished run named by the pointer), or start a new run.
+        A run that has already been attempted ``max_attempts`` times is abandoned so a
+        persistent failure can't block fresh ingestion forever.
+        """
+        if timestamp is None:
+            pointer = cls._read(location, POINTER)
+            timestamp = pointer['timestamp'] if pointer else None
+        data = cls._read(location, f'{timestamp}.json') if timestamp else None
+        if data and (data['status'] != 'running' or data['attempts'] >= max_attempts):
+            if data['status'] == 'running':
+                data['status'] = 'abandoned'
+                cls._write(location, f'{timestamp}.json', data)
+            data, timestamp = None, None
+        run = cls(location, timestamp or time.strftime('%Y/%m/%d/%H%M%S'), data)
+        run.data['attempts'] += 1
+        run.save()
+        cls._write(location, POINTER, {'timestamp': run.timestamp})
+        return run
+
+    def save(self) -> None:
+        self._write(self.location, f'{self.timestamp}.json', self.data)
+
+    def complete(self, fingerprints=None) -> None:
+        """Mark the run finished and clear the pointer so the next invocation starts fresh.
+        :param fingerprints: Optional FingerprintIndex; the fingerprints of the payloads this
+                             run landed are added and saved only now, so a run that fails
+                             downstream doesn't make its retry skip them as unchanged
+        """
+        if fingerprints is not None:
+            for name, digest in self.data.get('fingerprints', {}).items():
+                fingerprints.add(name, digest)
+            fingerprints.save()
+        self.data['status'] = 'complete'
+        self.save()
+        self._write(self.location, POINTER, {'timestamp': None})
+
+    # --- progress ----------------------------------------------------------
+    @property
+    def sources(self) -> dict:
+        """{source name: landed key, or None if skipped as unchanged} for sources done in this run."""
+        return self.data['sources']
+
+    def add_source(self, name: str, key: str, fingerprint: str = None) -> None:
+        """Record a landed source; its content ``fingerprint`` is committed by complete()."""
+        self.data['sources'][name] = key
+        if fingerprint:
+            self.data.setdefault('fingerprints', {})[name] = fingerprint
+        self.advance([key], 'ingested')
+
+    def skip_source(self, name: str) -> None:
+        """Record a source whose payload was unchanged, so a resumed run doesn't fetch it again."""
+        self.data['sources'][name] = None
+
+    def stage_of(self, key: str):
+        return self.data['keys'].get(key, {}).get('stage')
+
+    def info(self, key: str) -> dict:
+        return self.data['keys'].get(key, {})
+
+    def advance(self, keys: list, stage: str, **info) -> None:
+        """Record that ``keys`` completed ``stage``; progress never moves backwards."""
+        rank = STAGES.index(stage)
+        for key in keys:
+            entry = self.data['keys'].setdefault(key, {'stage': stage})
+            if STAGES.index(entry['stage']) < rank:
+                entry['stage'] = stage
+            entry.update(info)
+
+    def keys_at(self, stage: str) -> list:
+        """Keys whose last completed stage is exactly ``stage``."""
+        return [key for key, entry in self.data['keys'].items() if entry['stage'] == stage]
+
+    def keys_past(self, stage: str) -> list:
+        """Keys that have completed ``stage`` or any later one."""
+        rank = STAGES.index(stage)
+        return [key for key, entry in self.data['keys'].items() if STAGES.index(entry['stage']) >= rank]
+
+    def result(self, stage: str):
+        """Run-level output recorded for a whole-batch stage (transformed, curated), or None."""
+        return self.data['results'].get(stage)
+
+    def record(self, stage: str, result) -> None:
+        self.data['results'][stage] = result
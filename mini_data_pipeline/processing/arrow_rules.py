@@ -0,0 +1,62 @@
+"""Module: arrow_rules.py
+Vectorized record-rule backend on pyarrow.compute/NumPy, with per-row failure masks."""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from processing.quality_gate import EMAIL_PATTERN, REQUIRED_FIELDS
+
+def records_to_table(records: list) -> pa.Table:
+    """Build an Arrow table from parsed records, unioning fields across all rows
+    (raises pa.ArrowInvalid on mixed column types, pa.ArrowTypeError if the records
+    aren't all JSON objects)."""
+    if not records:
+        return pa.table({})
+    array = pa.array(records)
+    if not pa.types.is_struct(array.type):
+        raise pa.ArrowTypeError(f"Records must be JSON objects, got {array.type}")
+    return pa.Table.from_struct_array(array)
+
+def _null_mask(table: pa.Table, name: str) -> np.ndarray:
+    if name not in table.column_names:
+        return np.ones(table.num_rows, dtype=bool)
+    return pc.is_null(table[name]).to_numpy(zero_copy_only=False)
+
+def _email_fail_mask(table: pa.Table) -> np.ndarray:
+    if 'email' not in table.column_names or not pa.types.is_string(table.schema.field('email').type):
+        return np.ones(table.num_rows, dtype=bool)
+    matches = pc.fill_null(pc.match_substring_regex(table['email'], EMAIL_PATTERN), False)
+    return ~matches.to_numpy(zero_copy_only=False)
+
+def row_failure_masks(table: pa.Table) -> dict:
+    """Return a boolean NumPy mask per row-level rule (True marks a failing row)."""
+    null_rows = np.zeros(table.num_rows, dtype=bool)
+    for field in REQUIRED_FIELDS:
+        null_rows |= _null_mask(table, field)
+    return {'not_null': null_rows, 'email': _email_fail_mask(table)}
+
+def evaluate_table(table: pa.Table, registered_fields=None):
+    """Evaluate the quality-gate rules column-wise.
+    :param table: Arrow table of records
+    :param registered_fields: Allowed field names (schema rule is skipped if None)
+    :return: (per-rule results, combined row failure mask)
+    """
+    masks = row_failure_masks(table)
+    total = table.num_rows
+    id_present = total - int(_null_mask(table, 'id').sum())
+    completeness = id_present / total if total else 0.0
+    unregistered = sorted(set(table.column_names) - set(registered_fields)) if registered_fields is not None else []
+    rules = {
+        'schema': {'passed': not unregistered, 'unregistered_fields': unregistered, 'non_object_rows': 0,
+                   'skipped': registered_fields is None},
+        'not_null': {'passed': not masks['not_null'].any(), 'failed': int(masks['not_null'].sum())},
+        'email': {'passed': not masks['email'].any(), 'failed': int(masks['email'].sum())},
+        'size': {'passed': total > 0, 'records': total},
+        'completeness': {'passed': completeness == 1.0, 'column': 'id', 'ratio': completeness},
+    }
+    return rules, masks['not_null'] | masks['email']
+
+def split_table(table: pa.Table, failed_mask: np.ndarray):
+    """Split a table into (valid rows, invalid rows) using a row failure mask."""
+    failed = pa.array(failed_mask)
+    return table.filter(pc.invert(failed)), table.filter(failed)
@@ -0,0 +1,224 @@
+"""Module: compaction.py
+Merges small curated Parquet files into right-sized, sorted files per year/month partition."""
+import json
+import os
+import posixpath
+import re
+import time
+
+from botocore.exceptions import ClientError
+
+from config.aws_clients import get_client
+from processing.curated_zone import get_filesystem, update_dataset_metadata
+
+_PARTITION_RE = re.compile(r'year=([^/]+)/month=([^/]+)/')
+
+def list_curated_files(bucket: str, curated_prefix: str, s3=None) -> dict:
+    """Group every Parquet object under the curated prefix by (year, month) partition.
+    :return: {(year, month): [{'key', 'size'}, ...]}
+    """
+    s3 = s3 or get_client('s3')
+    partitions = {}
+    for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=curated_prefix):
+        for obj in page.get('Contents', []):
+            key = obj['Key']
+            match = _PARTITION_RE.search(key)
+            if not match or not key.endswith('.parquet') or posixpath.basename(key).startswith(('_', '.')):
+                continue
+            partitions.setdefault(match.groups(), []).append({'key': key, 'size': obj['Size']})
+    return partitions
+
+def _bin_pack(files: list, target_file_bytes: int) -> list:
+    """Group files into bins whose combined size stays at or below the target (largest first)."""
+    bins = []
+    for f in sorted(files, key=lambda f: f['size'], reverse=True):
+        for b in bins:
+            if b['bytes'] + f['size'] <= target_file_bytes:
+                b['files'].append(f)
+                b['bytes'] += f['size']
+                break
+        else:
+            bins.append({'files': [f], 'bytes': f['size']})
+    return bins
+
+def plan_compaction(partitions: dict, small_file_bytes: int, target_file_bytes: int) -> list:
+    """Choose partitions that hold more than one small file and how to merge them.
+    :return: [{'partition', 'keep', 'bins', 'files_before', 'files_after'}]
+    """
+    plan = []
+    for (year, month), files in sorted(partitions.items()):
+        small = [f for f in files if f['size'] < small_file_bytes]
+        if len(small) < 2:
+            continue
+        keep = [f for f in files if f['size'] >= small_file_bytes]
+        bins = _bin_pack(small, target_file_bytes)
+        plan.append({
+            'partition': {'year': year, 'month': month},
+            'keep': keep,
+            'bins': bins,
+            'files_before': len(files),
+            'files_after': len(keep) + len(bins),
+        })
+    return plan
+
+def _first_key_min(fragment, name: str):
+    """Smallest value of ``name`` in a fragment's footer statistics, or None if unknown."""
+    metadata = fragment.metadata
+    if name not in metadata.schema.names:
+        return None
+    column = metadata.schema.names.index(name)
+    values = [metadata.row_group(i).column(column).statistics for i in range(metadata.num_row_groups)]
+    values = [stats.min for stats in values if stats is not None and stats.has_min_max]
+    return min(values) if values else None
+
+def _merge_bin(fs, bucket: str, files: list, dest_prefix: str, name: str,
+               sort_keys: tuple, compression: str) -> int:
+    """Stream one bin of small files into a single Parquet file, one input file in memory at a time.
+    Each input is sorted on its own and inputs are written in order of their smallest key
+    (from footer statistics), so row groups stay clustered by key without loading the whole bin.
+    The read schema is unified across every file (numeric types widen), so columns that
+    only some files carry are kept. Raises RuntimeError if the rows written differ from
+    the row counts in the input footers.
+    :return: Rows written
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    paths = [f"{bucket}/{f['key']}" for f in files]
+    fragments = list(ds.dataset(paths, filesystem=fs, format='parquet').get_fragments())
+    schema = pa.unify_schemas([fragment.physical_schema for fragment in fragments], promote_options='permissive')
+    expected_rows = sum(fragment.metadata.num_rows for fragment in fragments)
+    sort_by = [(key, 'ascending') for key in sort_keys if key in schema.names]
+    if sort_by:
+        lows = {fragment.path: _first_key_min(fragment, sort_by[0][0]) for fragment in fragments}
+        fragments.sort(key=lambda fragment: (lows[fragment.path] is None, lows[fragment.path]))
+    dataset = ds.dataset(paths, schema=schema, filesystem=fs, format='parquet')
+    by_path = {fragment.path: fragment for fragment in dataset.get_fragments()}
+
+    def batches():
+        for fragment in fragments:
+            table = by_path[fragment.path].to_table(schema=schema)
+            yield from (table.sort_by(sort_by) if sort_by else table).to_batches()
+
+    written = []
+    parquet_format = ds.ParquetFileFormat()
+    ds.write_dataset(batches(), f'{bucket}/{dest_prefix}', schema=schema, format=parquet_format, filesystem=fs,
+                     basename_template=f'{name}-{{i}}.parquet',
+                     file_options=parquet_format.make_write_options(compression=compression),
+                     existing_data_behavior='overwrite_or_ignore',
+                     file_visitor=lambda written_file: written.append(written_file.metadata.num_rows))
+    if sum(written) != expected_rows:
+        raise RuntimeError(f"Compacting {len(files)} files into {dest_prefix} wrote {sum(written)} rows, "
+                           f"expected {expected_rows}")
+    return expected_rows
+
+def _journal_key(curated_prefix: str) -> str:
+    return f'{curated_prefix}_compaction/journal.json'
+
+def _read_journal(s3, bucket: str, curated_prefix: str):
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=_journal_key(curated_prefix))['Body'].read())
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise
+
+def _write_journal(s3, bucket: str, curated_prefix: str, journal: dict) -> None:
+    s3.put_object(Bucket=bucket, Key=_journal_key(curated_prefix), Body=json.dumps(journal),
+                  ContentType='application/json')
+
+def _delete_keys(s3, bucket: str, keys: list) -> None:
+    for start in range(0, len(keys), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={
+            'Objects': [{'Key': key} for key in keys[start:start + 1000]], 'Quiet': True})
+
+def _list_keys(s3, bucket: str, prefix: str) -> list:
+    return [obj['Key'] for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix)
+            for obj in page.get('Contents', []) if obj['Key'].startswith(prefix)]
+
+def _finish_journal(s3, fs, bucket: str, curated_prefix: str, journal: dict) -> str:
+    """Resolve a partition swap left behind by an earlier run: once every merged file was
+    written and verified ('committing') the inputs are deleted, otherwise ('writing') the
+    partial outputs are. Either way the ``_metadata`` summary is rebuilt and the journal removed.
+    :return: 'completed' or 'rolled_back'
+    """
+    if journal['state'] == 'committing':
+        _delete_keys(s3, bucket, journal['inputs'])
+        outcome = 'completed'
+    else:
+        _delete_keys(s3, bucket, _list_keys(s3, bucket, journal['outputs_prefix']))
+        outcome = 'rolled_back'
+    update_dataset_metadata(fs, f'{bucket}/{curated_prefix}')
+    s3.delete_object(Bucket=bucket, Key=_journal_key(curated_prefix))
+    return outcome
+
+def compact_curated_zone(bucket: str, curated_prefix: str,
+                         small_file_bytes: int = 32 * 1024 * 1024, target_file_bytes: int = 128 * 1024 * 1024,
+                         sort_keys: tuple = ('id', 'timestamp'), compression: str = 'zstd',
+                         dry_run: bool = False, filesystem=None) -> dict:
+    """Compact small Parquet files in every curated year/month partition.
+    Merged files are written into the partition's own directory as
+    ``compacted-{run_id}-{bin}-{i}.parquet``, so Glue partition locations never change.
+    Each partition is swapped under a journal (``{curated_prefix}_compaction/journal.json``)
+    naming its inputs and outputs: it is written before the merge ('writing') and marked
+    'committing' once every bin wrote as many rows as it read; only then are the inputs
+    deleted and the journal removed. A failed merge deletes its partial outputs, and a run
+    that died mid-swap is finished (or rolled back) by the next run before it plans
+    anything, so merged rows never stay duplicated or get compacted twice. S3 can't delete
+    many objects atomically, so a query during the delete itself may still see both copies.
+    The dataset's ``_metadata`` summary is rebuilt after each partition.
+    :param bucket: S3 bucket name
+    :param curated_prefix: Curated zone prefix
+    :param small_file_bytes: Files below this size are compaction candidates
+    :param target_file_bytes: Upper bound on the size of merged files
+    :param sort_keys: Columns each merged file is sorted by (missing ones are skipped)
+    :param compression: Parquet codec for merged files
+    :param dry_run: Only report the plan, without writing or deleting
+    :param filesystem: pyarrow filesystem (defaults to the shared S3 filesystem)
+    :return: {'run_id', 'dry_run', 'recovered' (outcome of a leftover journal, or None),
+              'partitions': [...], 'files_before', 'files_after'}
+    """
+    s3 = get_client('s3')
+    fs = filesystem or get_filesystem()
+    journal = _read_journal(s3, bucket, curated_prefix)
+    recovered = _finish_journal(s3, fs, bucket, curated_prefix, journal) if journal and not dry_run else None
+    plan = plan_compaction(list_curated_files(bucket, curated_prefix, s3=s3), small_file_bytes, target_file_bytes)
+    run_id = time.strftime('%Y%m%d%H%M%S')
+    report = {
+        'run_id': run_id,
+        'dry_run': dry_run,
+        'recovered': recovered,
+        'partitions': [{**p['partition'], 'files_before': p['files_before'], 'files_after': p['files_after']}
+                       for p in plan],
+        'files_before': sum(p['files_before'] for p in plan),
+        'files_after': sum(p['files_after'] for p in plan),
+    }
+    if dry_run or not plan:
+        return report
+
+    for p in plan:
+        part = p['partition']
+        dest_prefix = f"{curated_prefix}year={part['year']}/month={part['month']}/"
+        journal = {'run_id': run_id, 'state': 'writing', 'outputs_prefix': f'{dest_prefix}compacted-{run_id}-',
+                   'inputs': [f['key'] for b in p['bins'] for f in b['files']]}
+        _write_journal(s3, bucket, curated_prefix, journal)
+        try:
+            for i, b in enumerate(p['bins']):
+                _merge_bin(fs, bucket, b['files'], dest_prefix, f'compacted-{run_id}-{i:05d}', sort_keys, compression)
+        except Exception:
+            _finish_journal(s3, fs, bucket, curated_prefix, journal)
+            raise
+        journal['state'] = 'committing'
+        _write_journal(s3, bucket, curated_prefix, journal)
+        _finish_journal(s3, fs, bucket, curated_prefix, journal)
+    return report
+
+def handler(event, context):
+    """Lambda/scheduled entry point; pass {'dry_run': true} to only report the plan."""
+    return compact_curated_zone(
+        os.environ['RAW_BUCKET'],
+        os.environ['CURATED_PREFIX'],
+        small_file_bytes=int(os.environ.get('COMPACTION_SMALL_FILE_BYTES', str(32 * 1024 * 1024))),
+        target_file_bytes=int(os.environ.get('COMPACTION_TARGET_FILE_BYTES', str(128 * 1024 * 1024))),
+        dry_run=bool((event or {}).get('dry_run', False)),
+    )
@@ -1,34 +1,295 @@
 """Module: curated_zone.py
 Handles writing Parquet to the curated zone and registering Athena tables."""
-import boto3
-import pyarrow.parquet as pq
+import posixpath
+
 import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.json as pj
+import pyarrow.parquet as pq
+
+from config.aws_clients import get_client
+
+PARTITION_COLS = ('year', 'month')
+METADATA_FILE = '_metadata'
+# How Spark's JSON writer renders each type; dates and binary arrive as strings and are
+# read as such (dates are cast after parsing, binary stays base64 text)
+_SPARK_TYPES = {
+    'string': pa.string(), 'boolean': pa.bool_(), 'byte': pa.int8(), 'short': pa.int16(),
+    'integer': pa.int32(), 'long': pa.int64(), 'float': pa.float32(), 'double': pa.float64(),
+    'timestamp': pa.timestamp('us', tz='UTC'), 'timestamp_ntz': pa.timestamp('us'),
+    'date': pa.date32(), 'binary': pa.string(), 'void': pa.null(),
+}
+_filesystem = None
+
+def get_filesystem() -> pafs.FileSystem:
+    """Return the process-wide S3 filesystem used for curated-zone reads and writes."""
+    global _filesystem
+    if _filesystem is None:
+        _filesystem = pafs.S3FileSystem()
+    return _filesystem
+
+def _partition_values(path: str) -> dict:
+    """Parse hive-style 'name=value' directories out of a path."""
+    return dict(part.split('=', 1) for part in path.split('/') if '=' in part)
+
+def _list_json_files(fs, root: str) -> list:
+    selector = pafs.FileSelector(root, recursive=True, allow_not_found=True)
+    return sorted(
+        info.path for info in fs.get_file_info(selector)
+        if info.type == pafs.FileType.File and not posixpath.basename(info.path).startswith(('_', '.'))
+        and '.json' in posixpath.basename(info.path)
+    )
+
+def _with_partitions(batch: pa.RecordBatch, values: dict) -> pa.RecordBatch:
+    """Re-attach partition columns that Spark's partitionBy moved into the path."""
+    for name in PARTITION_COLS:
+        if name not in batch.schema.names:
+            batch = batch.append_column(name, pa.array([values.get(name)] * batch.num_rows, pa.string()))
+    return batch
+
+def spark_type_to_arrow(spark_type) -> pa.DataType:
+    """Map a Spark type (as in ``StructType.jsonValue()``) to the Arrow type of the curated column."""
+    if isinstance(spark_type, dict):
+        if spark_type['type'] == 'struct':
+            return pa.struct([pa.field(f['name'], spark_type_to_arrow(f['type'])) for f in spark_type['fields']])
+        if spark_type['type'] == 'array':
+            return pa.list_(spark_type_to_arrow(spark_type['elementType']))
+        raise ValueError(f"Unsupported Spark type in enriched data: {spark_type['type']}")
+    if spark_type.startswith('decimal('):
+        precision, scale = spark_type[len('decimal('):-1].split(',')
+        return pa.decimal128(int(precision), int(scale))
+    if spark_type not in _SPARK_TYPES:
+        raise ValueError(f"Unsupported Spark type in enriched data: {spark_type}")
+    return _SPARK_TYPES[spark_type]
+
+def _json_type(arrow_type: pa.DataType) -> pa.DataType:
+    """Type the JSON parser should read for ``arrow_type`` (it can't parse date strings)."""
+    if pa.types.is_date(arrow_type):
+        return pa.string()
+    if pa.types.is_struct(arrow_type):
+        return pa.struct([field.with_type(_json_type(field.type)) for field in arrow_type])
+    if pa.types.is_list(arrow_type):
+        return pa.list_(_json_type(arrow_type.value_type))
+    return arrow_type
+
+def _infer_file_schema(fs, files: list, read_options) -> pa.Schema:
+    """Unify the schemas inferred from the first block of every file, widening numeric
+    types (int64 + double -> double); incompatible types raise ValueError."""
+    schemas = []
+    for path in files:
+        with fs.open_input_stream(path) as stream:
+            schemas.append(pj.open_json(stream, read_options=read_options).schema)
+    try:
+        return pa.unify_schemas(schemas, promote_options='permissive')
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"Enriched files under {posixpath.dirname(files[0])} disagree on column types: {e}") from e
+
+def iter_enriched_batches(fs, root: str, block_size: int = 8 * 1024 * 1024, spark_schema: dict = None):
+    """Stream every NDJSON file under ``root`` as record batches with one schema.
+    The schema is ``spark_schema`` (the writer's ``StructType.jsonValue()``) when given;
+    otherwise it is unified across the first block of every file. Spark omits null fields,
+    so a column that is null in some files is still kept. Every file is parsed against the
+    schema, and a field outside it or a value that doesn't fit its type raises ArrowInvalid
+    instead of being dropped.
+    :return: (schema, batch iterator), or (None, empty iterator) when there is no input
+    """
+    files = _list_json_files(fs, root)
+    if not files:
+        return None, iter(())
+    read_options = pj.ReadOptions(block_size=block_size)
+
+    if spark_schema is not None:
+        file_schema = pa.schema([pa.field(f['name'], spark_type_to_arrow(f['type']))
+                                 for f in spark_schema['fields'] if f['name'] not in PARTITION_COLS])
+    else:
+        file_schema = _infer_file_schema(fs, files, read_options)
+    json_schema = pa.schema([field.with_type(_json_type(field.type)) for field in file_schema])
+    parse_options = pj.ParseOptions(explicit_schema=json_schema, unexpected_field_behavior='error')
+    schema = file_schema
+    for name in PARTITION_COLS:
+        if name not in schema.names:
+            schema = schema.append(pa.field(name, pa.string()))
+
+    def batches():
+        for path in files:
+            reader = pj.open_json(fs.open_input_stream(path), read_options=read_options, parse_options=parse_options)
+            values = _partition_values(posixpath.relpath(path, root))
+            for batch in reader:
+                batch = _with_partitions(batch, values).select(schema.names)
+                yield batch if json_schema.equals(file_schema) else batch.cast(schema)
+
+    return schema, batches()
+
+def _list_data_files(fs, base_dir: str) -> list:
+    """Parquet data files under the dataset root, relative to it (hidden files and dirs skipped)."""
+    selector = pafs.FileSelector(base_dir.rstrip('/'), recursive=True, allow_not_found=True)
+    relative = (posixpath.relpath(info.path, base_dir) for info in fs.get_file_info(selector)
+                if info.type == pafs.FileType.File and info.path.endswith('.parquet'))
+    return sorted(path for path in relative if not any(part.startswith(('_', '.')) for part in path.split('/')))
+
+def _metadata_file_paths(metadata) -> set:
+    return {metadata.row_group(i).column(0).file_path for i in range(metadata.num_row_groups)}
 
-def write_curated_parquet(bucket: str, enriched_key: str, curated_prefix: str, timestamp: str) -> str:
+def update_dataset_metadata(fs, base_dir: str, new_files: list = None) -> bool:
+    """Keep the dataset-level ``_metadata`` summary at the root ``base_dir`` (ending in '/')
+    in line with the Parquet files under it, with file paths relative to the root so
+    ``pyarrow.dataset.parquet_dataset`` (and engines that read the summary) resolve them.
+    ``new_files`` (footers of files just written, paths already relative) are appended to
+    the existing summary when it lists exactly the other files and has the same schema.
+    Otherwise (a retried run, compaction, or no ``new_files``) the summary is rebuilt from
+    every file's footer. Files with differing schemas can't share one summary, so the
+    stale one is removed instead.
+    :return: Whether a summary was written
+    """
+    path = f'{base_dir}{METADATA_FILE}'
+    files = _list_data_files(fs, base_dir)
+    existing = pq.read_metadata(path, filesystem=fs) if fs.get_file_info(path).type == pafs.FileType.File else None
+    new_paths = {metadata.row_group(0).column(0).file_path for metadata in new_files or () if metadata.num_row_groups}
+    if new_files and existing is not None and all(m.schema.equals(existing.schema) for m in new_files):
+        old_paths = _metadata_file_paths(existing)
+        if not old_paths & new_paths and old_paths | new_paths == set(files):
+            pq.write_metadata(existing.schema.to_arrow_schema(), path, metadata_collector=[existing, *new_files],
+                              filesystem=fs)
+            return True
+
+    footers = []
+    for relative in files:
+        footer = pq.read_metadata(f'{base_dir}{relative}', filesystem=fs)
+        footer.set_file_path(relative)
+        footers.append(footer)
+    if not footers or any(not footer.schema.equals(footers[0].schema) for footer in footers):
+        if existing is not None:
+            fs.delete_file(path)
+        return False
+    pq.write_metadata(footers[0].schema.to_arrow_schema(), path, metadata_collector=footers, filesystem=fs)
+    return True
+
+def run_file_tag(timestamp: str) -> str:
+    """File-name tag for a run timestamp: '2024/02/01/000000' -> '20240201000000'."""
+    return timestamp.replace('/', '')
+
+def write_curated_dataset(bucket: str, enriched_key: str, curated_prefix: str, timestamp: str,
+                          row_group_size: int = 128 * 1024, compression: str = 'zstd',
+                          use_dictionary: bool = True, target_file_bytes: int = 128 * 1024 * 1024,
+                          filesystem=None, spark_schema: dict = None) -> dict:
+    """Stream enriched NDJSON into partitioned Parquet without materializing the table,
+    and update the dataset's ``{curated_prefix}_metadata`` summary for query planning
+    (see update_dataset_metadata).
+    Every run writes into the same ``{curated_prefix}year=Y/month=M/`` directories with
+    file names unique to the run (``part-{run}-{i}.parquet``), so a Glue partition keeps
+    one location and later runs add files to it instead of hiding earlier ones.
+    :param bucket: S3 bucket name
+    :param enriched_key: Prefix of the enriched JSON output
+    :param curated_prefix: Curated zone prefix
+    :param timestamp: Run timestamp (names this run's files)
+    :param row_group_size: Rows per Parquet row group
+    :param compression: Parquet codec ('zstd', 'snappy', ...)
+    :param use_dictionary: Whether to dictionary-encode columns
+    :param target_file_bytes: Approximate file size, converted to rows per file from the
+                              in-memory size of the first batch
+    :param filesystem: pyarrow filesystem (defaults to the shared S3 filesystem)
+    :param spark_schema: Schema of the enriched DataFrame (``StructType.jsonValue()``); inferred if None
+    :return: {'path', 'files', 'rows', 'partitions', 'columns', 'metadata' (whether the summary was written)}
+    """
+    fs = filesystem or get_filesystem()
+    run_tag = run_file_tag(timestamp)
+    base_dir = f'{bucket}/{curated_prefix}'
+    result = {'path': f's3://{bucket}/{curated_prefix}', 'files': 0, 'rows': 0, 'partitions': [], 'columns': [],
+              'metadata': False}
+
+    schema, batches = iter_enriched_batches(fs, f'{bucket}/{enriched_key}'.rstrip('/'), spark_schema=spark_schema)
+    first = next(batches, None)
+    if first is None:
+        return result
+
+    def all_batches():
+        yield first
+        yield from batches
+
+    avg_row_bytes = max(1, first.nbytes // max(1, first.num_rows))
+    rows_per_file = max(row_group_size, target_file_bytes // avg_row_bytes)
+    parquet_format = ds.ParquetFileFormat()
+    collected, partitions, written = [], set(), set()
+
+    def visit(written_file):
+        written.add(written_file.path)
+        relative = posixpath.relpath(written_file.path, base_dir)
+        written_file.metadata.set_file_path(relative)
+        collected.append(written_file.metadata)
+        values = _partition_values(relative)
+        partitions.add(tuple(values.get(name) for name in PARTITION_COLS))
+        result['rows'] += written_file.metadata.num_rows
+
+    ds.write_dataset(
+        all_batches(), base_dir, schema=schema, format=parquet_format, filesystem=fs,
+        partitioning=ds.partitioning(pa.schema([schema.field(name) for name in PARTITION_COLS]), flavor='hive'),
+        file_options=parquet_format.make_write_options(compression=compression, use_dictionary=use_dictionary),
+        max_rows_per_group=row_group_size, min_rows_per_group=min(row_group_size, rows_per_file),
+        max_rows_per_file=rows_per_file, file_visitor=visit,
+        basename_template=f'part-{run_tag}-{{i}}.parquet', existing_data_behavior='overwrite_or_ignore',
+    )
+
+    # A retried run rewrites its own file names; drop any of them this attempt didn't produce
+    for values in partitions:
+        partition_dir = base_dir + '/'.join(f'{name}={value}' for name, value in zip(PARTITION_COLS, values))
+        for info in fs.get_file_info(pafs.FileSelector(partition_dir, allow_not_found=True)):
+            if posixpath.basename(info.path).startswith(f'part-{run_tag}-') and info.path not in written:
+                fs.delete_file(info.path)
+
+    file_schema = pa.schema([field for field in schema if field.name not in PARTITION_COLS])
+    result.update(
+        metadata=update_dataset_metadata(fs, base_dir, collected),
+        files=len(collected),
+        partitions=[dict(zip(PARTITION_COLS, values)) for values in sorted(partitions)],
+        columns=[(field.name, str(field.type)) for field in file_schema],
+    )
+    return result
+
+def write_curated_parquet(bucket: str, enriched_key: str, curated_prefix: str, timestamp: str, **kwargs) -> str:
     """Read JSON, convert to Parquet, store under curated prefix.
     :return: S3 path of Parquet files"""
-    import s3fs
-    fs = s3fs.S3FileSystem()
-    input_path = f's3://{bucket}/{enriched_key}'
-    table = pq.read_table(input_path, filesystem=fs)
-    out_prefix = f'{curated_prefix}{timestamp}/'
-    out_path = f's3://{bucket}/{out_prefix}'
-    pq.write_to_dataset(table, root_path=out_path, filesystem=fs, partition_cols=['year','month'])
-    return out_path
-
-def register_athena_table(bucket: str, parquet_path: str, database: str, table: str):
-    """Create or update a Glue Data Catalog table over Parquet data so it's queryable from Athena."""
-    glue = boto3.client('glue')
+    return write_curated_dataset(bucket, enriched_key, curated_prefix, timestamp, **kwargs)['path']
+
+_HIVE_TYPES = {
+    'string': 'string', 'large_string': 'string', 'bool': 'boolean',
+    'int8': 'tinyint', 'int16': 'smallint', 'int32': 'int', 'int64': 'bigint',
+    'float': 'float', 'double': 'double', 'date32[day]': 'date',
+}
+
+def hive_columns(columns: list) -> list:
+    """Map (name, Arrow type string) pairs to Glue column definitions."""
+    def hive_type(arrow_type):
+        if arrow_type.startswith('timestamp'):
+            return 'timestamp'
+        if arrow_type.startswith('decimal128('):
+            return 'decimal' + arrow_type[len('decimal128'):].replace(' ', '')
+        return _HIVE_TYPES.get(arrow_type, 'string')
+    return [{'Name': name, 'Type': hive_type(arrow_type)} for name, arrow_type in columns]
+
+def table_storage_descriptor(location: str, columns: list = None) -> dict:
+    """Parquet StorageDescriptor shared by the curated table and its partitions."""
+    descriptor = {
+        'Location': location,
+        'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
+        'OutputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
+        'SerdeInfo': {
+            'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe',
+        },
+    }
+    if columns is not None:
+        descriptor['Columns'] = hive_columns(columns)
+    return descriptor
+
+def register_athena_table(bucket: str, parquet_path: str, database: str, table: str, columns: list = None) -> bool:
+    """Create or update a Glue Data Catalog table over Parquet data so it's queryable from Athena.
+    When ``columns`` ((name, Arrow type) pairs) are given, an existing table is only
+    updated if its column set differs.
+    :return: True if the table was created or its schema updated"""
+    glue = get_client('glue')
     table_input = {
         'Name': table,
-        'StorageDescriptor': {
-            'Location': parquet_path,
-            'InputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetInputFormat',
-            'OutputFormat': 'org.apache.hadoop.hive.ql.io.parquet.MapredParquetOutputFormat',
-            'SerdeInfo': {
-                'SerializationLibrary': 'org.apache.hadoop.hive.ql.io.parquet.serde.ParquetHiveSerDe',
-            },
-        },
+        'StorageDescriptor': table_storage_descriptor(parquet_path, columns),
         'PartitionKeys': [
             {'Name': 'year', 'Type': 'string'},
             {'Name': 'month', 'Type': 'string'},
@@ -38,5 +299,11 @@ def register_athena_table(bucket: str, parquet_path: str, database: str, table:
 
     try:
         glue.create_table(DatabaseName=database, TableInput=table_input)
+        return True
     except glue.exceptions.AlreadyExistsException:
+        if columns is not None:
+            existing = glue.get_table(DatabaseName=database, Name=table)['Table']['StorageDescriptor']
+            if existing.get('Columns') == table_input['StorageDescriptor']['Columns']:
+                return False
         glue.update_table(DatabaseName=database, TableInput=table_input)
+        return True
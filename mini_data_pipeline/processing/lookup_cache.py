@@ -0,0 +1,267 @@
+"""Module: lookup_cache.py
+Local Parquet snapshot of the JDBC lookup table, with TTL/incremental refresh,
+automatic broadcast joins and a pure Arrow/dict join path for small non-Spark runs."""
+import datetime
+import decimal
+import json
+import os
+import shutil
+import time
+
+def _high_water_type(value) -> str:
+    if isinstance(value, datetime.datetime):
+        return 'timestamptz' if value.tzinfo is not None else 'timestamp'
+    if isinstance(value, datetime.date):
+        return 'date'
+    if isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+        return 'number'
+    return 'string'
+
+def _parse_high_water(meta: dict):
+    """Return the stored high-water mark as its original Python type (None if unset)."""
+    value, kind = meta.get('high_water'), meta.get('high_water_type', 'string')
+    if value is None:
+        return None
+    if kind in ('timestamp', 'timestamptz'):
+        return datetime.datetime.fromisoformat(value)
+    if kind == 'date':
+        return datetime.date.fromisoformat(value)
+    if kind == 'number':
+        return decimal.Decimal(value)
+    return value
+
+def sql_literal(value) -> str:
+    """Format a high-water value as a typed SQL literal (quotes escaped), for
+    JDBC subqueries that cannot take bound parameters."""
+    kind = _high_water_type(value)
+    if kind == 'number':
+        return str(value)
+    text = value.isoformat(sep=' ') if kind in ('timestamp', 'timestamptz') else str(value)
+    quoted = "'" + text.replace("'", "''") + "'"
+    return {'timestamp': f'TIMESTAMP {quoted}', 'timestamptz': f'TIMESTAMP WITH TIME ZONE {quoted}',
+            'date': f'DATE {quoted}'}.get(kind, quoted)
+
+class LookupCache:
+    """Keeps a snapshot of ``table`` under ``snapshot_dir`` and serves it to Spark or Python callers."""
+    def __init__(self, jdbc_url: str, table: str, snapshot_dir: str = '/tmp/lookup_cache',
+                 ttl: float = 3600.0, key_column: str = 'id', updated_at_column: str = None,
+                 partition_column: str = None, num_partitions: int = None,
+                 lower_bound=None, upper_bound=None,
+                 broadcast_threshold_bytes: int = 10 * 1024 * 1024,
+                 driver: str = 'org.postgresql.Driver', connect=None):
+        """
+        :param jdbc_url: JDBC URL of the lookup database
+        :param table: Lookup table name
+        :param snapshot_dir: Local directory holding the Parquet snapshot and its metadata
+        :param ttl: Seconds before the snapshot is considered stale
+        :param key_column: Join key
+        :param updated_at_column: If set, stale snapshots are refreshed incrementally from rows
+                                  newer than the last seen value (plus the current key list,
+                                  to drop deleted rows) instead of re-reading the table
+        :param partition_column: Numeric/date column for partitioned JDBC reads
+        :param num_partitions: Number of parallel JDBC partitions
+        :param lower_bound: Lower bound of ``partition_column`` for partitioned reads
+        :param upper_bound: Upper bound of ``partition_column`` for partitioned reads
+        :param broadcast_threshold_bytes: Snapshots up to this size are broadcast in joins
+        :param driver: JDBC driver class
+        :param connect: Zero-argument callable returning a DB-API connection for Spark-free
+                        refreshes (default: psycopg2 on ``jdbc_url`` without the ``jdbc:`` prefix)
+        """
+        self.jdbc_url = jdbc_url
+        self.table = table
+        self.snapshot_dir = snapshot_dir
+        self.ttl = ttl
+        self.key_column = key_column
+        self.updated_at_column = updated_at_column
+        self.partition_column = partition_column
+        self.num_partitions = num_partitions
+        self.lower_bound = lower_bound
+        self.upper_bound = upper_bound
+        self.broadcast_threshold_bytes = broadcast_threshold_bytes
+        self.driver = driver
+        self.connect = connect
+        self._index = None
+        self._index_refreshed_at = None
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.snapshot_dir, f'{self.table}.parquet')
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.snapshot_dir, f'{self.table}.meta.json')
+
+    def metadata(self) -> dict:
+        """Return snapshot metadata ({'refreshed_at', 'high_water', 'bytes'}) or {} if there is none."""
+        if not os.path.exists(self.meta_path) or not os.path.exists(self.snapshot_path):
+            return {}
+        with open(self.meta_path) as f:
+            return json.load(f)
+
+    def is_fresh(self) -> bool:
+        meta = self.metadata()
+        return bool(meta) and time.time() - meta['refreshed_at'] < self.ttl
+
+    def _jdbc_read(self, spark, dbtable: str, partitioned: bool = True):
+        reader = spark.read.format('jdbc') \
+            .option('url', self.jdbc_url) \
+            .option('dbtable', dbtable) \
+            .option('driver', self.driver)
+        if partitioned and self.partition_column and self.num_partitions \
+                and self.lower_bound is not None and self.upper_bound is not None:
+            reader = reader.option('partitionColumn', self.partition_column) \
+                .option('numPartitions', self.num_partitions) \
+                .option('lowerBound', self.lower_bound) \
+                .option('upperBound', self.upper_bound)
+        return reader.load()
+
+    def delta_subquery(self, meta: dict) -> str:
+        """JDBC subquery for rows changed since the snapshot's high-water mark, as a typed literal."""
+        return (f"(SELECT * FROM {self.table} WHERE {self.updated_at_column} > "
+                f"{sql_literal(_parse_high_water(meta))}) AS lookup_delta")
+
+    def refresh(self, spark) -> dict:
+        """Rebuild the snapshot: incrementally when possible, otherwise with a full
+        (optionally partitioned) JDBC read. An incremental refresh merges changed rows
+        and keeps only keys still present in the table, so upstream deletes drop out.
+        The new snapshot is fully written beside the old one before being swapped in.
+        :return: New snapshot metadata
+        """
+        from pyspark.sql import Window
+        from pyspark.sql.functions import col, row_number, max as max_
+
+        meta = self.metadata()
+        if self.updated_at_column and meta.get('high_water') is not None:
+            delta = self._jdbc_read(spark, self.delta_subquery(meta), partitioned=False)
+            current = spark.read.parquet(f'file://{self.snapshot_path}')
+            latest = Window.partitionBy(self.key_column).orderBy(col(self.updated_at_column).desc())
+            keys = self._jdbc_read(spark, f"(SELECT {self.key_column} FROM {self.table}) AS lookup_keys",
+                                   partitioned=False)
+            df = current.unionByName(delta, allowMissingColumns=True) \
+                .withColumn('_rn', row_number().over(latest)) \
+                .filter(col('_rn') == 1).drop('_rn') \
+                .join(keys, on=self.key_column, how='left_semi')
+        else:
+            df = self._jdbc_read(spark, self.table)
+
+        staging_path = self._staging_path()
+        df.write.mode('overwrite').parquet(f'file://{staging_path}')
+        high_water = None
+        if self.updated_at_column:
+            high_water = spark.read.parquet(f'file://{staging_path}') \
+                .agg(max_(self.updated_at_column)).first()[0]
+        return self._swap_in(staging_path, high_water)
+
+    def _staging_path(self) -> str:
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        staging_path = f'{self.snapshot_path}.tmp'
+        shutil.rmtree(staging_path, ignore_errors=True)
+        return staging_path
+
+    def _swap_in(self, staging_path: str, high_water) -> dict:
+        """Replace the snapshot with the fully written ``staging_path`` and record its metadata."""
+        if os.path.exists(self.snapshot_path):
+            shutil.rmtree(self.snapshot_path)
+        os.rename(staging_path, self.snapshot_path)
+
+        meta = {
+            'refreshed_at': time.time(),
+            'high_water': None,
+            'bytes': sum(os.path.getsize(os.path.join(root, name))
+                         for root, _, names in os.walk(self.snapshot_path) for name in names),
+        }
+        if high_water is not None:
+            kind = _high_water_type(high_water)
+            meta.update(high_water=high_water.isoformat() if kind in ('timestamp', 'timestamptz', 'date')
+                        else str(high_water), high_water_type=kind)
+        with open(self.meta_path, 'w') as f:
+            json.dump(meta, f)
+        return meta
+
+    def _connect(self):
+        if self.connect is not None:
+            return self.connect()
+        import psycopg2
+        return psycopg2.connect(self.jdbc_url[len('jdbc:'):] if self.jdbc_url.startswith('jdbc:') else self.jdbc_url)
+
+    @staticmethod
+    def _query(conn, sql: str, params=()):
+        import pyarrow as pa
+
+        cursor = conn.cursor()
+        try:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            names = [column[0] for column in cursor.description]
+            return pa.Table.from_pylist([dict(zip(names, row)) for row in cursor.fetchall()])
+        finally:
+            cursor.close()
+
+    def refresh_arrow(self) -> dict:
+        """Rebuild the snapshot without Spark, reading through a DB-API connection into Arrow.
+        Incremental refreshes bind the high-water mark as a typed parameter and, like
+        ``refresh``, keep only keys still present in the table. Meant for small tables.
+        :return: New snapshot metadata
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        meta = self.metadata()
+        conn = self._connect()
+        try:
+            if self.updated_at_column and meta.get('high_water') is not None:
+                delta = self._query(conn, f"SELECT * FROM {self.table} WHERE {self.updated_at_column} > %s",
+                                    (_parse_high_water(meta),))
+                keys = self._query(conn, f"SELECT {self.key_column} FROM {self.table}")
+                merged = {row[self.key_column]: row for row in pq.read_table(self.snapshot_path).to_pylist()}
+                merged.update((row[self.key_column], row) for row in delta.to_pylist())
+                live = set(keys.column(self.key_column).to_pylist())
+                table = pa.Table.from_pylist([row for key, row in merged.items() if key in live])
+            else:
+                table = self._query(conn, f"SELECT * FROM {self.table}")
+        finally:
+            conn.close()
+
+        staging_path = self._staging_path()
+        os.makedirs(staging_path)
+        pq.write_table(table, os.path.join(staging_path, 'part-00000.parquet'))
+        high_water = None
+        if self.updated_at_column and table.num_rows:
+            high_water = pc.max(table.column(self.updated_at_column)).as_py()
+        return self._swap_in(staging_path, high_water)
+
+    def load(self, spark):
+        """Return the lookup DataFrame, refreshing a stale snapshot first and
+        marking it for broadcast when it is below the threshold."""
+        from pyspark.sql.functions import broadcast
+
+        meta = self.metadata() if self.is_fresh() else self.refresh(spark)
+        df = spark.read.parquet(f'file://{self.snapshot_path}')
+        return broadcast(df) if meta['bytes'] <= self.broadcast_threshold_bytes else df
+
+    def join(self, spark, df, how: str = 'left'):
+        """Join ``df`` with the cached lookup table on the key column."""
+        return df.join(self.load(spark), on=self.key_column, how=how)
+
+    def _load_index(self) -> dict:
+        meta = self.metadata() if self.is_fresh() else self.refresh_arrow()
+        if self._index is None or self._index_refreshed_at != meta['refreshed_at']:
+            import pyarrow.parquet as pq
+            rows = pq.read_table(self.snapshot_path).to_pylist()
+            self._index = {row[self.key_column]: row for row in rows}
+            self._index_refreshed_at = meta['refreshed_at']
+        return self._index
+
+    def enrich_records(self, records: list) -> list:
+        """Left-join plain records against the snapshot with an in-memory dict, no Spark needed.
+        A missing or stale snapshot is refreshed through ``refresh_arrow`` first.
+        Lookup columns never override fields already present on a record."""
+        index = self._load_index()
+        enriched = []
+        for record in records:
+            match = index.get(record.get(self.key_column))
+            enriched.append({**match, **record} if match else dict(record))
+        return enriched
@@ -0,0 +1,218 @@
+"""Module: quality_gate.py
+Single-pass validation engine: loads each object once and evaluates every rule together."""
+import gzip
+import json
+import os
+import re
+import zlib
+
+from config.aws_clients import get_client
+from ingestion.serialization import encode_payload
+
+EMAIL_PATTERN = r"[^@]+@[^\.]+\..+"
+REQUIRED_FIELDS = ('id', 'timestamp')
+SPARK_THRESHOLD_BYTES = int(os.environ.get('VALIDATION_SPARK_THRESHOLD_BYTES', str(32 * 1024 * 1024)))
+# 'arrow' (vectorized, see arrow_rules) or 'python'; both fall back to python on mixed-type columns
+VALIDATION_BACKEND = os.environ.get('VALIDATION_BACKEND', 'arrow')
+
+def parse_records(body: bytes) -> list:
+    """Parse a JSON object, JSON array or NDJSON document into a list of records."""
+    text = body.decode('utf-8').strip()
+    if not text:
+        return []
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    return data if isinstance(data, list) else [data]
+
+def _content_encoding(meta: dict, key: str):
+    """'gzip' or 'zstd' from the object's Content-Encoding or key suffix, else None."""
+    if meta.get('ContentEncoding') == 'gzip' or key.endswith('.gz'):
+        return 'gzip'
+    if meta.get('ContentEncoding') == 'zstd' or key.endswith('.zst'):
+        return 'zstd'
+    return None
+
+def load_records(bucket: str, key: str, s3=None, max_bytes: int = None):
+    """Read an S3 object once and parse it into records.
+    :param max_bytes: If the object is larger, don't read it and return None for records
+    :return: (records or None, object size in bytes)
+    """
+    s3 = s3 or get_client('s3')
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    size = obj.get('ContentLength') or 0
+    if max_bytes is not None and size > max_bytes:
+        obj['Body'].close()
+        return None, size
+    body = obj['Body'].read()
+    encoding = _content_encoding(obj, key)
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif encoding == 'zstd':
+        import zstandard
+        body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return parse_records(body), size or len(body)
+
+def starts_with_array(bucket: str, key: str, s3=None, head_bytes: int = 4096) -> bool:
+    """Whether the object is a top-level JSON array, judged from a ranged read of its first bytes."""
+    s3 = s3 or get_client('s3')
+    obj = s3.get_object(Bucket=bucket, Key=key, Range=f'bytes=0-{head_bytes - 1}')
+    head = obj['Body'].read()
+    encoding = _content_encoding(obj, key)
+    if encoding == 'gzip':
+        head = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(head)
+    elif encoding == 'zstd':
+        import zstandard
+        head = zstandard.ZstdDecompressor().decompressobj().decompress(head)
+    return head.lstrip(b'\xef\xbb\xbf \t\r\n')[:1] == b'['
+
+def _rule(passed: bool, **details) -> dict:
+    return {'passed': bool(passed), **details}
+
+def evaluate_records(records: list, registered_fields=None) -> dict:
+    """Evaluate every rule in one pass over in-memory records.
+    :param records: Parsed records
+    :param registered_fields: Allowed field names (schema rule is skipped if None)
+    :return: Per-rule results keyed by rule name
+    """
+    email = re.compile(EMAIL_PATTERN)
+    unregistered, null_rows, bad_email, id_present, non_objects = set(), 0, 0, 0, 0
+    for record in records:
+        if not isinstance(record, dict):
+            # A scalar or array where a record belongs: fails every row rule and the schema
+            non_objects += 1
+            null_rows += 1
+            bad_email += 1
+            continue
+        if registered_fields is not None:
+            unregistered.update(k for k in record if k not in registered_fields)
+        if any(record.get(field) is None for field in REQUIRED_FIELDS):
+            null_rows += 1
+        value = record.get('email')
+        if not isinstance(value, str) or not email.search(value):
+            bad_email += 1
+        if record.get('id') is not None:
+            id_present += 1
+
+    total = len(records)
+    completeness = id_present / total if total else 0.0
+    return {
+        'schema': _rule(not unregistered and not non_objects, unregistered_fields=sorted(unregistered),
+                        non_object_rows=non_objects, skipped=registered_fields is None and not non_objects),
+        'not_null': _rule(null_rows == 0, failed=null_rows),
+        'email': _rule(bad_email == 0, failed=bad_email),
+        'size': _rule(total > 0, records=total),
+        'completeness': _rule(completeness == 1.0, column='id', ratio=completeness),
+    }
+
+def evaluate_spark(bucket: str, key: str, registered_fields=None, s3=None) -> dict:
+    """Evaluate the same rules with one Spark aggregation, for objects too large for memory.
+    Top-level arrays are read with multiLine (Spark's line mode only understands NDJSON)."""
+    from pyspark.sql import SparkSession
+    from pyspark.sql import functions as F
+
+    spark = SparkSession.builder.appName('quality_gate').getOrCreate()
+    df = spark.read.json(f's3://{bucket}/{key}', multiLine=starts_with_array(bucket, key, s3=s3))
+    columns = set(df.columns)
+
+    def null(name):
+        return F.col(name).isNull() if name in columns else F.lit(True)
+
+    email = (F.regexp_extract(F.col('email'), EMAIL_PATTERN, 0) != '') if 'email' in columns else F.lit(False)
+    row = df.agg(
+        F.count(F.lit(1)).alias('total'),
+        F.sum(F.when(null('id') | null('timestamp'), 1).otherwise(0)).alias('null_rows'),
+        F.sum(F.when(email, 0).otherwise(1)).alias('bad_email'),
+        (F.count('id') if 'id' in columns else F.lit(0)).alias('id_present'),
+    ).first()
+
+    total, null_rows, bad_email = row['total'], row['null_rows'] or 0, row['bad_email'] or 0
+    completeness = row['id_present'] / total if total else 0.0
+    unregistered = sorted(columns - set(registered_fields)) if registered_fields is not None else []
+    return {
+        'schema': _rule(not unregistered, unregistered_fields=unregistered, skipped=registered_fields is None),
+        'not_null': _rule(null_rows == 0, failed=null_rows),
+        'email': _rule(bad_email == 0, failed=bad_email),
+        'size': _rule(total > 0, records=total),
+        'completeness': _rule(completeness == 1.0, column='id', ratio=completeness),
+    }
+
+def evaluate_in_process(records: list, registered_fields=None, backend: str = None):
+    """Evaluate rules in-process with the arrow or python backend.
+    :return: (engine name, per-rule results, indices of rows failing row-level rules)
+    """
+    if (backend or VALIDATION_BACKEND) == 'arrow':
+        import pyarrow as pa
+        from processing.arrow_rules import records_to_table, evaluate_table
+        try:
+            rules, failed_mask = evaluate_table(records_to_table(records), registered_fields)
+            return 'arrow', rules, failed_mask.nonzero()[0].tolist()
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            pass  # mixed column types or non-object records
+    rules = evaluate_records(records, registered_fields)
+    email = re.compile(EMAIL_PATTERN)
+    failed_rows = [
+        i for i, record in enumerate(records)
+        if not isinstance(record, dict)
+        or any(record.get(field) is None for field in REQUIRED_FIELDS)
+        or not isinstance(record.get('email'), str) or not email.search(record['email'])
+    ] if not (rules['not_null']['passed'] and rules['email']['passed']) else []
+    return 'python', rules, failed_rows
+
+def _write_ndjson(s3, bucket: str, key: str, records, content_type: str = None, encoding: str = None) -> None:
+    body, extra = encode_payload(list(records), ndjson=True, compression=encoding)
+    if content_type:
+        extra['ContentType'] = content_type
+    s3.put_object(Bucket=bucket, Key=key, Body=body, **extra)
+
+def split_invalid_rows(bucket: str, key: str, records: list, failed_rows: list,
+                       reject_prefix: str, s3=None) -> dict:
+    """Rewrite ``key`` with only its valid rows and move failing rows to ``reject_prefix + key``.
+    Both objects keep the original ContentType and compression, so readers that go by the
+    key suffix or Content-Encoding still decode them.
+    :return: {'rejected_key', 'rejected_rows', 'valid_rows'}
+    """
+    s3 = s3 or get_client('s3')
+    head = s3.head_object(Bucket=bucket, Key=key)
+    encoding = _content_encoding(head, key)
+    failed = set(failed_rows)
+    reject_key = f'{reject_prefix}{key}'
+    content_type = head.get('ContentType')
+    _write_ndjson(s3, bucket, reject_key, (records[i] for i in failed_rows), content_type, encoding)
+    _write_ndjson(s3, bucket, key, (r for i, r in enumerate(records) if i not in failed), content_type, encoding)
+    return {'rejected_key': reject_key, 'rejected_rows': len(failed), 'valid_rows': len(records) - len(failed)}
+
+def run_quality_gate(bucket: str, key: str, registered_fields=None, spark_threshold_bytes: int = None,
+                     backend: str = None, reject_prefix: str = None, s3=None) -> dict:
+    """Validate one S3 object against every rule, reading it only once.
+    Objects above ``spark_threshold_bytes`` are evaluated with Spark instead of in-process.
+    :param bucket: S3 bucket name
+    :param key: S3 object key
+    :param registered_fields: Field names from the schema registry (see validation.get_registered_fields)
+    :param spark_threshold_bytes: Size above which Spark is used (default VALIDATION_SPARK_THRESHOLD_BYTES)
+    :param backend: In-process backend, 'arrow' or 'python' (default VALIDATION_BACKEND)
+    :param reject_prefix: If set, rows failing only row-level rules are split out to this
+                          prefix and the object passes with its remaining valid rows
+    :return: {'key', 'passed', 'engine', 'bytes', 'rules': {rule: {...}}}
+    """
+    s3 = s3 or get_client('s3')
+    threshold = SPARK_THRESHOLD_BYTES if spark_threshold_bytes is None else spark_threshold_bytes
+    records, size = load_records(bucket, key, s3=s3, max_bytes=threshold)
+    failed_rows = []
+    if records is None:
+        engine, rules = 'spark', evaluate_spark(bucket, key, registered_fields, s3=s3)
+    else:
+        engine, rules, failed_rows = evaluate_in_process(records, registered_fields, backend)
+    report = {
+        'key': key,
+        'passed': all(rule['passed'] for rule in rules.values()),
+        'engine': engine,
+        'bytes': size,
+        'rules': rules,
+    }
+    salvageable = records is not None and rules['schema']['passed'] and 0 < len(failed_rows) < len(records)
+    if reject_prefix and not report['passed'] and salvageable:
+        report.update(split_invalid_rows(bucket, key, records, failed_rows, reject_prefix, s3=s3))
+        report['passed'] = True
+    return report
@@ -0,0 +1,74 @@
+"""Module: schema_cache.py
+Process-wide TTL cache of Glue Schema Registry definitions, compiled to field sets."""
+import json
+import os
+import threading
+import time
+
+from config.aws_clients import get_client
+
+class SchemaCache:
+    """Caches the latest registered field set per (registry, schema).
+    After ``ttl`` seconds an entry is revalidated with a cheap ``get_schema``
+    call; the full definition is only re-fetched when the latest version number changed."""
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _fetch(self, glue, registry: str, schema: str, version: int = None) -> dict:
+        version_number = {'VersionNumber': version} if version is not None else {'LatestVersion': True}
+        schema_version = glue.get_schema_version(
+            SchemaId={'RegistryName': registry, 'SchemaName': schema},
+            SchemaVersionNumber=version_number,
+        )
+        fields = frozenset(field['name'] for field in json.loads(schema_version['SchemaDefinition'])['fields'])
+        return {'version': schema_version.get('VersionNumber', version), 'fields': fields,
+                'checked_at': time.monotonic()}
+
+    def get_fields(self, registry: str, schema: str) -> frozenset:
+        """Return the registered field names, hitting Glue only on a miss or expired entry."""
+        cache_key = (registry, schema)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and time.monotonic() - entry['checked_at'] < self.ttl:
+                self.hits += 1
+                return entry['fields']
+
+        glue = get_client('glue')
+        if entry is None:
+            entry = self._fetch(glue, registry, schema)
+            with self._lock:
+                self.misses += 1
+                self._entries[cache_key] = entry
+            return entry['fields']
+
+        latest = glue.get_schema(
+            SchemaId={'RegistryName': registry, 'SchemaName': schema},
+        ).get('LatestSchemaVersion')
+        with self._lock:
+            self.revalidations += 1
+        if latest is not None and latest == entry['version']:
+            entry['checked_at'] = time.monotonic()
+            return entry['fields']
+        entry = self._fetch(glue, registry, schema, latest)
+        with self._lock:
+            self.misses += 1
+            self._entries[cache_key] = entry
+        return entry['fields']
+
+    def stats(self) -> dict:
+        """Return hit/miss/revalidation counters and the number of cached schemas."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'revalidations': self.revalidations, 'entries': len(self._entries)}
+
+    def clear(self) -> None:
+        """Drop every cached schema and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.revalidations = 0
+
+schema_cache = SchemaCache(ttl=float(os.environ.get('SCHEMA_CACHE_TTL_SECONDS', '300')))
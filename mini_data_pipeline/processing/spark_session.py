@@ -0,0 +1,26 @@
+"""Module: spark_session.py
+Process-wide SparkSession shared by jobs and reused across warm Lambda invocations."""
+import threading
+
+_lock = threading.Lock()
+_session = None
+
+def _is_active(session) -> bool:
+    return session is not None and session.sparkContext._jsc is not None
+
+def get_spark_session(app_name: str = 'mini_data_pipeline'):
+    """Return the shared SparkSession, (re)creating it if none exists or it was stopped."""
+    global _session
+    with _lock:
+        if not _is_active(_session):
+            from pyspark.sql import SparkSession
+            _session = SparkSession.builder.appName(app_name).getOrCreate()
+        return _session
+
+def stop_spark_session() -> None:
+    """Stop the shared SparkSession, e.g. at process shutdown."""
+    global _session
+    with _lock:
+        if _is_active(_session):
+            _session.stop()
+        _session = None
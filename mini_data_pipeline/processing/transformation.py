@@ -1,19 +1,29 @@
 """Module: transformation.py
 Class-based PySpark job for transformation and enrichment of staged data."""
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, year, month
-import boto3
+from pyspark.sql import Observation, Window
+from pyspark.sql.functions import col, count, histogram_numeric, lit, month, row_number, when, year
+
+from processing.spark_session import get_spark_session
+
+# Distinct year/month partitions counted exactly per write (histogram_numeric only merges
+# bins beyond this many distinct values); 200 years of months
+MAX_COUNTED_PARTITIONS = 12 * 200
+HIVE_DEFAULT_PARTITION = '__HIVE_DEFAULT_PARTITION__'
 
 class TransformationJob:
-    """Handles type casting, derived fields, lookup joins, deduplication, and write."""
+    """Handles type casting, derived fields, lookup joins, deduplication, and write.
+    The SparkSession is owned by the caller (default: the shared session from
+    processing.spark_session) and is never stopped by the job."""
     def __init__(self, raw_bucket, staging_prefix, enriched_prefix,
-                 lookup_jdbc_url, lookup_table):
+                 lookup_jdbc_url, lookup_table, spark=None, lookup_cache=None):
         self.raw_bucket = raw_bucket
         self.staging_prefix = staging_prefix
         self.enriched_prefix = enriched_prefix
         self.lookup_jdbc_url = lookup_jdbc_url
         self.lookup_table = lookup_table
-        self.spark = SparkSession.builder.appName('transform_enrich').getOrCreate()
+        self.spark = spark or get_spark_session('transform_enrich')
+        self.lookup_cache = lookup_cache
+        self._lookup_df = None
 
     def normalize_casts(self, df):
         """Cast id to string and timestamp to timestamp type."""
@@ -32,34 +42,89 @@ class TransformationJob:
             raise RuntimeError(f"Error deriving fields: {e}")
 
     def lookup_enrich(self, df):
-        """Join with lookup table via JDBC to enrich records."""
+        """Join with lookup table via JDBC to enrich records (read once per job).
+        With a LookupCache the table comes from its local snapshot and is broadcast when small."""
         try:
-            lookup_df = self.spark.read.format('jdbc') \
-                .option('url', self.lookup_jdbc_url) \
-                .option('dbtable', self.lookup_table) \
-                .option('driver', 'org.postgresql.Driver') \
-                .load()
-            return df.join(lookup_df, on='id', how='left')
+            if self.lookup_cache is not None:
+                return self.lookup_cache.join(self.spark, df)
+            if self._lookup_df is None:
+                self._lookup_df = self.spark.read.format('jdbc') \
+                    .option('url', self.lookup_jdbc_url) \
+                    .option('dbtable', self.lookup_table) \
+                    .option('driver', 'org.postgresql.Driver') \
+                    .load()
+            return df.join(self._lookup_df, on='id', how='left')
         except Exception as e:
             raise RuntimeError(f"Error during lookup join: {e}")
 
-    def dedup_and_write(self, df, timestamp):
-        """Deduplicate and write partitioned JSON to S3."""
+    def deduplicate(self, df, strategy='latest'):
+        """Drop duplicate ids. 'latest' keeps the most recent record per id by
+        timestamp (nulls last); 'any' keeps an arbitrary one (dropDuplicates)."""
+        if strategy == 'any':
+            return df.dropDuplicates(['id'])
+        if strategy != 'latest':
+            raise ValueError(f"Unknown dedup strategy: {strategy}")
+        latest = Window.partitionBy('id').orderBy(col('timestamp').desc_nulls_last())
+        return df.withColumn('_rn', row_number().over(latest)) \
+                 .filter(col('_rn') == 1) \
+                 .drop('_rn')
+
+    @staticmethod
+    def partition_metrics():
+        """Aggregates observed on the write: an exact year * 100 + month histogram and the null-year count."""
+        return [histogram_numeric(col('year') * 100 + col('month'), lit(MAX_COUNTED_PARTITIONS)).alias('partitions'),
+                count(when(col('year').isNull(), 1)).alias('unpartitioned')]
+
+    @staticmethod
+    def partition_counts(metrics: dict) -> dict:
+        """Turn the observed write metrics into {'year=Y/month=M': rows}.
+        Rows with a null timestamp are counted under Spark's default partition name."""
+        counts = {}
+        for point in metrics.get('partitions') or []:
+            key = int(point['x'])
+            counts[f'year={key // 100}/month={key % 100}'] = int(point['y'])
+        if metrics.get('unpartitioned'):
+            counts[f'year={HIVE_DEFAULT_PARTITION}/month={HIVE_DEFAULT_PARTITION}'] = metrics['unpartitioned']
+        return dict(sorted(counts.items()))
+
+    def dedup_and_write(self, df, timestamp, strategy='latest'):
+        """Deduplicate and write partitioned JSON to S3 in a single pass. The write is the
+        only Spark action: per-partition row counts are collected by an Observation on it
+        (an exact histogram over year * 100 + month), so nothing is cached or re-read.
+        :return: {'path', 'partitions': {'year=Y/month=M': rows}, 'schema': StructType.jsonValue()},
+                 the schema letting readers keep columns the JSON writer omits when null
+        """
+        out_path = f's3://{self.raw_bucket}/{self.enriched_prefix}{timestamp}/'
+        deduped = self.deduplicate(df, strategy)
+        observation = Observation('enriched_partitions')
+        observed = deduped.observe(observation, *self.partition_metrics())
         try:
-            out_path = f's3://{self.raw_bucket}/{self.enriched_prefix}year={df.first()["year"]}/month={df.first()["month"]}/{timestamp}/'
-            df.dropDuplicates(['id']) \
-              .write.mode('overwrite') \
-              .partitionBy('year', 'month') \
-              .json(out_path)
+            observed.write.mode('overwrite') \
+                    .partitionBy('year', 'month') \
+                    .json(out_path)
         except Exception as e:
             raise RuntimeError(f"Error writing enriched data: {e}")
+        return {'path': out_path, 'partitions': self.partition_counts(observation.get),
+                'schema': deduped.schema.jsonValue()}
+
+    def transform(self, df):
+        """Chain normalize -> derive -> enrich lazily so Spark plans them as one job."""
+        return self.lookup_enrich(self.derive_fields(self.normalize_casts(df)))
 
     def run(self, key, timestamp):
         """Execute full pipeline: normalize, derive, enrich, dedup, write."""
         input_path = f's3://{self.raw_bucket}/{key}'
         df = self.spark.read.json(input_path)
-        df = self.normalize_casts(df)
-        df = self.derive_fields(df)
-        df = self.lookup_enrich(df)
-        self.dedup_and_write(df, timestamp)
-        self.spark.stop()
+        return self.dedup_and_write(self.transform(df), timestamp)
+
+    def run_batch(self, keys, timestamp):
+        """Transform every staged key as a single DataFrame and write it once.
+        :param keys: Keys relative to the staging prefix
+        :param timestamp: Run timestamp
+        :return: dedup_and_write summary, or None if there were no keys
+        """
+        if not keys:
+            return None
+        input_paths = [f's3://{self.raw_bucket}/{self.staging_prefix}{key}' for key in keys]
+        df = self.spark.read.json(input_paths)
+        return self.dedup_and_write(self.transform(df), timestamp)
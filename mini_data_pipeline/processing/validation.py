@@ -1,27 +1,23 @@
 """Module: validation.py
-Implements the Quality Gate with schema, record, Deequ, and GE checks."""
-import boto3
+Implements the Quality Gate with schema, record, Deequ, and GE checks.
+pyspark, pydeequ and great_expectations are imported by the checks that use them,
+so the schema lookup path doesn't pay for them."""
 import json
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, regexp_extract
-from pydeequ.checks import Check
-from pydeequ.verification import VerificationSuite
-import great_expectations as ge
+
+from config.aws_clients import get_client
+from processing.schema_cache import schema_cache
+
+def get_registered_fields(registry: str, schema: str) -> frozenset:
+    """Return the field names of the latest version of a Glue Schema Registry schema,
+    served from the process-wide schema cache (see schema_cache.SchemaCache)."""
+    return schema_cache.get_fields(registry, schema)
 
 def validate_schema_glue(bucket: str, key: str, registry: str, schema: str) -> bool:
     """Check that an S3 JSON object's top-level fields match the fields
     registered in the AWS Glue Schema Registry for the given schema.
     :return: True if the object's fields are a subset of the registered schema."""
-    glue = boto3.client('glue')
-    s3 = boto3.client('s3')
-
-    schema_version = glue.get_schema_version(
-        SchemaId={'RegistryName': registry, 'SchemaName': schema},
-        SchemaVersionNumber={'LatestVersion': True},
-    )
-    registered_fields = {
-        field['name'] for field in json.loads(schema_version['SchemaDefinition'])['fields']
-    }
+    registered_fields = get_registered_fields(registry, schema)
+    s3 = get_client('s3')
 
     obj = s3.get_object(Bucket=bucket, Key=key)
     record = json.loads(obj['Body'].read())
@@ -31,6 +27,9 @@ def validate_schema_glue(bucket: str, key: str, registry: str, schema: str) -> b
 
 def validate_record_rules(bucket: str, key: str) -> bool:
     """Run PySpark rules: non-null id/timestamp and email regex."""
+    from pyspark.sql import SparkSession
+    from pyspark.sql.functions import col, regexp_extract
+
     spark = SparkSession.builder.appName('validate_records').getOrCreate()
     df = spark.read.json(f's3://{bucket}/{key}')
     valid_df = df.filter(
@@ -44,6 +43,10 @@ def validate_record_rules(bucket: str, key: str) -> bool:
 
 def validate_deequ(bucket: str, key: str) -> bool:
     """Run PyDeequ checks for zero rows and id completeness."""
+    from pyspark.sql import SparkSession
+    from pydeequ.checks import Check
+    from pydeequ.verification import VerificationSuite
+
     spark = SparkSession.builder.appName('deequ').getOrCreate()
     df = spark.read.json(f's3://{bucket}/{key}')
     check = Check(spark, Check.Level.Error, 'deequ_checks')        .hasSize(lambda x: x > 0)        .isComplete('id')
@@ -53,6 +56,8 @@ def validate_deequ(bucket: str, key: str) -> bool:
 
 def validate_ge(bucket: str, key: str) -> bool:
     """Execute Great Expectations suite on S3 JSON batch."""
+    import great_expectations as ge
+
     context = ge.get_context()
     batch = context.get_batch({
         'datasource': 's3_json',
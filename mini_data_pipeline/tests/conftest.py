@@ -0,0 +1,14 @@
+"""
+Shared pytest fixtures.
+"""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def fresh_aws_clients():
+    """Clear the cached boto3 clients so each test's boto3.client patch takes effect."""
+    from config.aws_clients import clear_clients
+    clear_clients()
+    yield
+    clear_clients()
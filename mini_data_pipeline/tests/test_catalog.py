@@ -0,0 +1,87 @@
+"""
+Unit tests for catalog modules.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+
+
+class TestPartitionRegistrar(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "partitions.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @patch("boto3.client")
+    def test_register_creates_only_new_partitions_in_chunks(self, mock_boto):
+        """Test that known partitions are skipped and new ones are created 100 at a time."""
+        mock_glue = MagicMock()
+        mock_boto.return_value = mock_glue
+        mock_glue.batch_create_partition.return_value = {"Errors": []}
+        with open(self.cache_path, "w") as f:
+            json.dump({"2024/1": "s3://b/c/2024/1/"}, f)
+
+        from catalog.partition_registrar import PartitionRegistrar
+        registrar = PartitionRegistrar("db", "tbl", cache_path=self.cache_path)
+        partitions = [{"values": ["2024", "1"], "location": "s3://b/c/2024/1/"}] + [
+            {"values": [f"y{i}", "1"], "location": f"s3://b/c/{i}/"} for i in range(150)
+        ]
+        result = registrar.register(partitions, {"Location": "s3://b/c/"})
+
+        self.assertEqual(result, {"created": 150, "updated": 0, "skipped": 1})
+        self.assertEqual(mock_glue.batch_create_partition.call_count, 2)
+        mock_glue.get_paginator.assert_not_called()
+        with open(self.cache_path) as f:
+            self.assertEqual(len(json.load(f)), 151)
+
+        mock_glue.batch_create_partition.reset_mock()
+        self.assertEqual(registrar.register(partitions, {})["skipped"], 151)
+        mock_glue.batch_create_partition.assert_not_called()
+
+    @patch("boto3.client")
+    def test_register_updates_partitions_that_already_exist_in_glue(self, mock_boto):
+        """Test that AlreadyExists errors from batch_create_partition fall back to batch_update_partition."""
+        mock_glue = MagicMock()
+        mock_boto.return_value = mock_glue
+        mock_glue.get_paginator.return_value.paginate.return_value = [{"Partitions": []}]
+        mock_glue.batch_create_partition.return_value = {"Errors": [
+            {"PartitionValues": ["2024", "2"], "ErrorDetail": {"ErrorCode": "AlreadyExistsException"}}]}
+        mock_glue.batch_update_partition.return_value = {"Errors": []}
+
+        from catalog.partition_registrar import PartitionRegistrar
+        registrar = PartitionRegistrar("db", "tbl", cache_path=self.cache_path)
+        result = registrar.register([{"values": ["2024", "2"], "location": "s3://b/new/"}], {})
+
+        self.assertEqual(result, {"created": 0, "updated": 1, "skipped": 0})
+        entries = mock_glue.batch_update_partition.call_args.kwargs["Entries"]
+        self.assertEqual(entries[0]["PartitionInput"]["StorageDescriptor"]["Location"], "s3://b/new/")
+
+
+class TestRegisterAthenaTable(unittest.TestCase):
+
+    @patch("boto3.client")
+    def test_existing_table_not_updated_when_columns_unchanged(self, mock_boto):
+        """Test that update_table is skipped when the registered columns already match."""
+        mock_glue = MagicMock()
+        already_exists = type("AlreadyExistsException", (Exception,), {})
+        mock_glue.exceptions.AlreadyExistsException = already_exists
+        mock_glue.create_table.side_effect = already_exists()
+        mock_glue.get_table.return_value = {"Table": {"StorageDescriptor": {
+            "Columns": [{"Name": "id", "Type": "string"}, {"Name": "v", "Type": "bigint"}]}}}
+        mock_boto.return_value = mock_glue
+
+        from processing.curated_zone import register_athena_table
+        changed = register_athena_table("b", "s3://b/c/", "db", "tbl", columns=[("id", "string"), ("v", "int64")])
+
+        self.assertFalse(changed)
+        mock_glue.update_table.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@
 Unit tests for ingestion modules.
 """
 
+import json
 import unittest
 from unittest.mock import patch, MagicMock, mock_open
 
@@ -23,10 +24,96 @@ class TestFTPIngest(unittest.TestCase):
         mock_ftp.retrbinary.assert_called_once()
         mock_ftp.quit.assert_called_once()
 
+    def test_list_remote_files_filters_by_pattern_and_mtime(self):
+        """Test that one MLSD listing is filtered by glob and modification time."""
+        from datetime import datetime, timezone
+        from ingestion.ftp_ingest import list_remote_files
+        ftp = MagicMock()
+        ftp.mlsd.return_value = [
+            ("old.json", {"type": "file", "size": "10", "modify": "20240101000000"}),
+            ("new.json", {"type": "file", "size": "20", "modify": "20240301000000.123"}),
+            ("new.csv", {"type": "file", "size": "30", "modify": "20240301000000"}),
+            ("sub", {"type": "dir", "modify": "20240301000000"}),
+        ]
+
+        files = list_remote_files(ftp, "/out", "*.json", modified_since=datetime(2024, 2, 1, tzinfo=timezone.utc))
+
+        self.assertEqual([(f["path"], f["size"]) for f in files], [("/out/new.json", 20)])
+        ftp.nlst.assert_not_called()
+
+    @patch("boto3.client")
+    @patch("ftplib.FTP")
+    def test_stream_ftp_to_s3_resumes_with_rest_offset(self, mock_ftp_class, mock_boto):
+        """Test that a dropped RETR is resumed from the received offset on a new connection."""
+        from ingestion.ftp_ingest import FTPConnectionPool, stream_ftp_to_s3
+        dropped, healthy = MagicMock(), MagicMock()
+        mock_ftp_class.side_effect = [dropped, healthy]
+
+        def drop(cmd, callback, blocksize, rest):
+            callback(b"abc")
+            raise EOFError()
+        dropped.retrbinary.side_effect = drop
+        healthy.retrbinary.side_effect = lambda cmd, callback, blocksize, rest: callback(b"def")
+
+        result = stream_ftp_to_s3(FTPConnectionPool("ftp.example.com"), "/out/a.json", "bucket", "ftp/a.json")
+
+        self.assertEqual(result["bytes"], 6)
+        self.assertEqual(result["resumes"], 1)
+        self.assertEqual(healthy.retrbinary.call_args.kwargs["rest"], 3)
+        dropped.close.assert_called_once()
+        self.assertEqual(mock_boto.return_value.put_object.call_args.kwargs["Body"], b"abcdef")
+
+    @patch("boto3.client")
+    @patch("ftplib.FTP")
+    def test_ingest_ftp_files_reuses_pooled_connection(self, mock_ftp_class, mock_boto):
+        """Test that many files share the pool's logged-in connections and each lands under the prefix."""
+        from ingestion.ftp_ingest import FTPConnectionPool, ingest_ftp_files
+        files = [{"path": f"/out/{n}.json", "name": f"{n}.json"} for n in range(3)]
+
+        results = ingest_ftp_files(FTPConnectionPool("ftp.example.com", size=1), files, "bucket", "ftp/t/")
+
+        self.assertEqual([r["status"] for r in results], ["ok"] * 3)
+        self.assertEqual([r["key"] for r in results], ["ftp/t/0.json", "ftp/t/1.json", "ftp/t/2.json"])
+        mock_ftp_class.return_value.login.assert_called_once()
+
+    @patch("boto3.client")
+    @patch("ftplib.FTP")
+    def test_sync_ftp_directory_transfers_only_new_or_changed_files(self, mock_ftp_class, mock_boto):
+        """Test that a second sync skips files whose size and MDTM match the manifest."""
+        import tempfile
+        from ingestion.ftp_ingest import FTPConnectionPool, SyncManifest, sync_ftp_directory
+        ftp = mock_ftp_class.return_value
+        ftp.retrbinary.side_effect = lambda cmd, callback, blocksize, rest: callback(b"x" * 5)
+        listing = {"a.json": {"type": "file", "size": "5", "modify": "20240101000000"},
+                   "b.json": {"type": "file", "size": "5", "modify": "20240101000000"}}
+        ftp.mlsd.side_effect = lambda *a, **kw: list(listing.items())
+        pool = FTPConnectionPool("ftp.example.com")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest_path = f"{tmp}/manifest.json.gz"
+            first = sync_ftp_directory(pool, SyncManifest(manifest_path), "/out", "bucket", "ftp/t1/")
+            listing["b.json"] = {"type": "file", "size": "5", "modify": "20240102000000"}
+            unsaved = SyncManifest(manifest_path)
+            sync_ftp_directory(pool, unsaved, "/out", "bucket", "ftp/t2/", save=False)
+            self.assertEqual(SyncManifest(manifest_path).entries["/out/b.json"]["key"], "ftp/t1/b.json")
+            second = sync_ftp_directory(pool, SyncManifest(manifest_path), "/out", "bucket", "ftp/t2/")
+            entries = SyncManifest(manifest_path).entries
+
+        self.assertEqual((first["transferred"], first["skipped"]), (2, 0))
+        self.assertEqual((second["transferred"], second["skipped"]), (1, 1))
+        self.assertEqual((second["bytes_transferred"], second["bytes_skipped"]), (5, 5))
+        self.assertEqual(second["files"][0]["remote"], "/out/b.json")
+        self.assertEqual(entries["/out/b.json"]["key"], "ftp/t2/b.json")
+        self.assertEqual(len(entries["/out/a.json"]["checksum"]), 64)
+
 
 class TestAPIIngest(unittest.TestCase):
 
-    @patch("requests.get")
+    def setUp(self):
+        from ingestion.clients import reset_client_manager
+        reset_client_manager()
+
+    @patch("requests.Session.get")
     def test_fetch_rest_api_data_returns_json(self, mock_get):
         """Test that REST ingestion makes an HTTP GET request and returns parsed JSON."""
         mock_response = MagicMock()
@@ -36,10 +123,34 @@ class TestAPIIngest(unittest.TestCase):
         from ingestion.api_ingest import fetch_rest_api_data
         result = fetch_rest_api_data("https://api.example.com/data")
 
-        mock_get.assert_called_once_with("https://api.example.com/data", headers=None, params=None)
+        mock_get.assert_called_once_with("https://api.example.com/data", headers=None, params=None,
+                                         timeout=(5.0, 30.0))
         mock_response.raise_for_status.assert_called_once()
         self.assertEqual(result, {"data": []})
 
+    def test_client_manager_reuses_session_and_channel(self):
+        """Test that sessions and gRPC channels are created once and reused."""
+        from ingestion.clients import get_client_manager
+        manager = get_client_manager()
+
+        self.assertIs(manager.session(), manager.session())
+        self.assertEqual(manager.session().get_adapter("https://x").max_retries.total, 3)
+        self.assertNotIn("POST", manager.session().get_adapter("https://x").max_retries.allowed_methods)
+        with patch("grpc.insecure_channel") as mock_channel:
+            self.assertIs(manager.grpc_channel("host:1"), manager.grpc_channel("host:1"))
+        mock_channel.assert_called_once_with("host:1")
+
+    @patch("zeep.Client")
+    def test_soap_client_parses_wsdl_once(self, mock_client):
+        """Test that repeated SOAP calls reuse one parsed zeep Client."""
+        from ingestion.api_ingest import fetch_soap_api_data
+        mock_client.return_value.service.Lookup.return_value = {"id": 1}
+
+        fetch_soap_api_data("https://svc.example.com?wsdl", "Lookup", id=1)
+        fetch_soap_api_data("https://svc.example.com?wsdl", "Lookup", id=2)
+
+        mock_client.assert_called_once()
+
 
 class TestKinesisIngest(unittest.TestCase):
 
@@ -65,6 +176,339 @@ class TestKinesisIngest(unittest.TestCase):
         self.assertEqual(mock_s3.put_object.call_count, 2)
         self.assertEqual(result, {"status": "processed", "count": 2})
 
+    @patch.dict("os.environ", {"RAW_BUCKET": "test-bucket", "KINESIS_BATCH_MODE": "true",
+                               "KINESIS_BATCH_MAX_RECORDS": "2"})
+    @patch("boto3.client")
+    def test_batch_handler_groups_records_and_reports_failures(self, mock_boto):
+        """Test that batch mode writes gzip NDJSON per shard and reports failed uploads per record."""
+        import base64
+        import gzip
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+
+        def put_object(**kwargs):
+            if "shard=shardId-2" in kwargs["Key"]:
+                raise RuntimeError("S3 unavailable")
+        mock_s3.put_object.side_effect = put_object
+
+        def record(shard, seq):
+            return {"eventID": f"shardId-{shard}:{seq}", "kinesis": {
+                "data": base64.b64encode(b'{"seq": %d}' % seq).decode(), "sequenceNumber": str(seq),
+                "approximateArrivalTimestamp": 1704067200.0}}
+
+        from ingestion.kinesis_ingest import handler
+        result = handler({"Records": [record(1, 1), record(1, 2), record(1, 3), record(2, 4)]}, None)
+
+        self.assertEqual(mock_s3.put_object.call_count, 3)
+        first = mock_s3.put_object.call_args_list[0].kwargs
+        self.assertEqual(first["Key"], "kinesis/shard=shardId-1/dt=2024-01-01/1.ndjson.gz")
+        self.assertEqual(gzip.decompress(first["Body"]), b'{"seq": 1}\n{"seq": 2}\n')
+        self.assertEqual(result["batchItemFailures"], [{"itemIdentifier": "4"}])
+        self.assertEqual(result["count"], 3)
+
+    @patch.dict("os.environ", {"RAW_BUCKET": "test-bucket", "KINESIS_BATCH_MODE": "true"})
+    @patch("boto3.client")
+    def test_batch_handler_dead_letters_undecodable_records(self, mock_boto):
+        """Test that undecodable records go to the dead-letter prefix instead of being retried."""
+        import base64
+        import json
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+        good = {"eventID": "shardId-1:1", "kinesis": {
+            "data": base64.b64encode(b'{"seq": 1}').decode(), "sequenceNumber": "1"}}
+        bad = {"eventID": "shardId-1:2", "kinesis": {"data": "not*base64", "sequenceNumber": "2"}}
+
+        from ingestion.kinesis_ingest import handler
+        result = handler({"Records": [good, bad]}, None)
+
+        self.assertEqual(result["batchItemFailures"], [])
+        self.assertEqual(result["status"], "processed")
+        dead = next(c.kwargs for c in mock_s3.put_object.call_args_list
+                    if c.kwargs["Key"].startswith("kinesis-dead-letter/"))
+        self.assertTrue(dead["Key"].endswith("/2.ndjson"))
+        self.assertEqual(json.loads(dead["Body"])["kinesis"]["data"], "not*base64")
+
+    @patch.dict("os.environ", {"RAW_BUCKET": "test-bucket", "KINESIS_BATCH_MODE": "true",
+                               "KINESIS_BATCH_MAX_RECORDS": "2"})
+    @patch("boto3.client")
+    def test_batch_handler_retry_overwrites_instead_of_duplicating(self, mock_boto):
+        """Test that a partial failure reports every record from the first failed batch on, and the
+        retry Kinesis sends from there rewrites the same object keys."""
+        import base64
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+        written = {}
+
+        def put_object(**kwargs):
+            if kwargs["Key"].endswith("/3.ndjson.gz") and not written.get("retry"):
+                raise RuntimeError("S3 unavailable")
+            written.setdefault("keys", []).append(kwargs["Key"])
+        mock_s3.put_object.side_effect = put_object
+
+        def record(seq, day, data=None):
+            return {"eventID": f"shardId-1:{seq}", "kinesis": {
+                "data": data or base64.b64encode(b'{"seq": %d}' % seq).decode(), "sequenceNumber": str(seq),
+                "approximateArrivalTimestamp": 1704067200.0 + day * 86400}}
+        records = [record(1, 0), record(2, 0), record(3, 0), record(4, 1), record(5, 1, data="not*base64"),
+                   record(6, 1), record(7, 1), record(8, 1)]
+
+        from ingestion.kinesis_ingest import handler
+        result = handler({"Records": records}, None)
+        first_keys = written.pop("keys")
+
+        self.assertEqual([f["itemIdentifier"] for f in result["batchItemFailures"]], ["3", "4", "5", "6", "7", "8"])
+        self.assertEqual(result["count"], 2)
+        self.assertIsNone(result["dead_letter"])
+        written["retry"] = True
+        retry = handler({"Records": records[2:]}, None)
+
+        self.assertEqual(retry["batchItemFailures"], [])
+        self.assertEqual(retry["dead_letter"]["count"], 1)
+        self.assertEqual(sorted(k.rsplit("/", 1)[1] for k in first_keys),
+                         ["1.ndjson.gz", "4.ndjson.gz", "6.ndjson.gz", "8.ndjson.gz"])
+        self.assertEqual(set(first_keys) - set(written["keys"]), {first_keys[0]})
+        self.assertEqual(sorted(k.rsplit("/", 1)[1] for k in written["keys"] if k.startswith("kinesis/")),
+                         ["3.ndjson.gz", "4.ndjson.gz", "6.ndjson.gz", "8.ndjson.gz"])
+
+
+class TestSourceRegistry(unittest.TestCase):
+
+    def tearDown(self):
+        from ingestion.sources import unregister_source
+        for name in ("fast", "slow", "broken", "hung", "queued"):
+            unregister_source(name)
+
+    @patch("ingestion.sources.upload_json_to_s3")
+    def test_run_sources_isolates_failures_and_timeouts(self, mock_upload):
+        """Test that a failing or slow source doesn't prevent the others from completing."""
+        import time
+        from ingestion.sources import register_source, run_sources
+        mock_upload.return_value = {"key": "k", "fingerprint": None, "unchanged": False}
+
+        register_source("fast", lambda: {"ok": True})
+        register_source("slow", lambda: time.sleep(1) or {})
+        register_source("broken", lambda: 1 / 0)
+
+        start = time.monotonic()
+        results = {r["source"]: r for r in run_sources("bucket", "2024/01/01/000000", timeout=0.2)}
+
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(results["fast"]["status"], "ok")
+        self.assertEqual(results["fast"]["key"], "api/fast/2024/01/01/000000.json")
+        self.assertEqual(results["slow"]["status"], "timeout")
+        self.assertEqual(results["broken"]["status"], "failed")
+        mock_upload.assert_called_once_with({"ok": True}, "bucket", "api/fast/2024/01/01/000000.json",
+                                            fingerprints=None, source="fast", ndjson=False, compression=None)
+
+    @patch("ingestion.sources.upload_json_to_s3")
+    def test_queued_sources_time_out_and_late_workers_do_not_upload(self, mock_upload):
+        """Test that sources stuck behind a hung worker still time out, and an abandoned fetch never uploads."""
+        import threading
+        import time
+        from ingestion.sources import register_source, run_sources
+        release = threading.Event()
+        self.addCleanup(release.set)
+        register_source("hung", lambda: release.wait(5) and {"late": True})
+        register_source("queued", lambda: {"never": "run"})
+
+        start = time.monotonic()
+        results = {r["source"]: r for r in run_sources("bucket", "t", ["hung", "queued"], max_workers=1, timeout=0.1)}
+        release.set()
+        time.sleep(0.1)
+
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(results["hung"]["status"], "timeout")
+        self.assertEqual(results["queued"]["status"], "timeout")
+        mock_upload.assert_not_called()
+
+
+class TestStreamingIngest(unittest.TestCase):
+
+    def setUp(self):
+        from ingestion.clients import reset_client_manager
+        reset_client_manager()
+
+    @patch("requests.Session.get")
+    def test_iter_rest_records_follows_cursor(self, mock_get):
+        """Test that cursor pagination keeps requesting pages until no cursor is returned."""
+        pages = [
+            {"items": [{"id": 1}, {"id": 2}], "next_cursor": "abc"},
+            {"items": [{"id": 3}], "next_cursor": None},
+        ]
+        mock_get.side_effect = [MagicMock(json=MagicMock(return_value=p)) for p in pages]
+
+        from ingestion.streaming import iter_rest_records
+        records = list(iter_rest_records("https://api.example.com/data", pagination="cursor",
+                                         records_path="items"))
+
+        self.assertEqual([r["id"] for r in records], [1, 2, 3])
+        self.assertEqual(mock_get.call_args_list[1].kwargs["params"], {"cursor": "abc"})
+
+    @patch("boto3.client")
+    def test_write_ndjson_to_s3_uses_multipart_for_large_output(self, mock_boto):
+        """Test that output larger than one part is uploaded in parts and completed."""
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+        mock_s3.create_multipart_upload.return_value = {"UploadId": "u1"}
+        mock_s3.upload_part.return_value = {"ETag": "e"}
+
+        from ingestion.streaming import write_ndjson_to_s3, MIN_PART_SIZE
+        record = {"payload": "x" * 1000}
+        count = (MIN_PART_SIZE // 1000) + 10
+        result = write_ndjson_to_s3((record for _ in range(count)), "bucket", "api/rest/t.json",
+                                    part_size=MIN_PART_SIZE)
+
+        self.assertEqual(result["records"], count)
+        self.assertGreater(result["bytes"], MIN_PART_SIZE)
+        self.assertEqual(mock_s3.upload_part.call_count, 2)
+        mock_s3.complete_multipart_upload.assert_called_once()
+        mock_s3.put_object.assert_not_called()
+
+    @patch("boto3.client")
+    def test_timed_out_streaming_source_aborts_its_multipart_upload(self, mock_boto):
+        """Test that a streaming fetch is told when the run gives up on it and aborts instead of completing."""
+        import threading
+        import time
+        from ingestion.sources import register_source, run_sources, unregister_source
+        from ingestion.streaming import stream_rest_to_s3
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+        mock_s3.create_multipart_upload.return_value = {"UploadId": "u1"}
+        mock_s3.upload_part.return_value = {"ETag": "e"}
+        finished = threading.Event()
+
+        def slow_records(url, **kwargs):
+            for i in range(50):
+                time.sleep(0.01)
+                yield {"i": i, "pad": "x" * 64}
+
+        def fetch(bucket, key, **kw):
+            try:
+                return stream_rest_to_s3("https://api", bucket, key, part_size=64, **kw)
+            finally:
+                finished.set()
+
+        register_source("slowstream", fetch, streaming=True)
+        self.addCleanup(unregister_source, "slowstream")
+        with patch("ingestion.streaming.iter_rest_records", slow_records), \
+                patch("ingestion.streaming.MIN_PART_SIZE", 64):
+            result = run_sources("bucket", "t1", ["slowstream"], timeout=0.1)[0]
+            self.assertTrue(finished.wait(2))
+
+        self.assertEqual(result["status"], "timeout")
+        mock_s3.abort_multipart_upload.assert_called_once_with(Bucket="bucket", Key="api/slowstream/t1.json",
+                                                               UploadId="u1")
+        mock_s3.complete_multipart_upload.assert_not_called()
+
+
+class TestSerialization(unittest.TestCase):
+
+    def tearDown(self):
+        from ingestion.sources import unregister_source
+        unregister_source("packed")
+
+    def test_stdlib_fallback_matches_orjson_output(self):
+        """Test that the stdlib fallback encodes dates, decimals and bytes the same way as orjson."""
+        import datetime
+        import decimal
+        from ingestion import serialization
+        payload = {"at": datetime.datetime(2024, 1, 2, 3, 4, 5), "amount": decimal.Decimal("1.10"),
+                   "blob": b"\x00\x01", "name": "caf\u00e9", "items": [1, None]}
+
+        fast = serialization.dumps(payload)
+        with patch.object(serialization, "orjson", None):
+            slow = serialization.dumps(payload)
+
+        self.assertEqual(fast, slow)
+        self.assertEqual(json.loads(fast)["at"], "2024-01-02T03:04:05")
+
+    @patch("boto3.client")
+    def test_source_uploads_gzipped_ndjson(self, mock_boto):
+        """Test that a compressed NDJSON source lands as .json.gz bytes with Content-Encoding."""
+        import gzip
+        from ingestion.sources import register_source, run_sources
+        register_source("packed", lambda: [{"id": 1}, {"id": 2}], ndjson=True, compression="gzip")
+
+        result = run_sources("bucket", "t", ["packed"])[0]
+
+        call = mock_boto.return_value.put_object.call_args.kwargs
+        self.assertEqual(result["key"], "api/packed/t.json.gz")
+        self.assertEqual(call["ContentEncoding"], "gzip")
+        self.assertEqual(call["ContentType"], "application/x-ndjson")
+        self.assertEqual(gzip.decompress(call["Body"]).splitlines(), [b'{"id":1}', b'{"id":2}'])
+
+
+class TestFingerprinting(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = f"{self.tmp.name}/fingerprints.db"
+
+    def tearDown(self):
+        from ingestion.sources import unregister_source
+        unregister_source("same")
+        self.tmp.cleanup()
+
+    def test_fingerprint_ignores_key_order_and_whitespace(self):
+        """Test that equal JSON values hash the same regardless of key order."""
+        from ingestion.fingerprint import fingerprint
+        self.assertEqual(fingerprint({"a": 1, "b": [1, 2]}), fingerprint({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(fingerprint({"a": 1}), fingerprint({"a": 2}))
+
+    @patch("boto3.client")
+    def test_unchanged_payload_is_skipped_across_runs(self, mock_boto):
+        """Test that a payload landed by a completed run (persisted in SQLite) is not uploaded again,
+        while one landed by a run that never completed is."""
+        from ingestion.fingerprint import open_fingerprint_index
+        from ingestion.sources import register_source, run_sources
+        from orchestration.run_state import RunState
+        mock_s3 = mock_boto.return_value
+        register_source("same", lambda: {"items": [1, 2, 3]})
+
+        failed = run_sources("bucket", "t0", ["same"], fingerprints=open_fingerprint_index(self.db))
+        first = run_sources("bucket", "t1", ["same"], fingerprints=open_fingerprint_index(self.db))
+        run = RunState.open(self.tmp.name, "t1")
+        run.add_source("same", first[0]["key"], fingerprint=first[0]["fingerprint"])
+        run.complete(fingerprints=open_fingerprint_index(self.db))
+        second = run_sources("bucket", "t2", ["same"], fingerprints=open_fingerprint_index(self.db))
+
+        self.assertEqual([failed[0]["status"], first[0]["status"]], ["ok", "ok"])
+        self.assertEqual(second[0]["status"], "unchanged")
+        self.assertIsNone(second[0]["key"])
+        self.assertEqual(mock_s3.put_object.call_count, 2)
+
+    @patch("boto3.client")
+    def test_two_argument_streaming_fetch_runs_with_dedup_enabled(self, mock_boto):
+        """Test that a streaming fetch without an is_duplicate parameter is called as fetch(bucket, key)."""
+        from ingestion.fingerprint import FingerprintIndex
+        from ingestion.sources import register_source, run_sources
+        register_source("same", lambda bucket, key: {"records": 1}, streaming=True)
+
+        result = run_sources("bucket", "t1", ["same"], fingerprints=FingerprintIndex())[0]
+
+        self.assertEqual(result["status"], "ok")
+        self.assertEqual(result["records"], 1)
+
+    @patch("boto3.client")
+    def test_streamed_duplicate_aborts_upload(self, mock_boto):
+        """Test that a streamed payload matching a known fingerprint is aborted, not completed."""
+        from ingestion.fingerprint import FingerprintIndex
+        from ingestion.streaming import write_ndjson_to_s3
+        mock_s3 = mock_boto.return_value
+        index = FingerprintIndex(max_entries=2)
+        records = [{"id": 1}, {"id": 2}]
+
+        first = write_ndjson_to_s3(iter(records), "bucket", "k1", is_duplicate=lambda d: index.contains("s", d))
+        index.add("s", first["fingerprint"])
+        second = write_ndjson_to_s3(iter(records), "bucket", "k2", is_duplicate=lambda d: index.contains("s", d))
+
+        self.assertFalse(first["unchanged"])
+        self.assertTrue(second["unchanged"])
+        self.assertIsNone(second["key"])
+        mock_s3.put_object.assert_called_once()
+        self.assertEqual(index.hits, 1)
+
 
 if __name__ == "__main__":
     unittest.main()
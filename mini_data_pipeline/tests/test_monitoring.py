@@ -2,9 +2,12 @@
 Unit tests for monitoring module.
 """
 
+import io
 import json
 import os
+import tempfile
 import unittest
+from datetime import datetime, timedelta
 from unittest.mock import patch, MagicMock
 
 
@@ -43,10 +46,10 @@ class TestMonitoring(unittest.TestCase):
         """Test that a changed field set triggers an SNS publish and updates the snapshot."""
         mock_s3, mock_sns = MagicMock(), MagicMock()
         mock_boto.side_effect = lambda service, *a, **kw: {"s3": mock_s3, "sns": mock_sns}[service]
-        mock_s3.get_object.side_effect = [
-            {"Body": MagicMock(read=lambda: json.dumps({"id": 1, "new_field": "x"}).encode())},
-            {"Body": MagicMock(read=lambda: json.dumps(["id", "old_field"]).encode())},
-        ]
+        bodies = {"key1": json.dumps({"id": 1, "new_field": "x"}).encode(),
+                  "schema/last_schema.json": json.dumps(["id", "old_field"]).encode()}
+        mock_s3.get_object.side_effect = lambda Bucket, Key, **kw: {
+            "Body": io.BytesIO(bodies[Key]), "ContentLength": len(bodies[Key]), "ETag": '"e1"'}
 
         from monitoring.monitoring import detect_schema_drift
         drifted = detect_schema_drift("bucket", ["key1"], sns_topic_arn="arn:aws:sns:us-east-1:123:topic")
@@ -54,6 +57,232 @@ class TestMonitoring(unittest.TestCase):
         self.assertTrue(drifted)
         mock_sns.publish.assert_called_once()
         mock_s3.put_object.assert_called_once()
+        self.assertEqual(mock_s3.put_object.call_args.kwargs["IfMatch"], '"e1"')
+
+
+class TestSchemaDrift(unittest.TestCase):
+
+    def _s3(self, bodies):
+        mock_s3 = MagicMock()
+
+        def get_object(Bucket, Key, Range=None):
+            body = bodies[Key]
+            if Range:
+                start, end = map(int, Range[len("bytes="):].split("-"))
+                body = body[start:end + 1]
+            return {"Body": io.BytesIO(body), "ContentLength": len(bodies[Key]), "ETag": '"e1"'}
+        mock_s3.get_object.side_effect = get_object
+        return mock_s3
+
+    @patch("boto3.client")
+    def test_typed_diff_on_nested_paths_and_no_rewrite_when_unchanged(self, mock_boto):
+        """Test nested paths and type changes in the diff, and that an unchanged schema isn't rewritten."""
+        records = [{"id": 1, "user": {"age": "31", "tags": ["a"]}}, {"id": 2, "user": {"age": "40", "tags": []}}]
+        bodies = {"a.json": json.dumps(records).encode(),
+                  "schema/last_schema.json": json.dumps({"fields": {
+                      "id": ["integer"], "user": ["object"], "user.age": ["integer"], "legacy": ["string"]}}).encode()}
+        mock_s3 = self._s3(bodies)
+        mock_boto.return_value = mock_s3
+        from monitoring.alerts import AlertAggregator
+        from monitoring.monitoring import detect_schema_drift
+        from monitoring.schema_drift import infer_schema, diff_schemas, load_snapshot
+
+        current, errors = infer_schema("b", ["a.json"], s3=mock_s3)
+        diff = diff_schemas(load_snapshot(mock_s3, "b", "schema/last_schema.json")[0], current)
+        self.assertEqual(errors, {})
+        self.assertEqual(sorted(diff["added"]), ["user.tags", "user.tags[]"])
+        self.assertEqual(list(diff["removed"]), ["legacy"])
+        self.assertEqual(diff["type_changed"], {"user.age": {"from": ["integer"], "to": ["string"]}})
+
+        alerts = AlertAggregator(sns=MagicMock())
+        self.assertTrue(detect_schema_drift("b", ["a.json"], sns_topic_arn="t", alerts=alerts))
+        self.assertEqual(alerts.pending(), 1)
+        written = mock_s3.put_object.call_args.kwargs["Body"]
+
+        bodies["schema/last_schema.json"] = written.encode()
+        mock_s3.put_object.reset_mock()
+        self.assertFalse(detect_schema_drift("b", ["a.json"], sns_topic_arn="t", alerts=alerts))
+        mock_s3.put_object.assert_not_called()
+
+    def test_large_ndjson_objects_are_sampled_by_byte_range(self):
+        """Test that objects above sample_bytes are read with ranged GETs and partial lines are skipped."""
+        lines = [json.dumps({"id": i, "early": 1} if i < 500 else {"id": i, "late": {"x": 1.5}}) for i in range(1000)]
+        mock_s3 = self._s3({"big.ndjson": "\n".join(lines).encode()})
+        from monitoring.schema_drift import infer_object_schema
+
+        schema = infer_object_schema(mock_s3, "b", "big.ndjson", sample_bytes=2048, sample_ranges=3)
+
+        ranged = [c.kwargs.get("Range") for c in mock_s3.get_object.call_args_list]
+        self.assertEqual(len([r for r in ranged if r]), 3)
+        self.assertEqual(schema["late.x"], {"number"})
+        self.assertIn("early", schema)
+
+    def test_gzipped_objects_are_streamed_not_range_sampled(self):
+        """Test that a compressed object is decompressed from the start instead of sampled by byte range."""
+        import gzip
+        lines = [json.dumps({"id": i, "nested": {"flag": True}}) for i in range(1000)]
+        mock_s3 = self._s3({"raw.json.gz": gzip.compress("\n".join(lines).encode())})
+        from monitoring.schema_drift import infer_object_schema
+
+        schema = infer_object_schema(mock_s3, "b", "raw.json.gz", sample_bytes=256)
+
+        mock_s3.get_object.assert_called_once()
+        self.assertEqual(schema["nested.flag"], {"boolean"})
+
+    def test_malformed_ndjson_line_is_skipped_not_buffered_to_eof(self):
+        """Test that a bad line in a streamed object is skipped so later records still count towards drift."""
+        import gzip
+        lines = [json.dumps({"id": 1}), '{"id": 2,, "broken": true}'] + [json.dumps({"id": i, "late": "x"})
+                                                                          for i in range(3, 200)]
+        mock_s3 = self._s3({"raw.json.gz": gzip.compress("\n".join(lines).encode())})
+        from monitoring import schema_drift
+
+        with patch.object(schema_drift, "CHUNK_SIZE", 64), self.assertLogs("monitoring.schema_drift", "WARNING"):
+            schema = schema_drift.infer_object_schema(mock_s3, "b", "raw.json.gz")
+
+        self.assertEqual(schema["late"], {"string"})
+        self.assertNotIn("broken", schema)
+
+
+class TestAlertAggregator(unittest.TestCase):
+
+    def setUp(self):
+        from monitoring.alerts import reset_rate_limits
+        reset_rate_limits()
+
+    def test_flush_sends_one_deduplicated_digest_per_topic(self):
+        """Test that buffered alerts are deduplicated by key and flushed as a single publish per topic."""
+        mock_sns = MagicMock()
+        from monitoring.alerts import AlertAggregator
+        alerts = AlertAggregator(sns=mock_sns)
+        for i in range(50):
+            alerts.add("topic-a", "Data Quarantine", f"file-{i % 5} failed validations", key=f"file-{i % 5}")
+        alerts.add("topic-b", "Schema Drift Detected", "Added fields: ['x']")
+
+        report = alerts.flush()
+
+        self.assertEqual(mock_sns.publish.call_count, 2)
+        self.assertEqual(report["topic-a"], {"events": 5, "status": "published"})
+        digest = mock_sns.publish.call_args_list[0].kwargs
+        self.assertEqual(digest["Subject"], "Data Quarantine")
+        self.assertIn("file-0 failed validations (x10)", digest["Message"])
+        self.assertEqual(alerts.pending(), 0)
+
+    def test_rate_limit_is_shared_across_aggregators(self):
+        """Test that the per-topic token bucket outlives a single run, as it would across warm starts."""
+        mock_sns = MagicMock()
+        from monitoring.alerts import AlertAggregator
+        reports = []
+        for run in range(3):
+            alerts = AlertAggregator(sns=mock_sns, rate_per_minute=0.001, burst=2)
+            alerts.add("topic", "Glue Job Failures Detected", f"run {run}")
+            reports.append(alerts.flush()["topic"]["status"])
+
+        self.assertEqual(reports, ["published", "published", "rate_limited"])
+        self.assertEqual(mock_sns.publish.call_count, 2)
+
+    def test_held_back_digests_are_sent_on_a_later_flush(self):
+        """Test that a rate-limited digest is kept and folded into the topic's next digest."""
+        mock_sns = MagicMock()
+        from monitoring.alerts import AlertAggregator, topic_bucket
+        alerts = AlertAggregator(sns=mock_sns, rate_per_minute=0.001, burst=1)
+        alerts.add("topic", "Data Quarantine", "a.json failed")
+        alerts.flush()
+        alerts.add("topic", "Data Quarantine", "b.json failed")
+        self.assertEqual(alerts.flush()["topic"], {"events": 1, "status": "rate_limited"})
+
+        topic_bucket("topic", 0.001, 1).tokens = 1
+        alerts.add("topic", "Data Quarantine", "c.json failed")
+        self.assertEqual(alerts.flush()["topic"], {"events": 2, "status": "published"})
+        self.assertEqual(mock_sns.publish.call_args.kwargs["Message"], "b.json failed\nc.json failed")
+        self.assertEqual(alerts.flush(), {})
+
+    def test_flush_logs_publish_errors_and_keeps_the_digest(self):
+        """Test that a failing publish doesn't raise out of flush and is retried on the next one."""
+        mock_sns = MagicMock()
+        mock_sns.publish.side_effect = [RuntimeError("SNS throttled"), {}]
+        from monitoring.alerts import AlertAggregator
+        alerts = AlertAggregator(sns=mock_sns)
+        alerts.add("topic", "Schema Drift Detected", "Added fields: ['x']")
+
+        with self.assertLogs("monitoring.alerts", level="ERROR"):
+            self.assertEqual(alerts.flush()["topic"]["status"], "failed")
+        self.assertEqual(alerts.flush()["topic"], {"events": 1, "status": "published"})
+
+    @patch("boto3.client")
+    def test_monitor_glue_jobs_buffers_into_aggregator(self, mock_boto):
+        """Test that failures go to the aggregator instead of a direct SNS publish, and publish_batch chunks by 10."""
+        mock_glue, mock_sns = MagicMock(), MagicMock()
+        mock_boto.side_effect = lambda service, *a, **kw: {"glue": mock_glue, "sns": mock_sns}[service]
+        mock_glue.get_job_runs.return_value = {
+            "JobRuns": [{"Id": "run-1", "JobRunState": "FAILED", "ErrorMessage": "boom"}]
+        }
+        from monitoring.alerts import AlertAggregator
+        from monitoring.monitoring import monitor_glue_jobs
+        alerts = AlertAggregator(sns=mock_sns, burst=5)
+
+        monitor_glue_jobs(job_names=["a", "b"], sns_topic_arn="topic", alerts=alerts)
+
+        mock_sns.publish.assert_not_called()
+        self.assertEqual(alerts.pending(), 2)
+        mock_sns.publish_batch.side_effect = lambda TopicArn, PublishBatchRequestEntries: {
+            "Successful": PublishBatchRequestEntries}
+        result = alerts.publish_batch("fanout", [{"subject": "s", "message": str(i)} for i in range(25)])
+        self.assertEqual(mock_sns.publish_batch.call_count, 3)
+        self.assertEqual(result, {"published": 25, "failed": 0, "deferred": 0})
+
+
+class TestGlueScanner(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmp.name, "seen.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_scan_paginates_jobs_and_reports_each_failure_once(self):
+        """Test that get_jobs is paginated and a failure already reported isn't returned on the next scan."""
+        t0 = datetime(2024, 1, 1)
+        mock_glue = MagicMock()
+        mock_glue.get_paginator.return_value.paginate.return_value = [
+            {"Jobs": [{"Name": "a"}]}, {"Jobs": [{"Name": "b"}]}]
+        runs = {
+            "a": [{"Id": "a2", "JobRunState": "RUNNING", "StartedOn": t0 + timedelta(hours=2)},
+                  {"Id": "a1", "JobRunState": "FAILED", "StartedOn": t0 + timedelta(hours=1),
+                   "ExecutionTime": 60, "MaxCapacity": 10, "ErrorMessage": "boom"}],
+            "b": [{"Id": "b1", "JobRunState": "SUCCEEDED", "StartedOn": t0, "ExecutionTime": 120, "DPUSeconds": 7200}],
+        }
+        mock_glue.get_job_runs.side_effect = lambda JobName, MaxResults, **kw: {"JobRuns": runs[JobName]}
+        from monitoring.glue_scanner import scan_glue_jobs, SeenRunStore
+        state = SeenRunStore(self.state_path)
+
+        first = scan_glue_jobs(state=state, glue=mock_glue)
+        self.assertEqual([f["run_id"] for f in first["failures"]], ["a1"])
+        self.assertEqual(first["jobs"]["b"]["dpu_hours"], 2.0)
+        self.assertEqual(first["jobs"]["a"]["max_seconds"], 60)
+
+        runs["a"][0].update(JobRunState="FAILED", ExecutionTime=30)
+        second = scan_glue_jobs(state=state, glue=mock_glue)
+        self.assertEqual([f["run_id"] for f in second["failures"]], ["a2"])
+        self.assertEqual(scan_glue_jobs(state=state, glue=mock_glue)["failures"], [])
+
+    @patch("monitoring.glue_scanner.time.sleep")
+    def test_scan_backs_off_and_narrows_concurrency_when_throttled(self, mock_sleep):
+        """Test that a throttled get_job_runs is retried and halves the concurrency limit."""
+        from botocore.exceptions import ClientError
+        mock_glue = MagicMock()
+        mock_glue.get_job_runs.side_effect = [
+            ClientError({"Error": {"Code": "ThrottlingException"}}, "GetJobRuns"),
+            {"JobRuns": [{"Id": "r1", "JobRunState": "FAILED"}]},
+        ]
+        from monitoring.glue_scanner import scan_glue_jobs
+
+        result = scan_glue_jobs(job_names=["a"], glue=mock_glue)
+
+        self.assertEqual(result["throttled"], 1)
+        self.assertEqual(len(result["failures"]), 1)
+        mock_sleep.assert_called_once()
 
 
 if __name__ == "__main__":
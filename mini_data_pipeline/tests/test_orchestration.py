@@ -0,0 +1,186 @@
+"""
+Unit tests for orchestration modules.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+
+
+def _not_found():
+    return ClientError({"Error": {"Code": "404"}}, "HeadObject")
+
+
+class TestS3Mover(unittest.TestCase):
+
+    def test_move_objects_copies_and_deletes_in_batches(self):
+        """Test that every object is copied and sources are deleted with delete_objects, 1000 keys per call."""
+        mock_s3 = MagicMock()
+        mock_s3.head_object.return_value = {"ContentLength": 10}
+        mock_s3.delete_objects.return_value = {"Errors": [{"Key": "raw/3.json", "Code": "AccessDenied"}]}
+        from orchestration.s3_mover import move_objects
+        moves = [{"src_bucket": "b", "src_key": f"raw/{i}.json", "dest_bucket": "b", "dest_key": f"staging/{i}.json"}
+                 for i in range(1500)]
+
+        results = move_objects(moves, s3=mock_s3, max_workers=8)
+
+        self.assertEqual(mock_s3.delete_objects.call_count, 2)
+        self.assertEqual(len(mock_s3.delete_objects.call_args_list[0].kwargs["Delete"]["Objects"]), 1000)
+        self.assertEqual([r["src"] for r in results if r["status"] == "failed"], ["raw/3.json"])
+        self.assertEqual(sum(r["status"] == "moved" for r in results), 1499)
+
+    def test_move_objects_is_idempotent_on_retry(self):
+        """Test that a missing source whose destination exists is reported as already moved, not failed."""
+        def head_object(Bucket, Key):
+            if Key.startswith("staging/"):
+                return {"ContentLength": 1}
+            raise _not_found()
+
+        mock_s3 = MagicMock()
+        mock_s3.head_object.side_effect = head_object
+        from orchestration.s3_mover import move_objects
+
+        results = move_objects([{"src_bucket": "b", "src_key": "raw/a.json",
+                                 "dest_bucket": "b", "dest_key": "staging/raw/a.json"}], s3=mock_s3)
+
+        self.assertEqual(results[0]["status"], "already_moved")
+        mock_s3.copy_object.assert_not_called()
+        mock_s3.delete_objects.assert_not_called()
+
+    def test_large_objects_use_multipart_copy(self):
+        """Test that objects above 5 GB are copied with upload_part_copy in ranged parts."""
+        mock_s3 = MagicMock()
+        mock_s3.create_multipart_upload.return_value = {"UploadId": "u1"}
+        mock_s3.upload_part_copy.return_value = {"CopyPartResult": {"ETag": "e"}}
+        from orchestration.s3_mover import copy_object, COPY_PART_SIZE
+        size = 5 * 1024 ** 3 + 1
+
+        head = {"ContentLength": size, "ContentType": "application/x-ndjson", "ContentEncoding": "gzip",
+                "Metadata": {"source": "rest"}, "ETag": "x"}
+
+        copy_object(mock_s3, "b", "big.json", "b", "staging/big.json", size, head=head)
+
+        mock_s3.copy_object.assert_not_called()
+        mock_s3.create_multipart_upload.assert_called_once_with(
+            Bucket="b", Key="staging/big.json", ContentType="application/x-ndjson", ContentEncoding="gzip",
+            Metadata={"source": "rest"})
+        parts = -(-size // COPY_PART_SIZE)
+        self.assertEqual(mock_s3.upload_part_copy.call_count, parts)
+        last = mock_s3.upload_part_copy.call_args.kwargs
+        self.assertEqual(last["CopySourceRange"], f"bytes={(parts - 1) * COPY_PART_SIZE}-{size - 1}")
+        self.assertEqual(len(mock_s3.complete_multipart_upload.call_args.kwargs["MultipartUpload"]["Parts"]), parts)
+
+    def test_vendored_copy_in_unstructured_pipeline_is_identical(self):
+        """Test that the unstructured pipeline's copy of s3_mover.py has not drifted from this one."""
+        here = os.path.join(os.path.dirname(__file__), "..", "orchestration", "s3_mover.py")
+        vendored = os.path.join(os.path.dirname(__file__), "..", "..", "unstructured-data-pipeline",
+                                "lambda_function", "s3_mover.py")
+        if not os.path.exists(vendored):
+            self.skipTest("unstructured-data-pipeline is not checked out alongside")
+        with open(here, "rb") as a, open(vendored, "rb") as b:
+            self.assertEqual(a.read(), b.read(), "s3_mover.py copies differ; apply the change to both")
+
+
+class TestHandlerImports(unittest.TestCase):
+
+    def test_handler_import_defers_heavy_dependencies(self):
+        """Test that importing the orchestrator loads neither Spark, Deequ, GE, pyarrow, zeep nor gRPC."""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = {**os.environ, "PYTHONPATH": root, "AWS_DEFAULT_REGION": "us-east-1", "RAW_BUCKET": "b",
+               "STAGING_PREFIX": "staging/", "QUARANTINE_PREFIX": "quarantine/", "ENRICHED_PREFIX": "enriched/",
+               "CURATED_PREFIX": "curated/", "SNS_TOPIC_ARN": "arn:aws:sns:us-east-1:0:t"}
+        code = ("import sys, orchestration.handler; "
+                "print(sorted({m.split('.')[0] for m in sys.modules} & "
+                "{'pyspark', 'pydeequ', 'great_expectations', 'pyarrow', 'zeep', 'grpc', 'boto3'}))")
+        proc = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True)
+
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.strip(), "[]")
+
+
+HANDLER_ENV = {"RAW_BUCKET": "b", "STAGING_PREFIX": "staging/", "QUARANTINE_PREFIX": "quarantine/",
+               "ENRICHED_PREFIX": "enriched/", "CURATED_PREFIX": "curated/",
+               "SNS_TOPIC_ARN": "arn:aws:sns:us-east-1:0:t", "SCHEMA_REGISTRY": "reg", "SCHEMA_NAME": "schema"}
+
+
+class TestRunState(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_open_resumes_unfinished_run_until_complete_or_out_of_attempts(self):
+        """Test that progress survives a reopen, completion starts a fresh run and retries are capped."""
+        from orchestration.run_state import RunState
+        run = RunState.open(self.tmp.name, "2024/01/01/000000")
+        run.add_source("rest", "rest/a.json")
+        run.advance(["rest/a.json"], "validated", passed=True)
+        run.save()
+
+        resumed = RunState.open(self.tmp.name)
+        self.assertTrue(resumed.resumed)
+        self.assertEqual(resumed.timestamp, "2024/01/01/000000")
+        self.assertEqual(resumed.keys_at("validated"), ["rest/a.json"])
+        resumed.advance(["rest/a.json"], "ingested")
+        self.assertEqual(resumed.stage_of("rest/a.json"), "validated")
+
+        self.assertTrue(RunState.open(self.tmp.name).resumed)
+        self.assertFalse(RunState.open(self.tmp.name, max_attempts=3).resumed)
+
+        fresh = RunState.open(self.tmp.name, "2024/01/02/000000")
+        fresh.complete()
+        self.assertNotEqual(RunState.open(self.tmp.name).timestamp, "2024/01/02/000000")
+
+
+class TestLambdaHandlerResume(unittest.TestCase):
+
+    def test_retry_resumes_from_last_completed_stage(self):
+        """Test that a run failing in curation is resumed without re-ingesting, re-validating or re-transforming."""
+        env = patch.dict(os.environ, HANDLER_ENV)
+        env.start()
+        self.addCleanup(env.stop)
+        import orchestration.handler as handler
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        job = MagicMock()
+        job.run_batch.return_value = {"path": "s3://b/enriched/t/", "rows": 1, "partitions": {"year=2024/month=1": 1}}
+        curated = {"path": "s3://b/curated/t/", "rows": 1, "files": 1, "columns": [("id", "string")],
+                   "partitions": [{"year": "2024", "month": "1"}]}
+
+        with patch.object(handler, "RUN_STATE_LOCATION", tmp.name), \
+                patch.object(handler, "INGEST_SOURCES", ["rest"]), \
+                patch.object(handler, "PARTITION_REGISTRAR", MagicMock()), \
+                patch.object(handler, "get_client", MagicMock()), \
+                patch.object(handler, "get_registered_fields", return_value=frozenset({"id"})), \
+                patch.object(handler, "monitor_glue_jobs"), patch.object(handler, "detect_schema_drift"), \
+                patch.object(handler, "run_sources", side_effect=lambda bucket, ts, names, **kw: [
+                    {"source": "rest", "status": "ok", "key": f"rest/{ts}.json"}]) as mock_sources, \
+                patch.object(handler, "run_quality_gate", return_value={"passed": True}) as mock_gate, \
+                patch.object(handler, "move_objects", side_effect=lambda moves, **kw: [
+                    {"src": m["src_key"], "dest": m["dest_key"], "status": "moved"} for m in moves]) as mock_move, \
+                patch("processing.transformation.TransformationJob", return_value=job), \
+                patch("processing.curated_zone.register_athena_table", return_value=False), \
+                patch("processing.curated_zone.write_curated_dataset",
+                      side_effect=[RuntimeError("S3 down"), curated]) as mock_curate:
+            with self.assertRaises(RuntimeError):
+                handler.lambda_handler({}, None)
+            result = handler.lambda_handler({}, None)
+
+        self.assertTrue(result["results"]["resumed"])
+        self.assertEqual(mock_sources.call_count, 1)
+        self.assertEqual(mock_gate.call_count, 1)
+        self.assertEqual(job.run_batch.call_count, 1)
+        self.assertEqual(mock_curate.call_count, 2)
+        self.assertEqual(mock_move.call_args.args[0], [])
+        self.assertEqual(len(result["results"]["passed"]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
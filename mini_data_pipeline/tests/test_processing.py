@@ -9,6 +9,10 @@ from unittest.mock import patch, MagicMock
 
 class TestValidation(unittest.TestCase):
 
+    def setUp(self):
+        from processing.schema_cache import schema_cache
+        schema_cache.clear()
+
     @patch("boto3.client")
     def test_validate_schema_glue_accepts_matching_fields(self, mock_boto):
         """Test that a record whose fields are registered in the schema passes."""
@@ -40,8 +44,420 @@ class TestValidation(unittest.TestCase):
         self.assertFalse(result)
 
 
+class TestSchemaCache(unittest.TestCase):
+
+    @patch("boto3.client")
+    def test_schema_cache_hits_then_revalidates_by_version(self, mock_boto):
+        """Test that fresh entries are served from memory and expired ones only re-fetch on a new version."""
+        mock_glue = MagicMock()
+        mock_boto.return_value = mock_glue
+        mock_glue.get_schema_version.side_effect = [
+            {"VersionNumber": 1, "SchemaDefinition": json.dumps({"fields": [{"name": "id"}]})},
+            {"VersionNumber": 2, "SchemaDefinition": json.dumps({"fields": [{"name": "id"}, {"name": "email"}]})},
+        ]
+        mock_glue.get_schema.side_effect = [{"LatestSchemaVersion": 1}, {"LatestSchemaVersion": 2}]
+
+        from processing.schema_cache import SchemaCache
+        cache = SchemaCache(ttl=60)
+        self.assertEqual(cache.get_fields("reg", "s"), {"id"})
+        self.assertEqual(cache.get_fields("reg", "s"), {"id"})
+        self.assertEqual(cache.stats()["hits"], 1)
+
+        cache.ttl = 0
+        self.assertEqual(cache.get_fields("reg", "s"), {"id"})
+        self.assertEqual(mock_glue.get_schema_version.call_count, 1)
+        self.assertEqual(cache.get_fields("reg", "s"), {"id", "email"})
+        self.assertEqual(mock_glue.get_schema_version.call_args.kwargs["SchemaVersionNumber"], {"VersionNumber": 2})
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 2, "revalidations": 2, "entries": 1})
+
+
+class TestQualityGate(unittest.TestCase):
+
+    @patch("boto3.client")
+    def test_run_quality_gate_reads_once_and_reports_every_rule(self, mock_boto):
+        """Test that an NDJSON object is fetched once and every rule appears in the report."""
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+        body = (b'{"id": 1, "timestamp": "2024-01-01", "email": "a@b.com"}\n'
+                b'{"id": 2, "timestamp": null, "email": "bad"}\n')
+        mock_s3.get_object.return_value = {"Body": MagicMock(read=lambda: body), "ContentLength": len(body)}
+
+        from processing.quality_gate import run_quality_gate
+        report = run_quality_gate("bucket", "key.json", registered_fields={"id", "timestamp", "email"})
+
+        mock_s3.get_object.assert_called_once_with(Bucket="bucket", Key="key.json")
+        self.assertFalse(report["passed"])
+        self.assertEqual(report["engine"], "arrow")
+        self.assertTrue(report["rules"]["schema"]["passed"])
+        self.assertEqual(report["rules"]["not_null"]["failed"], 1)
+        self.assertEqual(report["rules"]["email"]["failed"], 1)
+        self.assertTrue(report["rules"]["size"]["passed"])
+        self.assertTrue(report["rules"]["completeness"]["passed"])
+
+    @patch("processing.quality_gate.evaluate_spark")
+    @patch("boto3.client")
+    def test_run_quality_gate_uses_spark_above_threshold(self, mock_boto, mock_spark):
+        """Test that objects above the size threshold are handed to Spark without being read."""
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+        mock_s3.get_object.return_value = {"Body": MagicMock(), "ContentLength": 1024}
+        mock_spark.return_value = {"size": {"passed": True}}
+
+        from processing.quality_gate import run_quality_gate
+        report = run_quality_gate("bucket", "big.json", spark_threshold_bytes=100)
+
+        self.assertEqual(report["engine"], "spark")
+        self.assertTrue(report["passed"])
+        mock_s3.get_object.return_value["Body"].read.assert_not_called()
+
+    def test_starts_with_array_detects_top_level_arrays(self):
+        """Test that Spark is told to use multiLine only for top-level JSON arrays."""
+        import gzip
+        from processing.quality_gate import starts_with_array
+        mock_s3 = MagicMock()
+        for body, key, expected in ((b' \n[{"id": 1},', "a.json", True), (b'{"id": 1}\n{"id": 2}\n', "b.json", False),
+                                    (gzip.compress(b'[{"id": 1}]')[:20], "c.json.gz", True)):
+            mock_s3.get_object.return_value = {"Body": MagicMock(read=lambda body=body: body)}
+            self.assertEqual(starts_with_array("bucket", key, s3=mock_s3), expected)
+        self.assertEqual(mock_s3.get_object.call_args.kwargs["Range"], "bytes=0-4095")
+
+    @patch("boto3.client")
+    def test_run_quality_gate_splits_invalid_rows(self, mock_boto):
+        """Test that rows failing record rules are split out and the remaining rows pass."""
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+        records = [{"id": 1, "timestamp": "t", "email": "a@b.com"}, {"id": None, "timestamp": "t", "email": "a@b.com"}]
+        body = json.dumps(records).encode()
+        mock_s3.get_object.return_value = {"Body": MagicMock(read=lambda: body), "ContentLength": len(body)}
+        mock_s3.head_object.return_value = {}
+
+        from processing.quality_gate import run_quality_gate
+        report = run_quality_gate("bucket", "k.json", reject_prefix="quarantine/rejected_rows/")
+
+        self.assertTrue(report["passed"])
+        self.assertEqual(report["rejected_rows"], 1)
+        written = {c.kwargs["Key"]: c.kwargs["Body"] for c in mock_s3.put_object.call_args_list}
+        self.assertEqual(json.loads(written["k.json"]), records[0])
+        self.assertEqual(json.loads(written["quarantine/rejected_rows/k.json"]), records[1])
+
+    @patch("boto3.client")
+    def test_split_invalid_rows_keeps_gzip_encoding_and_content_type(self, mock_boto):
+        """Test that a gzipped object is rewritten gzipped, with its original ContentType."""
+        import gzip
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+        records = [{"id": 1, "timestamp": "t", "email": "a@b.com"}, {"id": 2, "timestamp": None, "email": "a@b.com"}]
+        body = gzip.compress(b"".join(json.dumps(r).encode() + b"\n" for r in records))
+        mock_s3.get_object.return_value = {"Body": MagicMock(read=lambda: body), "ContentLength": len(body),
+                                           "ContentEncoding": "gzip"}
+        mock_s3.head_object.return_value = {"ContentEncoding": "gzip", "ContentType": "application/x-ndjson"}
+
+        from processing.quality_gate import run_quality_gate
+        report = run_quality_gate("bucket", "k.ndjson", reject_prefix="rejected/")
+
+        self.assertEqual(report["valid_rows"], 1)
+        written = {c.kwargs["Key"]: c.kwargs for c in mock_s3.put_object.call_args_list}
+        self.assertEqual(written["k.ndjson"]["ContentEncoding"], "gzip")
+        self.assertEqual(written["k.ndjson"]["ContentType"], "application/x-ndjson")
+        self.assertEqual(json.loads(gzip.decompress(written["k.ndjson"]["Body"])), records[0])
+        self.assertEqual(json.loads(gzip.decompress(written["rejected/k.ndjson"]["Body"])), records[1])
+
+    @patch("boto3.client")
+    def test_split_invalid_rows_encodes_by_key_suffix(self, mock_boto):
+        """Test that a .json.gz object without Content-Encoding metadata is still rewritten gzipped."""
+        import gzip
+        mock_s3 = MagicMock()
+        mock_boto.return_value = mock_s3
+        mock_s3.head_object.return_value = {}
+        records = [{"id": 1}, {"id": 2}]
+
+        from processing.quality_gate import split_invalid_rows
+        split_invalid_rows("bucket", "k.json.gz", records, [1], "rejected/", s3=mock_s3)
+
+        written = {c.kwargs["Key"]: c.kwargs for c in mock_s3.put_object.call_args_list}
+        self.assertEqual(written["k.json.gz"]["ContentEncoding"], "gzip")
+        self.assertEqual(written["k.json.gz"]["ContentType"], "application/x-ndjson")
+        self.assertEqual(gzip.decompress(written["rejected/k.json.gz"]["Body"]), b'{"id":2}\n')
+
+    @patch("boto3.client")
+    def test_non_object_records_fail_the_schema_rule_in_both_backends(self, mock_boto):
+        """Test that scalar, array and mixed records are quarantined instead of raising."""
+        from processing.quality_gate import evaluate_in_process, run_quality_gate
+        good = {"id": 1, "timestamp": "t", "email": "a@b.com"}
+        for records in ([1, 2, 3], ["a"], [[1], [2]], [good, 5]):
+            for backend in ("arrow", "python"):
+                _, rules, failed_rows = evaluate_in_process(records, backend=backend)
+                self.assertFalse(rules["schema"]["passed"], (records, backend))
+                self.assertEqual(failed_rows, [i for i, r in enumerate(records) if r is not good])
+
+        body = json.dumps([good, 5]).encode()
+        mock_s3 = mock_boto.return_value
+        mock_s3.get_object.return_value = {"Body": MagicMock(read=lambda: body), "ContentLength": len(body)}
+        report = run_quality_gate("bucket", "k.json", reject_prefix="rejected/")
+
+        self.assertFalse(report["passed"])
+        self.assertEqual(report["rules"]["schema"]["non_object_rows"], 1)
+        mock_s3.put_object.assert_not_called()
+
+    def test_arrow_and_python_backends_agree(self):
+        """Test that the vectorized backend reports the same rule outcomes as the python backend."""
+        from processing.quality_gate import evaluate_in_process
+        records = [
+            {"id": 1, "timestamp": "t", "email": "a@b.com"},
+            {"id": 2, "timestamp": None, "email": "a@b.com"},
+            {"id": 3, "timestamp": "t", "email": "nope", "extra": 1},
+        ]
+        engine_a, arrow_rules, arrow_rows = evaluate_in_process(records, {"id", "timestamp", "email"}, "arrow")
+        engine_p, python_rules, python_rows = evaluate_in_process(records, {"id", "timestamp", "email"}, "python")
+
+        self.assertEqual((engine_a, engine_p), ("arrow", "python"))
+        self.assertEqual(arrow_rules, python_rules)
+        self.assertEqual(arrow_rows, python_rows)
+        self.assertEqual(arrow_rows, [1, 2])
+
+
+class TestTransformationJob(unittest.TestCase):
+
+    @patch("processing.transformation.TransformationJob.derive_fields", side_effect=lambda df: df)
+    @patch("processing.transformation.TransformationJob.normalize_casts", side_effect=lambda df: df)
+    def test_run_batch_reads_all_keys_once_and_keeps_session(self, _normalize, _derive):
+        """Test that batch mode reads every staged key in one DataFrame, reuses the lookup and never stops Spark."""
+        from processing.transformation import TransformationJob
+        spark = MagicMock()
+        job = TransformationJob("bucket", "staging/", "enriched/", "jdbc:postgresql://db", "lookup", spark=spark)
+
+        with patch.object(job, "dedup_and_write", return_value={"path": "s3://bucket/enriched/out/"}) as mock_write:
+            out = job.run_batch(["a.json", "b.json"], "2024/01/01/000000")
+            job.run_batch(["c.json"], "2024/01/01/000001")
+
+        spark.read.json.assert_any_call(["s3://bucket/staging/a.json", "s3://bucket/staging/b.json"])
+        self.assertEqual(out, {"path": "s3://bucket/enriched/out/"})
+        self.assertEqual(mock_write.call_count, 2)
+        spark.read.format.assert_called_once_with("jdbc")
+        spark.stop.assert_not_called()
+
+    @patch("processing.transformation.TransformationJob.partition_metrics", return_value=[])
+    @patch("processing.transformation.Observation")
+    @patch("processing.transformation.TransformationJob.deduplicate")
+    def test_dedup_and_write_counts_partitions_from_the_write(self, mock_dedup, mock_observation, _metrics):
+        """Test that the write is the only action and per-partition counts come from an observation on it."""
+        from processing.transformation import TransformationJob
+        job = TransformationJob("bucket", "staging/", "enriched/", None, None, spark=MagicMock())
+        deduped = mock_dedup.return_value
+        deduped.schema.jsonValue.return_value = {"type": "struct", "fields": []}
+        mock_observation.return_value.get = {"partitions": [{"x": 202402, "y": 3.0}, {"x": 202401, "y": 5.0}],
+                                             "unpartitioned": 1}
+
+        summary = job.dedup_and_write(MagicMock(), "2024/02/01/000000")
+
+        deduped.persist.assert_not_called()
+        deduped.groupBy.assert_not_called()
+        self.assertIs(deduped.observe.call_args.args[0], mock_observation.return_value)
+        writer = deduped.observe.return_value.write.mode.return_value.partitionBy
+        writer.assert_called_once_with("year", "month")
+        writer.return_value.json.assert_called_once_with("s3://bucket/enriched/2024/02/01/000000/")
+        self.assertEqual(summary, {
+            "path": "s3://bucket/enriched/2024/02/01/000000/",
+            "partitions": {"year=2024/month=1": 5, "year=2024/month=2": 3,
+                           "year=__HIVE_DEFAULT_PARTITION__/month=__HIVE_DEFAULT_PARTITION__": 1},
+            "schema": {"type": "struct", "fields": []},
+        })
+
+    @patch("processing.transformation.TransformationJob.partition_metrics", return_value=[])
+    @patch("processing.transformation.TransformationJob.deduplicate")
+    def test_dedup_and_write_wraps_write_errors(self, mock_dedup, _metrics):
+        """Test that a failing write surfaces as RuntimeError."""
+        from processing.transformation import TransformationJob
+        job = TransformationJob("bucket", "staging/", "enriched/", None, None, spark=MagicMock())
+        mock_dedup.return_value.observe.return_value.write.mode.return_value.partitionBy.return_value \
+            .json.side_effect = Exception("boom")
+
+        with self.assertRaises(RuntimeError):
+            job.dedup_and_write(MagicMock(), "2024/02/01/000000")
+
+
+class TestLookupCache(unittest.TestCase):
+
+    def test_snapshot_freshness_follows_ttl(self):
+        """Test that a snapshot is fresh only when it and its metadata exist and are within the TTL."""
+        import os
+        import tempfile
+        import time
+        from processing.lookup_cache import LookupCache
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = LookupCache("jdbc:postgresql://db", "customers", snapshot_dir=tmp, ttl=60)
+            self.assertFalse(cache.is_fresh())
+
+            os.makedirs(cache.snapshot_path)
+            with open(cache.meta_path, "w") as f:
+                json.dump({"refreshed_at": time.time(), "high_water": None, "bytes": 1}, f)
+            self.assertTrue(cache.is_fresh())
+
+            cache.ttl = 0
+            self.assertFalse(cache.is_fresh())
+
+    def test_enrich_records_refreshes_through_arrow_without_spark(self):
+        """Test the non-Spark dict join path: a missing snapshot is pulled via DB-API into Parquet, then reused."""
+        import sqlite3
+        import tempfile
+        from processing.lookup_cache import LookupCache
+
+        db = sqlite3.connect(":memory:")
+        db.executescript("CREATE TABLE customers (id TEXT, segment TEXT);"
+                         "INSERT INTO customers VALUES ('1', 'gold'), ('2', 'silver');")
+        connect = MagicMock(side_effect=lambda: MagicMock(cursor=db.cursor))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = LookupCache("jdbc:postgresql://db", "customers", snapshot_dir=tmp, ttl=60, connect=connect)
+            enriched = cache.enrich_records([{"id": "1", "v": 1}, {"id": "3", "v": 2}])
+            again = cache.enrich_records([{"id": "2", "segment": "own"}])
+            fresh = cache.is_fresh()
+
+        self.assertEqual(enriched, [{"id": "1", "segment": "gold", "v": 1}, {"id": "3", "v": 2}])
+        self.assertEqual(again, [{"id": "2", "segment": "own"}])
+        self.assertTrue(fresh)
+        self.assertEqual(connect.call_count, 1)
+
+    def test_incremental_refresh_formats_high_water_as_typed_literal(self):
+        """Test that the stored high-water mark keeps its type and is never spliced in as raw text."""
+        import datetime
+        from processing.lookup_cache import LookupCache, sql_literal
+
+        self.assertEqual(sql_literal(datetime.datetime(2024, 1, 2, 3, 4, 5)), "TIMESTAMP '2024-01-02 03:04:05'")
+        self.assertEqual(sql_literal(datetime.date(2024, 1, 2)), "DATE '2024-01-02'")
+        self.assertEqual(sql_literal(42), "42")
+        self.assertEqual(sql_literal("x' OR '1'='1"), "'x'' OR ''1''=''1'")
+
+        cache = LookupCache("jdbc:postgresql://db", "customers", updated_at_column="updated_at")
+        self.assertEqual(cache.delta_subquery({"high_water": "2024-01-02T03:04:05", "high_water_type": "timestamp"}),
+                         "(SELECT * FROM customers WHERE updated_at > TIMESTAMP '2024-01-02 03:04:05') AS lookup_delta")
+
+
 class TestCuratedZone(unittest.TestCase):
 
+    def test_write_curated_dataset_streams_json_to_partitioned_parquet(self):
+        """Test that Spark-style partitioned NDJSON becomes hive-partitioned Parquet plus a _metadata file."""
+        import os
+        import tempfile
+        import pyarrow.dataset as ds
+        import pyarrow.fs as pafs
+        import pyarrow.parquet as pq
+        from processing.curated_zone import write_curated_dataset
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for month in (1, 2):
+                part_dir = f"{tmp}/bucket/enriched/run/year=2024/month={month}"
+                os.makedirs(part_dir)
+                with open(f"{part_dir}/part-0000.json", "w") as f:
+                    f.writelines(json.dumps({"id": str(i), "v": i}) + "\n" for i in range(5))
+            open(f"{tmp}/bucket/enriched/run/_SUCCESS", "w").close()
+
+            fs = pafs.SubTreeFileSystem(tmp, pafs.LocalFileSystem())
+            result = write_curated_dataset("bucket", "enriched/run/", "curated/", "2024/02/01/000000",
+                                           row_group_size=2, filesystem=fs)
+            metadata = pq.read_metadata(f"{tmp}/bucket/curated/_metadata")
+            summary = ds.parquet_dataset(f"{tmp}/bucket/curated/_metadata", partitioning="hive").to_table()
+            written = sorted(os.listdir(f"{tmp}/bucket/curated/year=2024/month=1"))
+
+        self.assertEqual(result["path"], "s3://bucket/curated/")
+        self.assertEqual(written, ["part-20240201000000-0.parquet"])
+        self.assertEqual((result["files"], result["rows"]), (2, 10))
+        self.assertEqual(result["partitions"], [{"year": "2024", "month": "1"}, {"year": "2024", "month": "2"}])
+        self.assertEqual(result["columns"], [("id", "string"), ("v", "int64")])
+        self.assertTrue(result["metadata"])
+        self.assertEqual(metadata.num_rows, 10)
+        self.assertEqual(metadata.row_group(0).column(0).compression, "ZSTD")
+        self.assertEqual(sorted(zip(summary.column("month").to_pylist(), summary.column("v").to_pylist()))[-1], (2, 4))
+
+    @patch("boto3.client")
+    def test_two_runs_in_one_month_share_a_stable_partition(self, mock_boto):
+        """Test that a second run in the same month adds files beside the first and registers nothing new."""
+        import os
+        import tempfile
+        import pyarrow.dataset as ds
+        from catalog.partition_registrar import PartitionRegistrar
+        from processing.curated_zone import write_curated_dataset
+        mock_glue = MagicMock()
+        mock_boto.return_value = mock_glue
+        mock_glue.get_paginator.return_value.paginate.return_value = [{"Partitions": []}]
+        mock_glue.batch_create_partition.return_value = {"Errors": []}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            registrar = PartitionRegistrar("db", "tbl", cache_path=f"{tmp}/partitions.json")
+            registered = []
+            for run, ids in (("2024/01/10/000000", ["1", "2"]), ("2024/01/20/000000", ["3"])):
+                fs = self._write_enriched(tmp, {1: [{"id": i} for i in ids]}, run=run)
+                result = write_curated_dataset("bucket", f"enriched/{run}/", "curated/", run, filesystem=fs)
+                registered.append(registrar.register([
+                    {"values": [p["year"], p["month"]],
+                     "location": f"{result['path']}year={p['year']}/month={p['month']}/"}
+                    for p in result["partitions"]], {}))
+            partition_dir = f"{tmp}/bucket/curated/year=2024/month=1"
+            files = sorted(os.listdir(partition_dir))
+            ids = sorted(ds.dataset(partition_dir).to_table().column("id").to_pylist())
+            summary = ds.parquet_dataset(f"{tmp}/bucket/curated/_metadata")
+            summarized = sorted(summary.to_table().column("id").to_pylist())
+
+        self.assertEqual(files, ["part-20240110000000-0.parquet", "part-20240120000000-0.parquet"])
+        self.assertEqual(ids, ["1", "2", "3"])
+        self.assertEqual(summarized, ["1", "2", "3"])
+        self.assertEqual(registered, [{"created": 1, "updated": 0, "skipped": 0},
+                                      {"created": 0, "updated": 0, "skipped": 1}])
+        mock_glue.batch_update_partition.assert_not_called()
+
+    def _write_enriched(self, tmp, files, run="run"):
+        import os
+        for month, lines in files.items():
+            part_dir = f"{tmp}/bucket/enriched/{run}/year=2024/month={month}"
+            os.makedirs(part_dir)
+            with open(f"{part_dir}/part-0000.json", "w") as f:
+                f.writelines(json.dumps(line) + "\n" for line in lines)
+        import pyarrow.fs as pafs
+        return pafs.SubTreeFileSystem(tmp, pafs.LocalFileSystem())
+
+    def test_iter_enriched_batches_unifies_schema_across_files(self):
+        """Test that columns missing from the first file are kept and int/float columns widen to double."""
+        import tempfile
+        from processing.curated_zone import iter_enriched_batches
+
+        with tempfile.TemporaryDirectory() as tmp:
+            fs = self._write_enriched(tmp, {1: [{"id": "1", "v": 1}], 2: [{"id": "2", "v": 1.5, "note": "x"}]})
+            schema, batches = iter_enriched_batches(fs, "bucket/enriched/run")
+            rows = [row for batch in batches for row in batch.to_pylist()]
+
+        self.assertEqual([(f.name, str(f.type)) for f in schema], [
+            ("id", "string"), ("v", "double"), ("note", "string"), ("year", "string"), ("month", "string"),
+        ])
+        self.assertEqual(rows[0], {"id": "1", "v": 1.0, "note": None, "year": "2024", "month": "1"})
+        self.assertEqual(rows[1]["note"], "x")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            fs = self._write_enriched(tmp, {1: [{"id": "1", "v": 1}], 2: [{"id": "2", "v": "one"}]})
+            with self.assertRaises(ValueError):
+                iter_enriched_batches(fs, "bucket/enriched/run")
+
+    def test_iter_enriched_batches_uses_spark_schema(self):
+        """Test that the writer's Spark schema keeps all-null columns and types dates and decimals."""
+        import datetime
+        import decimal
+        import tempfile
+        from processing.curated_zone import iter_enriched_batches
+
+        spark_schema = {"type": "struct", "fields": [
+            {"name": "id", "type": "string"}, {"name": "amount", "type": "decimal(10,2)"},
+            {"name": "signup", "type": "date"}, {"name": "segment", "type": "string"},
+            {"name": "year", "type": "integer"}, {"name": "month", "type": "integer"},
+        ]}
+        with tempfile.TemporaryDirectory() as tmp:
+            fs = self._write_enriched(tmp, {1: [{"id": "1", "amount": 12.5, "signup": "2024-01-02"}]})
+            schema, batches = iter_enriched_batches(fs, "bucket/enriched/run", spark_schema=spark_schema)
+            rows = [row for batch in batches for row in batch.to_pylist()]
+
+        self.assertEqual(schema.names, ["id", "amount", "signup", "segment", "year", "month"])
+        self.assertEqual(rows, [{"id": "1", "amount": decimal.Decimal("12.50"), "signup": datetime.date(2024, 1, 2),
+                                 "segment": None, "year": "2024", "month": "1"}])
+
     @patch("boto3.client")
     def test_register_athena_table_creates_new_table(self, mock_boto):
         """Test that register_athena_table calls Glue create_table with the right location."""
@@ -73,5 +489,150 @@ class TestCuratedZone(unittest.TestCase):
         mock_glue.update_table.assert_called_once()
 
 
+class TestCompaction(unittest.TestCase):
+
+    def _local_s3(self, tmp):
+        """MagicMock S3 client whose list/get/put/delete calls act on files under ``tmp``."""
+        import os
+        from botocore.exceptions import ClientError
+        mock_s3 = MagicMock()
+
+        def paginate(Bucket, Prefix):
+            root = f"{tmp}/{Bucket}"
+            keys = sorted(os.path.relpath(os.path.join(d, f), root) for d, _, files in os.walk(root) for f in files)
+            return [{"Contents": [{"Key": k, "Size": os.path.getsize(f"{root}/{k}")}
+                                  for k in keys if k.startswith(Prefix)]}]
+
+        def get_object(Bucket, Key):
+            if not os.path.exists(f"{tmp}/{Bucket}/{Key}"):
+                raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+            with open(f"{tmp}/{Bucket}/{Key}", "rb") as f:
+                return {"Body": MagicMock(read=MagicMock(return_value=f.read()))}
+
+        def put_object(Bucket, Key, Body, **kwargs):
+            os.makedirs(os.path.dirname(f"{tmp}/{Bucket}/{Key}"), exist_ok=True)
+            with open(f"{tmp}/{Bucket}/{Key}", "w") as f:
+                f.write(Body)
+
+        def delete_object(Bucket, Key):
+            os.remove(f"{tmp}/{Bucket}/{Key}")
+
+        def delete_objects(Bucket, Delete):
+            for obj in Delete["Objects"]:
+                os.remove(f"{tmp}/{Bucket}/{obj['Key']}")
+
+        mock_s3.get_paginator.return_value.paginate.side_effect = paginate
+        mock_s3.get_object.side_effect = get_object
+        mock_s3.put_object.side_effect = put_object
+        mock_s3.delete_object.side_effect = delete_object
+        mock_s3.delete_objects.side_effect = delete_objects
+        return mock_s3
+
+    def _setup_partition(self, tmp):
+        import os
+        import pyarrow as pa
+        import pyarrow.fs as pafs
+        import pyarrow.parquet as pq
+        keys = []
+        for run, table in (("1", pa.table({"id": ["3", "1"], "timestamp": ["t", "t"], "v": [1, 2]})),
+                           ("2", pa.table({"id": ["0"], "timestamp": ["t"], "v": [1.5], "note": ["x"]}))):
+            key = f"curated/year=2024/month=1/part-2024010{run}000000-0.parquet"
+            os.makedirs(os.path.dirname(f"{tmp}/bucket/{key}"), exist_ok=True)
+            pq.write_table(table, f"{tmp}/bucket/{key}")
+            keys.append(key)
+        return keys, pafs.SubTreeFileSystem(tmp, pafs.LocalFileSystem())
+
+    def _partition_files(self, tmp):
+        import os
+        return sorted(os.listdir(f"{tmp}/bucket/curated/year=2024/month=1"))
+
+    @patch("boto3.client")
+    def test_dry_run_reports_without_writing(self, mock_boto):
+        """Test that dry-run mode only reports before/after file counts."""
+        import tempfile
+        from processing.compaction import compact_curated_zone
+
+        with tempfile.TemporaryDirectory() as tmp:
+            mock_boto.return_value = self._local_s3(tmp)
+            keys, fs = self._setup_partition(tmp)
+            report = compact_curated_zone("bucket", "curated/", small_file_bytes=10 ** 6, dry_run=True, filesystem=fs)
+            files = self._partition_files(tmp)
+
+        self.assertEqual((report["files_before"], report["files_after"]), (2, 1))
+        self.assertEqual(files, sorted(key.rsplit("/", 1)[1] for key in keys))
+
+    @patch("boto3.client")
+    def test_compaction_merges_sorts_in_place_and_deletes(self, mock_boto):
+        """Test that small files are merged inside their partition, sorted by id, and the inputs
+        deleted, leaving no journal and a _metadata summary that lists only the merged file."""
+        import os
+        import tempfile
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+        from processing.compaction import compact_curated_zone
+
+        with tempfile.TemporaryDirectory() as tmp:
+            mock_boto.return_value = self._local_s3(tmp)
+            _, fs = self._setup_partition(tmp)
+            report = compact_curated_zone("bucket", "curated/", small_file_bytes=10 ** 6, filesystem=fs)
+            merged_name = f"compacted-{report['run_id']}-00000-0.parquet"
+            files = self._partition_files(tmp)
+            merged = pq.read_table(f"{tmp}/bucket/curated/year=2024/month=1/{merged_name}")
+            summary = ds.parquet_dataset(f"{tmp}/bucket/curated/_metadata").files
+            journal_left = os.path.exists(f"{tmp}/bucket/curated/_compaction/journal.json")
+
+        self.assertEqual(files, [merged_name])
+        self.assertEqual(merged.column("id").to_pylist(), ["0", "1", "3"])
+        self.assertEqual(merged.column("v").to_pylist(), [1.5, 2.0, 1.0])
+        self.assertEqual(merged.column("note").to_pylist(), ["x", None, None])
+        self.assertEqual([path.rsplit("/", 1)[1] for path in summary], [merged_name])
+        self.assertFalse(journal_left)
+
+    @patch("boto3.client")
+    def test_failed_merge_rolls_back_and_keeps_inputs(self, mock_boto):
+        """Test that a merge writing fewer rows than it read deletes its output and no input."""
+        import tempfile
+        import pyarrow.dataset as ds
+        from processing.compaction import compact_curated_zone
+        write_dataset = ds.write_dataset
+
+        def lossy_write(data, *args, **kwargs):
+            visitor = kwargs.pop("file_visitor")
+            short = lambda f: visitor(MagicMock(metadata=MagicMock(num_rows=f.metadata.num_rows - 1)))  # noqa: E731
+            write_dataset(data, *args, **kwargs, file_visitor=short)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            mock_boto.return_value = self._local_s3(tmp)
+            keys, fs = self._setup_partition(tmp)
+            with patch.object(ds, "write_dataset", side_effect=lossy_write), self.assertRaises(RuntimeError):
+                compact_curated_zone("bucket", "curated/", small_file_bytes=10 ** 6, filesystem=fs)
+            files = self._partition_files(tmp)
+
+        self.assertEqual(files, sorted(key.rsplit("/", 1)[1] for key in keys))
+
+    @patch("boto3.client")
+    def test_interrupted_swap_is_finished_before_compacting_again(self, mock_boto):
+        """Test that a run that died after writing merged files but before deleting the inputs
+        is completed by the next run instead of merging the merged file with the inputs again."""
+        import tempfile
+        from processing import compaction
+
+        with tempfile.TemporaryDirectory() as tmp:
+            mock_s3 = self._local_s3(tmp)
+            mock_boto.return_value = mock_s3
+            _, fs = self._setup_partition(tmp)
+            with patch.object(compaction, "_finish_journal", side_effect=SystemExit), self.assertRaises(SystemExit):
+                compaction.compact_curated_zone("bucket", "curated/", small_file_bytes=10 ** 6, filesystem=fs)
+            self.assertEqual(len(self._partition_files(tmp)), 3)
+
+            report = compaction.compact_curated_zone("bucket", "curated/", small_file_bytes=10 ** 6, filesystem=fs)
+            files = self._partition_files(tmp)
+
+        self.assertEqual(report["recovered"], "completed")
+        self.assertEqual(report["partitions"], [])
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].startswith("compacted-"))
+
+
 if __name__ == "__main__":
     unittest.main()
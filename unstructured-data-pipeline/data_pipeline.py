@@ -26,7 +26,7 @@ def main(lambda_role_arn=None, glue_role_arn=None):
     create_bucket(PROCESSED_BUCKET)
 
     # Step 2: Deploy Lambda function
-    deploy_lambda_function(role_arn=lambda_role_arn)
+    deploy_lambda_function(role_arn=lambda_role_arn, processed_bucket=PROCESSED_BUCKET)
 
     # Step 3: Set up AWS Glue crawler and catalog
     setup_glue_resources(role_arn=glue_role_arn)
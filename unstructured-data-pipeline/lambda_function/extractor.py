@@ -0,0 +1,316 @@
+"""Module: extractor.py
+Stream-parses staged CSV, JSON, XML and TXT files into normalized Parquet in the processed
+bucket. Rows are written in fixed-size batches, so memory stays bounded on multi-GB files."""
+import codecs
+import csv
+import io
+import itertools
+import json
+import re
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+BATCH_ROWS = 10000
+READ_CHUNK = 1024 * 1024
+MAX_VALUE_CHARS = 64 * 1024 * 1024  # largest single top-level JSON value / array element held in memory
+STAGING_PREFIX = 'staging/'
+PROCESSED_PREFIX = 'processed/'
+EXTRA_COLUMN = '_extra'
+_DELIMITERS = (',', '\t', ';', '|')
+_DECODER = json.JSONDecoder()
+_filesystem = None
+
+def get_filesystem() -> pafs.FileSystem:
+    """Return the process-wide S3 filesystem used for staged reads and Parquet writes."""
+    global _filesystem
+    if _filesystem is None:
+        _filesystem = pafs.S3FileSystem()
+    return _filesystem
+
+def normalize_name(name) -> str:
+    """Column name safe for Athena: lower snake_case, not starting with a digit."""
+    name = re.sub(r'[^0-9a-z]+', '_', str(name).strip().lower()).strip('_') or 'col'
+    return f'_{name}' if name[0].isdigit() else name
+
+def _text(value):
+    """Normalize a parsed value to a string column value (nested values as JSON)."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, bool)):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+# --- parsers: each yields flat dicts --------------------------------------------
+
+def iter_csv_rows(stream):
+    """Rows of a delimited file keyed by its header; cells beyond the header go to EXTRA_COLUMN."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    first = text.readline()
+    if not first.strip():
+        return
+    delimiter = max(_DELIMITERS, key=first.count)
+    reader = csv.reader(itertools.chain([first], text), delimiter=delimiter)
+    header = next(reader)
+    for row in reader:
+        if not row:
+            continue
+        record = dict(zip(header, row))
+        if len(row) > len(header):
+            record[EXTRA_COLUMN] = row[len(header):]
+        yield record
+
+def iter_json_values(stream, skipped: list = None, max_value_chars: int = MAX_VALUE_CHARS):
+    """JSON values from an NDJSON stream, concatenated documents, or one top-level array,
+    decoded incrementally so only the current chunk and record are held in memory.
+    A malformed NDJSON line is skipped (its error appended to ``skipped``, if given); any
+    other value that still doesn't parse once a complete line follows the error raises
+    ValueError right away rather than buffering the rest of the file. So do a top-level
+    array missing its closing ']' and a single value larger than ``max_value_chars``.
+    Reads grow with the pending value, so a large value is re-decoded O(log n) times."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')('replace')
+    buffer, pos, eof, in_array = '', 0, False, None
+    consumed = 0  # characters dropped from the front of the buffer
+    single_line = None  # whether every top-level value so far fit on one line (NDJSON)
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ',')):
+            pos += 1
+        if pos < len(buffer) and in_array is None:
+            in_array = buffer[pos] == '['
+            pos += in_array
+            continue
+        if in_array and pos < len(buffer) and buffer[pos] == ']':
+            return
+        try:
+            if pos >= len(buffer):
+                raise ValueError('buffer exhausted')
+            value, end = _DECODER.raw_decode(buffer, pos)
+            if end == len(buffer) and not eof:
+                raise ValueError('value may continue in the next chunk')
+        except ValueError as e:
+            if eof and not buffer[pos:].strip():
+                if in_array:
+                    raise ValueError("Truncated JSON: top-level array is missing its closing ']'") from None
+                return
+            error_at = getattr(e, 'pos', len(buffer))
+            if eof or buffer.find('\n', error_at) != -1:
+                # Complete data follows the error, so more chunks won't fix this value
+                ndjson = single_line if single_line is not None else buffer.find('\n', pos, error_at) == -1
+                if in_array or not ndjson:
+                    raise
+                if skipped is not None:
+                    skipped.append(str(e))
+                line_end = buffer.find('\n', pos)
+                if line_end == -1:
+                    return
+                pos = line_end + 1
+                continue
+            pending = len(buffer) - pos
+            if pending > max_value_chars:
+                raise ValueError(f"JSON value at character {consumed + pos} exceeds {max_value_chars} characters; "
+                                 "split large documents into NDJSON lines or top-level array elements") from None
+            chunk = stream.read(max(READ_CHUNK, pending))
+            eof = not chunk
+            consumed += pos
+            buffer = buffer[pos:] + decoder.decode(chunk, final=eof)
+            pos = 0
+            continue
+        yield value
+        if not in_array and single_line is not False:
+            single_line = buffer.find('\n', pos, end) == -1
+        pos = end
+
+def iter_json_rows(stream, skipped: list = None, max_value_chars: int = MAX_VALUE_CHARS):
+    """Top-level JSON records as rows; non-object values land in a 'value' column.
+    :param skipped: Receives the error of each malformed NDJSON line that was skipped
+    :param max_value_chars: Largest single record accepted (see iter_json_values)
+    """
+    for value in iter_json_values(stream, skipped, max_value_chars):
+        yield value if isinstance(value, dict) else {'value': value}
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+def _xml_record(elem) -> dict:
+    record = {f'@{_local(k)}': v for k, v in elem.attrib.items()}
+    children = list(elem)
+    if not children:
+        record['value'] = (elem.text or '').strip()
+        return record
+    for child in children:
+        tag = _local(child.tag)
+        value = (child.text or '').strip() if len(child) == 0 and not child.attrib \
+            else ET.tostring(child, encoding='unicode')
+        if tag in record:
+            record[tag] = record[tag] if isinstance(record[tag], list) else [record[tag]]
+            record[tag].append(value)
+        else:
+            record[tag] = value
+    return record
+
+def iter_xml_rows(stream):
+    """Each direct child of the document root is a record; its child elements and
+    attributes become columns. Finished records are cleared from the tree as it is parsed."""
+    depth, root = 0, None
+    for event, elem in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if root is None:
+                root = elem
+            continue
+        depth -= 1
+        if depth == 1:
+            yield _xml_record(elem)
+            root.clear()
+
+def iter_txt_rows(stream):
+    """One row per line: 'line_number' (1-based) and 'line'."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    for number, line in enumerate(text, start=1):
+        yield {'line_number': number, 'line': line.rstrip('\r\n')}
+
+PARSERS = {'csv': iter_csv_rows, 'json': iter_json_rows, 'xml': iter_xml_rows, 'txt': iter_txt_rows}
+TXT_SCHEMA = pa.schema([('line_number', pa.int64()), ('line', pa.string())])
+
+# --- writer ----------------------------------------------------------------------
+
+class ParquetBatchWriter:
+    """Buffers rows and writes one row group per ``batch_rows``. Unless a schema is given,
+    columns are the normalized keys of the first batch (all strings); keys first seen
+    later are kept as a JSON object in EXTRA_COLUMN so the file schema never changes."""
+    def __init__(self, fs, path: str, batch_rows: int = BATCH_ROWS, schema: pa.Schema = None,
+                 compression: str = 'zstd'):
+        self.fs = fs
+        self.path = path
+        self.batch_rows = batch_rows
+        self.schema = schema
+        self.compression = compression
+        self.rows = 0
+        self.row_groups = 0
+        self._columns = None  # {raw key: column name}
+        self._buffer = []
+        self._writer = None
+
+    def _fix_columns(self) -> None:
+        self._columns, used = {}, set()
+        for row in self._buffer:
+            for key in row:
+                if key in self._columns or key == EXTRA_COLUMN:
+                    continue
+                name, n = normalize_name(key), 2
+                while name in used or name == EXTRA_COLUMN:
+                    name, n = f'{normalize_name(key)}_{n}', n + 1
+                self._columns[key] = name
+                used.add(name)
+        self.schema = pa.schema([(name, pa.string()) for name in self._columns.values()]
+                                + [(EXTRA_COLUMN, pa.string())])
+
+    def _normalize(self, row: dict) -> dict:
+        out, extra = {}, {}
+        for key, value in row.items():
+            column = self._columns.get(key)
+            if column is None:
+                extra[key] = value
+            else:
+                out[column] = _text(value)
+        if extra:
+            out[EXTRA_COLUMN] = json.dumps(extra, ensure_ascii=False, default=str)
+        return out
+
+    def _flush(self) -> None:
+        if not self._buffer:
+            return
+        if self.schema is None:
+            self._fix_columns()
+        rows = self._buffer if self._columns is None else [self._normalize(row) for row in self._buffer]
+        table = pa.Table.from_pylist(rows, schema=self.schema)
+        if self._writer is None:
+            if self.fs.type_name != 's3':  # object stores need no directories (and shouldn't get markers)
+                self.fs.create_dir(self.path.rsplit('/', 1)[0], recursive=True)
+            self._writer = pq.ParquetWriter(self.path, self.schema, filesystem=self.fs, compression=self.compression)
+        self._writer.write_table(table, row_group_size=len(rows))
+        self.rows += len(rows)
+        self.row_groups += 1
+        self._buffer = []
+
+    def write(self, row: dict) -> None:
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_rows:
+            self._flush()
+
+    def close(self) -> None:
+        self._flush()
+        if self._writer is not None:
+            self._writer.close()
+
+# --- entry points ------------------------------------------------------------------
+
+def processed_key(staged_key: str) -> str:
+    """'staging/csv/dt=D/a/b.csv' -> 'processed/csv/dt=D/a/b.csv.parquet'."""
+    if staged_key.startswith(STAGING_PREFIX):
+        staged_key = staged_key[len(STAGING_PREFIX):]
+    return f'{PROCESSED_PREFIX}{staged_key}.parquet'
+
+def file_type_of(staged_key: str):
+    """The type partition the router placed the key under, or None."""
+    if not staged_key.startswith(STAGING_PREFIX):
+        return None
+    file_type = staged_key[len(STAGING_PREFIX):].split('/', 1)[0]
+    return file_type if file_type in PARSERS else None
+
+def extract_object(bucket: str, key: str, processed_bucket: str, filesystem=None,
+                   batch_rows: int = BATCH_ROWS, max_json_value_chars: int = MAX_VALUE_CHARS) -> dict:
+    """Parse one staged file and write it as Parquet to the processed bucket.
+    :param bucket: Bucket holding the staged file
+    :param key: Staged key (staging/<type>/...)
+    :param processed_bucket: Destination bucket
+    :param filesystem: pyarrow filesystem (defaults to the shared S3 filesystem)
+    :param batch_rows: Rows per batch / Parquet row group
+    :param max_json_value_chars: Largest single JSON record; bigger documents fail with ValueError
+    :return: {'source', 'output' (None when the file had no rows), 'type', 'rows', 'skipped_rows'
+              (malformed NDJSON lines), 'bytes', 'output_bytes', 'columns', 'row_groups', 'seconds'}
+    """
+    fs = filesystem or get_filesystem()
+    file_type = file_type_of(key)
+    if file_type is None:
+        raise ValueError(f"Not a staged file of a supported type: {key}")
+    source, output = f'{bucket}/{key}', f'{processed_bucket}/{processed_key(key)}'
+    started = time.perf_counter()
+    writer = ParquetBatchWriter(fs, output, batch_rows, schema=TXT_SCHEMA if file_type == 'txt' else None)
+    skipped = []
+    with fs.open_input_stream(source) as stream:
+        rows = iter_json_rows(stream, skipped, max_json_value_chars) if file_type == 'json' \
+            else PARSERS[file_type](stream)
+        for row in rows:
+            writer.write(row)
+    writer.close()
+    written = writer.rows > 0
+    return {'source': f's3://{source}', 'output': f's3://{output}' if written else None, 'type': file_type,
+            'rows': writer.rows, 'skipped_rows': len(skipped), 'bytes': fs.get_file_info(source).size,
+            'output_bytes': fs.get_file_info(output).size if written else 0,
+            'columns': writer.schema.names if written else [], 'row_groups': writer.row_groups,
+            'seconds': round(time.perf_counter() - started, 3)}
+
+def extract_objects(objects: list, processed_bucket: str, max_workers: int = 4, **kwargs) -> list:
+    """Extract several staged files concurrently; a failing file is reported, not raised.
+    :param objects: [{'bucket', 'key'}]
+    :param processed_bucket: Destination bucket
+    :param max_workers: Files parsed at once (each holds at most one batch in memory)
+    :param kwargs: Passed to extract_object
+    :return: One stats dict per object, with 'status' ('ok'/'failed') and 'error'
+    """
+    def extract(obj):
+        try:
+            return {**extract_object(obj['bucket'], obj['key'], processed_bucket, **kwargs),
+                    'status': 'ok', 'error': None}
+        except Exception as e:
+            return {'source': f"s3://{obj['bucket']}/{obj['key']}", 'status': 'failed', 'error': str(e)}
+
+    if not objects:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(objects)))) as pool:
+        return list(pool.map(extract, objects))
@@ -1,14 +1,44 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
-import urllib.parse
+
+try:
+    from s3_mover import move_objects
+    from router import route_record, summarize
+except ImportError:  # imported as a package (tests) rather than from the Lambda bundle root
+    from lambda_function.s3_mover import move_objects
+    from lambda_function.router import route_record, summarize
+
+MAX_WORKERS = int(os.environ.get('ROUTER_MAX_WORKERS', '16'))
+# Extraction to Parquet runs only when a processed bucket is configured (needs pyarrow, e.g. from a layer)
+PROCESSED_BUCKET = os.environ.get('PROCESSED_BUCKET')
+EXTRACT_MAX_WORKERS = int(os.environ.get('EXTRACT_MAX_WORKERS', '4'))
+# Largest single JSON document/record extracted; larger non-NDJSON files are reported as failed
+EXTRACT_MAX_JSON_VALUE_CHARS = int(os.environ.get('EXTRACT_MAX_JSON_VALUE_CHARS', str(64 * 1024 * 1024)))
 
 def lambda_handler(event, context):
     s3 = boto3.client('s3')
-    supported_ext = ['.csv', '.json', '.xml', '.txt']
-    for record in event['Records']:
-        src_bucket = record['s3']['bucket']['name']
-        src_key = urllib.parse.unquote_plus(record['s3']['object']['key'])
-        if any(src_key.endswith(ext) for ext in supported_ext):
-            dest_key = f"staging/{src_key.split('/')[-1]}"
-            s3.copy_object(Bucket=src_bucket, CopySource={'Bucket': src_bucket, 'Key': src_key}, Key=dest_key)
-            s3.delete_object(Bucket=src_bucket, Key=src_key)
-    return {'status': 'done'}
\ No newline at end of file
+    records = event.get('Records', [])
+    if not records:
+        return {'status': 'done', 'moved': [], 'skipped': [], 'by_type': {}}
+
+    # Sniff every object concurrently (one ranged GET each), then move the supported ones
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(records)))) as pool:
+        routes = list(pool.map(lambda record: route_record(s3, record), records))
+    moves = [route for route in routes if route['dest_key'] is not None]
+    results = move_objects(moves, s3=s3, max_workers=MAX_WORKERS)
+    skipped = [{'key': route['src_key'], 'type': route['type'], 'error': route['error']}
+               for route in routes if route['dest_key'] is None]
+    response = {'status': 'done', 'moved': results, 'skipped': skipped, 'by_type': summarize(routes, results)}
+
+    if PROCESSED_BUCKET:
+        try:
+            from extractor import extract_objects
+        except ImportError:
+            from lambda_function.extractor import extract_objects
+        staged = [{'bucket': move['dest_bucket'], 'key': move['dest_key']}
+                  for move, result in zip(moves, results) if result['status'] != 'failed']
+        response['extracted'] = extract_objects(staged, PROCESSED_BUCKET, max_workers=EXTRACT_MAX_WORKERS,
+                                                max_json_value_chars=EXTRACT_MAX_JSON_VALUE_CHARS)
+    return response
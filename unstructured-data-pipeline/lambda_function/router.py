@@ -0,0 +1,140 @@
+"""Module: router.py
+Content-sniffing router: classifies uploaded objects from their first bytes (not their
+extension) and plans moves into a type/date partitioned staging layout."""
+import codecs
+import csv
+import json
+import posixpath
+import urllib.parse
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+SNIFF_BYTES = 4096
+SUPPORTED_TYPES = ('csv', 'json', 'xml', 'txt')
+STAGING_PREFIX = 'staging/'
+
+_MAGIC = (
+    (b'%PDF-', 'pdf'), (b'PK\x03\x04', 'zip'), (b'\x1f\x8b', 'gzip'), (b'PAR1', 'parquet'),
+    (b'\x89PNG', 'png'), (b'\xff\xd8\xff', 'jpeg'),
+)
+_TEXT_EXTENSIONS = {'.csv': 'csv', '.tsv': 'csv', '.txt': 'txt', '.log': 'txt'}
+_DELIMITERS = (',', '\t', ';', '|')
+_DECODER = json.JSONDecoder()
+
+def _is_json(text: str) -> bool:
+    """'{' always starts a JSON document here; '[' only if the first line (NDJSON) decodes
+    or the array opens with an object, array or string (so '[INFO] ...' logs stay text)."""
+    if text[0] == '{':
+        return True
+    rest = text[1:].lstrip()
+    if rest[:1] in ('{', '[', '"', ']'):
+        return True
+    try:
+        _DECODER.raw_decode(text.splitlines()[0])
+        return True
+    except ValueError:
+        return False
+
+def _is_csv(lines: list) -> bool:
+    """Two or more lines that split into the same number (>1) of fields on one delimiter."""
+    for delimiter in _DELIMITERS:
+        widths = {len(row) for row in csv.reader(lines, delimiter=delimiter)}
+        if len(widths) == 1 and widths.pop() > 1:
+            return True
+    return False
+
+def sniff_type(head: bytes, key: str = '', complete: bool = False) -> str:
+    """Classify an object from its first bytes.
+    :param head: Leading bytes of the object
+    :param key: Object key; its extension only breaks the csv/txt tie for single-line files
+    :param complete: Whether ``head`` is the whole object (otherwise the last line may be cut off)
+    :return: 'csv', 'json', 'xml', 'txt', 'empty', a binary format name ('pdf', 'zip',
+             'gzip', 'parquet', 'png', 'jpeg') or 'binary'
+    """
+    for magic, name in _MAGIC:
+        if head.startswith(magic):
+            return name
+    if b'\x00' in head:
+        return 'binary'
+    try:
+        text = codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=complete)
+    except UnicodeDecodeError:
+        return 'binary'
+    stripped = text.lstrip()
+    if not stripped:
+        return 'empty'
+    if stripped[0] in '{[' and _is_json(stripped):
+        return 'json'
+    if stripped[0] == '<':
+        return 'xml'
+
+    lines = text.splitlines()
+    if not complete and len(lines) > 1:
+        lines = lines[:-1]
+    lines = [line for line in lines if line.strip()][:20]
+    if len(lines) >= 2:
+        return 'csv' if _is_csv(lines) else 'txt'
+    return _TEXT_EXTENSIONS.get(posixpath.splitext(key.lower())[1], 'txt')
+
+def read_head(s3, bucket: str, key: str, size: int = SNIFF_BYTES) -> tuple:
+    """Fetch the first ``size`` bytes with a ranged GET.
+    :return: (bytes, total object size)
+    """
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key, Range=f'bytes=0-{size - 1}')
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'InvalidRange':  # zero-byte object
+            return b'', 0
+        raise
+    head = response['Body'].read()
+    content_range = response.get('ContentRange')
+    total = int(content_range.rsplit('/', 1)[1]) if content_range else response.get('ContentLength', len(head))
+    return head, total
+
+def staging_key(src_key: str, file_type: str, date: str, prefix: str = STAGING_PREFIX) -> str:
+    """Destination key that keeps the source path: ``<prefix><type>/dt=<date>/<src_key>``."""
+    return f'{prefix}{file_type}/dt={date}/{src_key}'
+
+def route_record(s3, record: dict, prefix: str = STAGING_PREFIX) -> dict:
+    """Sniff one S3 event record's object and plan its move.
+    :return: {'src_bucket', 'src_key', 'dest_bucket', 'dest_key', 'type', 'size', 'error'};
+             'dest_key' is None when the object is not moved (unsupported type, already
+             staged, or unreadable)
+    """
+    bucket = record['s3']['bucket']['name']
+    key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+    route = {'src_bucket': bucket, 'src_key': key, 'dest_bucket': bucket, 'dest_key': None,
+             'type': None, 'size': record['s3']['object'].get('size'), 'error': None}
+    if key.startswith(prefix):
+        route['type'] = 'staged'
+        return route
+    try:
+        head, size = read_head(s3, bucket, key)
+    except ClientError as e:
+        route.update(type='error', error=str(e))
+        return route
+    route.update(type=sniff_type(head, key, complete=len(head) >= size), size=size)
+    if route['type'] in SUPPORTED_TYPES:
+        event_time = record.get('eventTime')
+        date = event_time[:10] if event_time else datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        route['dest_key'] = staging_key(key, route['type'], date, prefix)
+    return route
+
+def summarize(routes: list, results: list) -> dict:
+    """Per-type file counts and bytes moved, from the planned routes and move_objects results.
+    :return: {type: {'files', 'bytes', 'failed'}}
+    """
+    by_type = {}
+    moved = iter(results)
+    for route in routes:
+        if route['dest_key'] is None:
+            continue
+        result = next(moved)
+        stats = by_type.setdefault(route['type'], {'files': 0, 'bytes': 0, 'failed': 0})
+        if result['status'] == 'failed':
+            stats['failed'] += 1
+        else:
+            stats['files'] += 1
+            stats['bytes'] += result['bytes']
+    return by_type
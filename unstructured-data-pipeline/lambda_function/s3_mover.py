@@ -0,0 +1,112 @@
+"""Module: s3_mover.py
+Concurrent, idempotent S3 move (copy + batched delete) with multipart copy for large objects.
+Vendored byte-for-byte as mini_data_pipeline/orchestration/s3_mover.py and
+unstructured-data-pipeline/lambda_function/s3_mover.py; edit both (the test suites check)."""
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+try:
+    from config.aws_clients import get_client
+except ImportError:  # the unstructured pipeline's Lambda bundle has no shared client cache
+    import boto3
+
+    def get_client(service: str):
+        return boto3.client(service)
+
+MULTIPART_COPY_THRESHOLD = 5 * 1024 ** 3  # copy_object's single-request limit
+COPY_PART_SIZE = 512 * 1024 ** 2
+DELETE_BATCH_SIZE = 1000  # delete_objects limit
+# Object headers copy_object keeps by default, but create_multipart_upload must be given explicitly
+COPIED_HEADERS = ('ContentType', 'ContentEncoding', 'ContentDisposition', 'ContentLanguage',
+                  'CacheControl', 'Metadata')
+
+def _head(s3, bucket: str, key: str):
+    """Return head_object's response, or None if the object doesn't exist."""
+    try:
+        return s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+
+def multipart_copy(s3, src_bucket: str, src_key: str, dest_bucket: str, dest_key: str,
+                   size: int, part_size: int = COPY_PART_SIZE, head: dict = None) -> None:
+    """Server-side copy of an object of any size with upload_part_copy.
+    :param head: Source head_object response; its content headers and user metadata are
+                 carried over (fetched when not given)
+    """
+    head = head if head is not None else s3.head_object(Bucket=src_bucket, Key=src_key)
+    headers = {name: head[name] for name in COPIED_HEADERS if head.get(name)}
+    upload_id = s3.create_multipart_upload(Bucket=dest_bucket, Key=dest_key, **headers)['UploadId']
+    try:
+        parts = []
+        for number, start in enumerate(range(0, size, part_size), start=1):
+            end = min(start + part_size, size) - 1
+            response = s3.upload_part_copy(
+                Bucket=dest_bucket, Key=dest_key, UploadId=upload_id, PartNumber=number,
+                CopySource={'Bucket': src_bucket, 'Key': src_key}, CopySourceRange=f'bytes={start}-{end}',
+            )
+            parts.append({'ETag': response['CopyPartResult']['ETag'], 'PartNumber': number})
+        s3.complete_multipart_upload(Bucket=dest_bucket, Key=dest_key, UploadId=upload_id,
+                                     MultipartUpload={'Parts': parts})
+    except Exception:
+        s3.abort_multipart_upload(Bucket=dest_bucket, Key=dest_key, UploadId=upload_id)
+        raise
+
+def copy_object(s3, src_bucket: str, src_key: str, dest_bucket: str, dest_key: str, size: int,
+                head: dict = None) -> None:
+    """Copy with a single copy_object call, or multipart copy above 5 GB (``head`` as in multipart_copy)."""
+    if size > MULTIPART_COPY_THRESHOLD:
+        multipart_copy(s3, src_bucket, src_key, dest_bucket, dest_key, size, head=head)
+    else:
+        s3.copy_object(Bucket=dest_bucket, Key=dest_key, CopySource={'Bucket': src_bucket, 'Key': src_key})
+
+def _copy_one(s3, move: dict) -> dict:
+    result = {'src': move['src_key'], 'dest': move['dest_key'], 'bytes': 0, 'error': None}
+    try:
+        head = _head(s3, move['src_bucket'], move['src_key'])
+        if head is None:
+            # A retry after a previous run already copied and deleted the source.
+            done = _head(s3, move['dest_bucket'], move['dest_key']) is not None
+            result.update(status='already_moved' if done else 'failed',
+                          error=None if done else 'source not found')
+            return result
+        copy_object(s3, move['src_bucket'], move['src_key'], move['dest_bucket'], move['dest_key'],
+                    head['ContentLength'], head=head)
+        result.update(status='copied', bytes=head['ContentLength'])
+    except Exception as e:
+        result.update(status='failed', error=str(e))
+    return result
+
+def move_objects(moves: list, s3=None, max_workers: int = 16) -> list:
+    """Move objects: copy concurrently, then delete the copied sources with delete_objects.
+    Safe to retry: a missing source whose destination exists is reported as 'already_moved'.
+    :param moves: [{'src_bucket', 'src_key', 'dest_bucket', 'dest_key'}]
+    :param s3: Optional S3 client
+    :param max_workers: Upper bound on concurrent copies
+    :return: One result per move with 'src', 'dest', 'status' ('moved', 'already_moved',
+             'failed'), 'bytes' and 'error'
+    """
+    if not moves:
+        return []
+    s3 = s3 or get_client('s3')
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(moves)))) as pool:
+        results = list(pool.map(lambda move: _copy_one(s3, move), moves))
+
+    by_bucket = {}
+    for move, result in zip(moves, results):
+        if result['status'] == 'copied':
+            by_bucket.setdefault(move['src_bucket'], []).append(result)
+    for bucket, copied in by_bucket.items():
+        for start in range(0, len(copied), DELETE_BATCH_SIZE):
+            batch = copied[start:start + DELETE_BATCH_SIZE]
+            response = s3.delete_objects(Bucket=bucket, Delete={
+                'Objects': [{'Key': r['src']} for r in batch], 'Quiet': True})
+            errors = {e['Key']: e.get('Message', e.get('Code')) for e in response.get('Errors', [])}
+            for r in batch:
+                if r['src'] in errors:
+                    r.update(status='failed', error=f"copied but not deleted: {errors[r['src']]}")
+                else:
+                    r['status'] = 'moved'
+    return results
@@ -5,15 +5,15 @@ from botocore.exceptions import ClientError
 
 # AWS Configuration
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
-RAW_BUCKET = os.getenv('RAW_BUCKET', 'unstructured-raw-data-bucket')
+PROCESSED_BUCKET = os.getenv('PROCESSED_BUCKET', 'unstructured-processed-data-bucket')
 
 # Initialize Glue client
 glue = boto3.client('glue', region_name=AWS_REGION)
 
 def setup_glue_resources(role_arn=None):
     """
-    Creates a Glue database and a crawler to catalog unstructured data files
-    stored in the 'staging' folder of the raw data S3 bucket.
+    Creates a Glue database and a crawler to catalog the Parquet extracted
+    from staged files into the 'processed' folder of the processed S3 bucket.
 
     Parameters:
     - role_arn (str): The ARN of the IAM role with Glue permissions.
@@ -38,7 +38,7 @@ def setup_glue_resources(role_arn=None):
             Name=crawler_name,
             Role=role_arn,
             DatabaseName=database_name,
-            Targets={'S3Targets': [{'Path': f's3://{RAW_BUCKET}/staging/'}]},
+            Targets={'S3Targets': [{'Path': f's3://{PROCESSED_BUCKET}/processed/'}]},
             TablePrefix='unstructured_',
             SchemaChangePolicy={
                 'UpdateBehavior': 'UPDATE_IN_DATABASE',
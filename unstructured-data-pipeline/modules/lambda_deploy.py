@@ -7,34 +7,32 @@ from botocore.exceptions import ClientError
 AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
 lambda_client = boto3.client('lambda', region_name=AWS_REGION)
 
-def deploy_lambda_function(role_arn=None):
+def deploy_lambda_function(role_arn=None, processed_bucket=None):
     """
-    Deploys an AWS Lambda function that listens for S3 events and moves
-    supported files (.csv, .json, .xml, .txt) to a staging folder.
+    Deploys an AWS Lambda function that listens for S3 events, sniffs each
+    file's type (CSV, JSON, XML, TXT) and moves it to a staging folder, then
+    extracts it to Parquet in the processed bucket.
 
     Parameters:
     - role_arn (str): The ARN of the IAM role with Lambda execution permissions.
                       Falls back to the LAMBDA_ROLE_ARN environment variable.
+    - processed_bucket (str): Bucket for extracted Parquet; extraction is off when unset.
+                              Falls back to the PROCESSED_BUCKET environment variable.
+                              pyarrow must come from a layer (LAMBDA_LAYER_ARNS, comma-separated).
     """
     role_arn = role_arn or os.environ['LAMBDA_ROLE_ARN']
-
-    # Load Lambda handler code from external Python file
-    lambda_code_path = 'lambda_function/lambda_function.py'
-    with open(lambda_code_path, 'r') as f:
-        lambda_code = f.read()
+    processed_bucket = processed_bucket or os.getenv('PROCESSED_BUCKET')
+    layers = [arn for arn in os.getenv('LAMBDA_LAYER_ARNS', '').split(',') if arn]
 
     # Create a temporary directory to build the deployment package
     build_dir = 'lambda_build'
     os.makedirs(build_dir, exist_ok=True)
 
-    lambda_source_file = os.path.join(build_dir, 'lambda_function.py')
-    with open(lambda_source_file, 'w') as f:
-        f.write(lambda_code)
-
-    # Create ZIP package for Lambda deployment
+    # Create ZIP package for Lambda deployment (handler plus the modules it imports)
     zip_file_path = os.path.join(build_dir, 'deployment_package.zip')
     with zipfile.ZipFile(zip_file_path, 'w') as z:
-        z.write(lambda_source_file, arcname='lambda_function.py')
+        for module in ('lambda_function.py', 'router.py', 's3_mover.py', 'extractor.py'):
+            z.write(os.path.join('lambda_function', module), arcname=module)
 
     # Load zipped code
     with open(zip_file_path, 'rb') as f:
@@ -48,8 +46,11 @@ def deploy_lambda_function(role_arn=None):
             Role=role_arn,
             Handler='lambda_function.lambda_handler',
             Code={'ZipFile': zipped_code},
-            Timeout=60,
-            MemorySize=128,
+            # Extraction streams multi-GB files in bounded batches, but needs time and room for pyarrow
+            Timeout=900 if processed_bucket else 60,
+            MemorySize=1024 if processed_bucket else 128,
+            Environment={'Variables': {'PROCESSED_BUCKET': processed_bucket} if processed_bucket else {}},
+            Layers=layers,
         )
         print("[Lambda] Function 'UnstructuredDataLambda' created successfully.")
     except ClientError as e:
@@ -2,6 +2,10 @@
 Unit tests for unstructured-data-pipeline.
 """
 
+import io
+import json
+import os
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 
@@ -18,19 +22,205 @@ class TestS3Setup(unittest.TestCase):
         self.assertEqual(kwargs["Bucket"], "test-bucket")
 
 
+def s3_event(*keys):
+    return {"Records": [{"eventTime": "2024-05-06T07:08:09.000Z",
+                         "s3": {"bucket": {"name": "test-bucket"}, "object": {"key": key}}} for key in keys]}
+
+
+def s3_with_objects(objects):
+    """Mock S3 client serving ranged GETs and HEADs for ``objects`` ({key: bytes})."""
+    mock_s3 = MagicMock()
+
+    def get_object(Bucket, Key, Range):
+        body = objects[Key]
+        end = int(Range.rsplit("-", 1)[1])
+        return {"Body": io.BytesIO(body[:end + 1]), "ContentRange": f"bytes 0-{end}/{len(body)}"}
+    mock_s3.get_object.side_effect = get_object
+    mock_s3.head_object.side_effect = lambda Bucket, Key: {"ContentLength": len(objects[Key])}
+    mock_s3.delete_objects.return_value = {}
+    return mock_s3
+
+
+class TestS3Mover(unittest.TestCase):
+
+    def test_vendored_copy_matches_mini_data_pipeline(self):
+        """Test that lambda_function/s3_mover.py has not drifted from mini_data_pipeline's copy."""
+        here = os.path.join(os.path.dirname(__file__), "..", "lambda_function", "s3_mover.py")
+        upstream = os.path.join(os.path.dirname(__file__), "..", "..", "mini_data_pipeline",
+                                "orchestration", "s3_mover.py")
+        if not os.path.exists(upstream):
+            self.skipTest("mini_data_pipeline is not checked out alongside")
+        with open(here, "rb") as a, open(upstream, "rb") as b:
+            self.assertEqual(a.read(), b.read(), "s3_mover.py copies differ; apply the change to both")
+
+    def test_default_client_comes_from_boto3_without_shared_config(self):
+        """Test that the vendored mover falls back to boto3.client when there is no config package."""
+        from lambda_function.s3_mover import move_objects
+        with patch("boto3.client") as mock_boto:
+            mock_boto.return_value.head_object.return_value = {"ContentLength": 1}
+            results = move_objects([{"src_bucket": "b", "src_key": "a", "dest_bucket": "b", "dest_key": "s/a"}])
+        mock_boto.assert_called_once_with("s3")
+        self.assertEqual(results[0]["status"], "moved")
+
+
 class TestLambdaHandler(unittest.TestCase):
 
     @patch("boto3.client")
     def test_lambda_handler_supported_extension(self, mock_boto):
         """Test Lambda handler processes supported file types."""
-        mock_s3 = MagicMock()
+        mock_s3 = s3_with_objects({"uploads/data.csv": b"id,name\n1,a\n"})
         mock_boto.return_value = mock_s3
-        event = {
-            "Records": [{"s3": {"bucket": {"name": "test-bucket"}, "object": {"key": "uploads/data.csv"}}}]
-        }
         from lambda_function.lambda_function import lambda_handler
-        result = lambda_handler(event, {})
+        result = lambda_handler(s3_event("uploads/data.csv"), {})
         self.assertEqual(result["status"], "done")
+        self.assertEqual(result["moved"][0]["status"], "moved")
+        mock_s3.copy_object.assert_called_once_with(
+            Bucket="test-bucket", Key="staging/csv/dt=2024-05-06/uploads/data.csv",
+            CopySource={"Bucket": "test-bucket", "Key": "uploads/data.csv"})
+        mock_s3.delete_objects.assert_called_once()
+
+    @patch("boto3.client")
+    def test_routes_by_content_and_keeps_folders_apart(self, mock_boto):
+        """Test that files are typed by content, same-named files don't collide, and unsupported ones stay put."""
+        mock_boto.return_value = s3_with_objects({
+            "a/report.txt": b'{"id": 1}\n{"id": 2}\n',
+            "b/report.txt": b"plain notes\nsecond line\n",
+            "c/scan.xml": b"%PDF-1.7 binary",
+        })
+        from lambda_function.lambda_function import lambda_handler
+
+        result = lambda_handler(s3_event("a/report.txt", "b/report.txt", "c/scan.xml"), {})
+
+        self.assertEqual(sorted(r["dest"] for r in result["moved"]),
+                         ["staging/json/dt=2024-05-06/a/report.txt", "staging/txt/dt=2024-05-06/b/report.txt"])
+        self.assertEqual(result["skipped"], [{"key": "c/scan.xml", "type": "pdf", "error": None}])
+        self.assertEqual(result["by_type"], {"json": {"files": 1, "bytes": 20, "failed": 0},
+                                             "txt": {"files": 1, "bytes": 24, "failed": 0}})
+
+    @patch("lambda_function.extractor.extract_objects")
+    @patch("boto3.client")
+    def test_moved_files_are_extracted_when_processed_bucket_set(self, mock_boto, mock_extract):
+        """Test that staged files (but not failed moves) are handed to the extraction stage."""
+        mock_boto.return_value = s3_with_objects({"in/a.json": b'{"id": 1}'})
+        mock_extract.return_value = [{"status": "ok"}]
+        from lambda_function import lambda_function
+
+        with patch.object(lambda_function, "PROCESSED_BUCKET", "processed-bucket"):
+            result = lambda_function.lambda_handler(s3_event("in/a.json"), {})
+
+        mock_extract.assert_called_once_with(
+            [{"bucket": "test-bucket", "key": "staging/json/dt=2024-05-06/in/a.json"}], "processed-bucket",
+            max_workers=lambda_function.EXTRACT_MAX_WORKERS,
+            max_json_value_chars=lambda_function.EXTRACT_MAX_JSON_VALUE_CHARS)
+        self.assertEqual(result["extracted"], [{"status": "ok"}])
+
+
+class TestExtractor(unittest.TestCase):
+
+    def setUp(self):
+        import pyarrow.fs as pafs
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fs = pafs.SubTreeFileSystem(self.tmp.name, pafs.LocalFileSystem())
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _stage(self, key, body):
+        path = os.path.join(self.tmp.name, "raw", key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(body)
+
+    def _extract(self, key, **kwargs):
+        import pyarrow.parquet as pq
+        from lambda_function.extractor import extract_object
+        stats = extract_object("raw", key, "processed", filesystem=self.fs, **kwargs)
+        table = pq.read_table(os.path.join(self.tmp.name, stats["output"][len("s3://"):]))
+        return stats, table.to_pylist()
+
+    def test_csv_xml_and_txt_become_normalized_parquet(self):
+        """Test per-format parsing, column normalization and per-file stats."""
+        self._stage("staging/csv/dt=2024-05-06/in/a.csv", b'Order ID;Total\n1;"9;5"\n2;3;extra\n')
+        self._stage("staging/xml/dt=2024-05-06/in/a.xml",
+                    b'<orders><order id="1"><sku>A</sku><sku>B</sku></order>'
+                    b'<order id="2"><sku>C</sku></order></orders>')
+        self._stage("staging/txt/dt=2024-05-06/in/a.txt", b"first\r\nsecond\n")
+
+        csv_stats, csv_rows = self._extract("staging/csv/dt=2024-05-06/in/a.csv")
+        _, xml_rows = self._extract("staging/xml/dt=2024-05-06/in/a.xml")
+        _, txt_rows = self._extract("staging/txt/dt=2024-05-06/in/a.txt")
+
+        self.assertEqual(csv_stats["output"], "s3://processed/processed/csv/dt=2024-05-06/in/a.csv.parquet")
+        self.assertEqual((csv_stats["rows"], csv_stats["bytes"]), (2, 33))
+        self.assertEqual(csv_stats["columns"], ["order_id", "total", "_extra"])
+        self.assertEqual(csv_rows[0], {"order_id": "1", "total": "9;5", "_extra": None})
+        self.assertEqual(json.loads(csv_rows[1]["_extra"]), {"_extra": ["extra"]})
+        self.assertEqual(xml_rows, [{"id": "1", "sku": '["A", "B"]', "_extra": None},
+                                    {"id": "2", "sku": "C", "_extra": None}])
+        self.assertEqual(txt_rows, [{"line_number": 1, "line": "first"}, {"line_number": 2, "line": "second"}])
+
+    def test_json_is_streamed_across_chunks_in_bounded_batches(self):
+        """Test that a JSON array split across tiny read chunks is parsed into fixed-size row groups."""
+        records = [{"id": i, "tags": ["x"] * (i % 3)} for i in range(7)] + [{"id": 7, "late": True}]
+        self._stage("staging/json/dt=2024-05-06/b.json", json.dumps(records, indent=2).encode())
+
+        with patch("lambda_function.extractor.READ_CHUNK", 5):
+            stats, rows = self._extract("staging/json/dt=2024-05-06/b.json", batch_rows=3)
+
+        self.assertEqual((stats["rows"], stats["row_groups"]), (8, 3))
+        self.assertEqual([row["id"] for row in rows], [str(i) for i in range(8)])
+        self.assertEqual(rows[2]["tags"], '["x", "x"]')
+        self.assertEqual(json.loads(rows[7]["_extra"]), {"late": True})
+
+    def test_malformed_ndjson_lines_are_skipped_and_counted(self):
+        """Test that a bad NDJSON line is skipped, while a bad array element fails without reading to EOF."""
+        import io
+        from lambda_function.extractor import iter_json_values
+        self._stage("staging/json/dt=2024-05-06/c.json", b'{"id": 1}\n{"id": 2,, "x": "y"}\n{"id": 3}\n{"id": 4')
+
+        with patch("lambda_function.extractor.READ_CHUNK", 4):
+            stats, rows = self._extract("staging/json/dt=2024-05-06/c.json")
+
+        self.assertEqual((stats["rows"], stats["skipped_rows"]), (2, 2))
+        self.assertEqual([row["id"] for row in rows], ["1", "3"])
+        stream = io.BytesIO(b'[{"id": 1}, {"id": 2,, "x": 1},\n' + b'{"id": 3},\n' * 100000 + b']')
+        with patch("lambda_function.extractor.READ_CHUNK", 64), self.assertRaises(ValueError):
+            list(iter_json_values(stream))
+        self.assertLess(stream.tell(), 1024)
+
+    def test_truncated_array_and_oversized_document_raise(self):
+        """Test that an unterminated top-level array and a document over the size cap fail instead of passing."""
+        import io
+        from lambda_function.extractor import iter_json_values
+
+        with patch("lambda_function.extractor.READ_CHUNK", 4), self.assertRaisesRegex(ValueError, "closing"):
+            list(iter_json_values(io.BytesIO(b"[1, 2, 3")))
+        self.assertEqual(list(iter_json_values(io.BytesIO(b"[1, 2, 3]"))), [1, 2, 3])
+
+        stream = io.BytesIO(b'{"data": [' + b'{"id": 1},' * 100000 + b'{"id": 2}]}')
+        with patch("lambda_function.extractor.READ_CHUNK", 64), self.assertRaisesRegex(ValueError, "exceeds 4096"):
+            list(iter_json_values(stream, max_value_chars=4096))
+        self.assertLess(stream.tell(), 16 * 1024)
+        stream.seek(0)
+        self.assertEqual(len(next(iter_json_values(stream))["data"]), 100001)
+
+
+class TestSniffType(unittest.TestCase):
+
+    def test_sniff_type_from_leading_bytes(self):
+        """Test classification of common layouts, including a truncated sniff window."""
+        from lambda_function.router import sniff_type
+        cases = {
+            b'\xef\xbb\xbf[\n  {"a": 1},\n  {"a"': "json",
+            b'<?xml version="1.0"?><rows>': "xml",
+            b'id;name\n1;"x;y"\n2;z\n3;partial': "csv",
+            b"[INFO] started\n[INFO] done\n": "txt",
+            b"\x1f\x8b\x08\x00": "gzip",
+            b"   ": "empty",
+        }
+        for head, expected in cases.items():
+            self.assertEqual(sniff_type(head), expected, head)
+        self.assertEqual(sniff_type(b"a,b,c", "one_line.csv", complete=True), "csv")
 
 
 if __name__ == "__main__":